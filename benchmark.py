@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import numpy as np
+from optimize_manager import BINARY_NAME, ensure_optimizer, parse_telemetry
+from optimized_packer import Packer
+from score_calculator import load_submission, score_groups
+from validate import validate_submission
+
+# Throughput benchmarks, written as a JSON report that can be compared
+# across commits:
+#   python benchmark.py -o bench_new.json
+#   python benchmark.py --compare bench_old.json bench_new.json
+# Every input is a group of SUBMISSION_FILE and every random stream has a
+# fixed seed, so two runs on the same machine measure the same work. Each
+# number is the median of --repeat runs; on a shared or throttling machine
+# raise --repeat or --threshold, whole runs can shift by 20% there.
+
+SUBMISSION_FILE = "submission.csv"
+SA_GROUPS = (10, 50, 100, 200)
+SEED = 42
+
+# A metric is flagged when it gets worse by more than this fraction
+DEFAULT_THRESHOLD = 0.10
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def bench_cpp(n, moves, binary=BINARY_NAME, submission=SUBMISSION_FILE):
+    """The binary's --bench event for group N: SA moves/s, getPoly/s, overlap pairs/s."""
+    # --bench is single-threaded and writes no rows; "-o -" sends the log to stderr
+    result = subprocess.run(
+        [binary, "-g", str(n), "--group-only", "-i", submission, "-o", "-",
+         "-n", str(moves), "--bench", "--json"],
+        capture_output=True, text=True, env=dict(os.environ, OMP_NUM_THREADS="1"))
+    if result.returncode != 0:
+        raise RuntimeError(f"{binary} --bench failed for N={n}: {result.stderr}")
+    for line in result.stderr.splitlines():
+        event = parse_telemetry(line)
+        if event and event['event'] == 'bench':
+            return {k: v for k, v in event.items() if k.endswith('_per_s')}
+    raise RuntimeError(f"{binary} printed no bench event for N={n}")
+
+def bench_packer(n, steps, submission=SUBMISSION_FILE):
+    """Packer.step + check_overlap + revert per second on group N."""
+    ns, xs, ys, degs = load_submission(submission)
+    rows = ns == n
+    packer = Packer(n)
+    packer.set_state(xs[rows], ys[rows], degs[rows])
+
+    random.seed(SEED)
+    start = time.perf_counter()
+    for _ in range(steps):
+        idx, old_state = packer.step(0.01)
+        packer.check_overlap()
+        packer.revert(idx, old_state)
+    return steps / (time.perf_counter() - start)
+
+def bench_files(submission=SUBMISSION_FILE):
+    """Seconds to score and to validate the whole file (no sidecar cache)."""
+    start = time.perf_counter()
+    score_groups(submission)
+    score_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    validate_submission(submission)
+    validate_s = time.perf_counter() - start
+    return {'score_s': score_s, 'validate_s': validate_s}
+
+def median_of(repeat, fn, *args):
+    runs = [fn(*args) for _ in range(repeat)]
+    if isinstance(runs[0], dict):
+        return {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+    return statistics.median(runs)
+
+def run_benchmarks(moves=200000, steps=2000, repeat=3, groups=SA_GROUPS,
+                   binary=BINARY_NAME, submission=SUBMISSION_FILE):
+    report = {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'submission': submission,
+        'seed': SEED,
+        'moves': moves,
+        'steps': steps,
+        'repeat': repeat,
+        'metrics': {},
+    }
+    metrics = report['metrics']
+
+    # The default binary is rebuilt first if it is missing or predates its source
+    if binary == BINARY_NAME and not ensure_optimizer():
+        print(f"Could not build {binary}, skipping the C++ benchmarks")
+    elif os.path.exists(binary):
+        for n in groups:
+            print(f"C++ kernels and SA, N={n}...")
+            for key, value in median_of(repeat, bench_cpp, n, moves, binary, submission).items():
+                metrics[f'cpp.{key}.n{n:03d}'] = value
+    else:
+        print(f"{binary} not found, skipping the C++ benchmarks")
+
+    for n in groups:
+        print(f"Python Packer, N={n}...")
+        metrics[f'py.packer_steps_per_s.n{n:03d}'] = median_of(repeat, bench_packer, n, steps, submission)
+
+    print("Full-file score and validate...")
+    for key, value in median_of(repeat, bench_files, submission).items():
+        metrics[f'py.{key}'] = value
+    return report
+
+def compare(old, new, threshold=DEFAULT_THRESHOLD):
+    """Print old vs new for every shared metric; returns the regressed ones.
+
+    Rates (*_per_s) regress when they drop, times (*_s) when they grow.
+    """
+    regressions = []
+    print(f"{'metric':45s} {'old':>14s} {'new':>14s} {'change':>8s}")
+    for key in sorted(old['metrics'].keys() & new['metrics'].keys()):
+        a, b = old['metrics'][key], new['metrics'][key]
+        change = (b - a) / a if a else 0.0
+        worse = -change if '_per_s' in key else change
+        flag = ''
+        if worse > threshold:
+            regressions.append(key)
+            flag = '  REGRESSION'
+        print(f"{key:45s} {a:14.6g} {b:14.6g} {change:+8.1%}{flag}")
+    for key in sorted(old['metrics'].keys() ^ new['metrics'].keys()):
+        print(f"{key:45s} only in {'old' if key in old['metrics'] else 'new'}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Geometry kernel and optimizer throughput benchmarks")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="Report file to write")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two reports instead of running")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown before a metric is flagged")
+    parser.add_argument("--moves", type=int, default=200000, help="SA moves / kernel calls per C++ run")
+    parser.add_argument("--steps", type=int, default=2000, help="Packer steps per Python run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (median is kept)")
+    parser.add_argument("--binary", default=BINARY_NAME)
+    parser.add_argument("--submission", default=SUBMISSION_FILE)
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        print(f"{args.compare[0]} ({old.get('commit')}) -> {args.compare[1]} ({new.get('commit')})")
+        regressions = compare(old, new, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} metrics regressed by more than {args.threshold:.0%}")
+            return 1
+        return 0
+
+    report = run_benchmarks(args.moves, args.steps, args.repeat,
+                            binary=args.binary, submission=args.submission)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
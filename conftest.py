@@ -0,0 +1,16 @@
+import os
+import shutil
+import subprocess
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+@pytest.fixture(scope="session")
+def optimizer_binary(tmp_path_factory):
+    """single_group_optimizer built from the source in this tree."""
+    if shutil.which("g++") is None:
+        pytest.skip("needs g++ to build the optimizer")
+    binary = str(tmp_path_factory.mktemp("build") / "single_group_optimizer")
+    subprocess.run(["g++", "-O2", "-std=c++17", "-fopenmp", "-o", binary,
+                    os.path.join(HERE, "single_group_optimizer.cpp")], check=True)
+    return binary
@@ -1,10 +1,10 @@
 #include <algorithm>
 #include <cmath>
-#include <ctime>
 #include <fstream>
 #include <iomanip>
 #include <iostream>
 #include <random>
+#include <string>
 #include <vector>
 
 // Use standard math constants
@@ -116,8 +116,20 @@ Bounds get_bounds(const vector<Config> &configs) {
 
 // --- OPTIMIZER ---
 // Simulated Annealing for N=2 to minimize AREA
-int main() {
-  srand(time(0));
+// --seed S makes a run reproducible; without it a seed is drawn and
+// printed, so any run can be repeated
+uint64_t parseSeed(int argc, char **argv) {
+  for (int i = 1; i + 1 < argc; i++)
+    if (string(argv[i]) == "--seed")
+      return stoull(argv[i + 1]);
+  return random_device{}();
+}
+
+int main(int argc, char **argv) {
+  uint64_t seed = parseSeed(argc, argv);
+  cout << "Seed: " << seed << endl;
+  mt19937_64 rng(seed);
+  uniform_real_distribution<double> uni(-1.0, 1.0), unit(0.0, 1.0);
 
   // Setup N=2
   int n = 2;
@@ -140,14 +152,14 @@ int main() {
     vector<Config> next = current;
 
     // Perturb
-    int idx = rand() % n;
-    int type = rand() % 2; // 0: Move, 1: Rotate
+    int idx = (int)(rng() % n);
+    int type = (int)(rng() % 2); // 0: Move, 1: Rotate
 
     if (type == 0) {
-      next[idx].x += ((rand() % 1000) / 500.0 - 1.0) * T * 2.0;
-      next[idx].y += ((rand() % 1000) / 500.0 - 1.0) * T * 2.0;
+      next[idx].x += uni(rng) * T * 2.0;
+      next[idx].y += uni(rng) * T * 2.0;
     } else {
-      next[idx].deg += ((rand() % 1000) / 500.0 - 1.0) * T * 180.0;
+      next[idx].deg += uni(rng) * T * 180.0;
     }
 
     // Normalize deg
@@ -169,7 +181,7 @@ int main() {
     // Metropolis
     double diff = area - calc_area(current);
 
-    if (diff < 0 || (exp(-diff / T) > (rand() / (double)RAND_MAX))) {
+    if (diff < 0 || (exp(-diff / T) > unit(rng))) {
       current = next;
       if (area < best_area) {
         best_area = area;
@@ -0,0 +1,248 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import numpy as np
+from tree_geometry import tree_bounds, tree_vertices
+from validate import overlapping_pairs
+
+# Starting configurations cut from periodic tilings. lattice_solver writes
+# unit cells to LATTICE_FILE: basis (a, 0), (b, c) and the cell's trees as
+# (x, y, deg). For every N the seeder looks for the crop of a tiling, over
+# all cells and orientations, whose N trees fit in the smallest square.
+# The seeds of all groups are cached in CACHE_FILE until LATTICE_FILE
+# changes.
+
+LATTICE_FILE = "lattices.json"
+CACHE_FILE = "lattice_seeds.json"
+CACHE_VERSION = 1
+MAX_N = 200
+
+# Tiling orientations tried, in degrees. A square turned by 90 degrees is
+# the same square, so [0, 90) covers them all.
+ANGLE_STEP = 1.0
+
+# Candidate window origins scored per batch
+CHUNK = 256
+
+# A seed that overlaps (cells found in double precision can touch) is
+# spread about its centre by this factor, doubling until it is valid, for
+# at most SPREAD_ROUNDS rounds (trees on the same spot never come apart)
+SPREAD = 1e-9
+SPREAD_ROUNDS = 40
+
+# Seeds this much larger than the current group are still worth optimizing
+SLACK = 0.05
+
+def load_lattices(filename=LATTICE_FILE):
+    with open(filename, 'r') as f:
+        return json.load(f)['lattices']
+
+def _frame(lattice, theta):
+    # Basis vectors and cell trees of the tiling turned by theta degrees
+    t = math.radians(theta)
+    c, s = math.cos(t), math.sin(t)
+    rot = np.array([[c, -s], [s, c]])
+    basis = rot @ np.array([[lattice['a'], lattice['b']], [0.0, lattice['c']]])
+    cell = np.array(lattice['trees'], dtype=np.float64)
+    pos = cell[:, :2] @ rot.T
+    return basis, pos, cell[:, 2] + theta
+
+def tile(lattice, theta, x0, y0, x1, y1):
+    """Trees of the turned tiling with centres in [x0, x1] x [y0, y1]."""
+    basis, pos, degs = _frame(lattice, theta)
+    inv = np.linalg.inv(basis)
+    corners = inv @ np.array([[x0, x1, x0, x1], [y0, y0, y1, y1]])
+    i = np.arange(math.floor(corners[0].min()) - 1, math.ceil(corners[0].max()) + 2)
+    j = np.arange(math.floor(corners[1].min()) - 1, math.ceil(corners[1].max()) + 2)
+    ii, jj = np.meshgrid(i, j, indexing='ij')
+    shifts = np.stack([ii.ravel(), jj.ravel()]).T @ basis.T
+
+    xs = (shifts[:, None, 0] + pos[None, :, 0]).ravel()
+    ys = (shifts[:, None, 1] + pos[None, :, 1]).ravel()
+    ds = np.tile(degs, len(shifts))
+    keep = (xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)
+    return xs[keep], ys[keep], ds[keep]
+
+def _window(lattice, theta, max_n):
+    # Tiling around one fundamental cell P at the origin, big enough for a
+    # max_n window starting anywhere in P, plus the candidate origins.
+    basis, _, _ = _frame(lattice, theta)
+    k = len(lattice['trees'])
+    reach = math.sqrt(max_n * abs(np.linalg.det(basis)) / k) * 1.5 + 3.0
+    px = np.array([0.0, basis[0, 0], basis[0, 1], basis[0, 0] + basis[0, 1]])
+    py = np.array([0.0, basis[1, 0], basis[1, 1], basis[1, 0] + basis[1, 1]])
+    xs, ys, ds = tile(lattice, theta, px.min() - 2, py.min() - 2,
+                      px.max() + reach, py.max() + reach)
+    bounds = tree_bounds(xs, ys, ds)
+
+    # The best window for N has its left edge on some tree's min x and its
+    # bottom edge on some tree's min y. Shifting a window by a lattice
+    # vector does not change what it holds, so only origins inside P count.
+    ox = np.unique(bounds[:, 0][(bounds[:, 0] >= px.min()) & (bounds[:, 0] <= px.max())])
+    oy = np.unique(bounds[:, 1][(bounds[:, 1] >= py.min()) & (bounds[:, 1] <= py.max())])
+    gx, gy = np.meshgrid(ox, oy, indexing='ij')
+    origins = np.column_stack([gx.ravel(), gy.ravel()])
+    frac = origins @ np.linalg.inv(basis).T
+    eps = 1e-12
+    origins = origins[((frac >= -eps) & (frac < 1 + eps)).all(axis=1)]
+    return (xs, ys, ds), bounds, origins
+
+def _reach(bounds, origins):
+    # Side of the square at each origin needed to hold each tree (inf for
+    # trees that start left of or below the origin), shape (origins, trees)
+    ox, oy = origins[:, :1], origins[:, 1:]
+    r = np.maximum(bounds[None, :, 2] - ox, bounds[None, :, 3] - oy)
+    r[(bounds[None, :, 0] < ox) | (bounds[None, :, 1] < oy)] = np.inf
+    return r
+
+def best_crops(lattice, theta, max_n=MAX_N):
+    """Smallest square side for every N <= max_n in one orientation.
+
+    Returns (sides, origins): arrays of length max_n + 1 indexed by N (index
+    0 unused), with the window origin that achieves each side.
+    """
+    _, bounds, origins = _window(lattice, theta, max_n)
+    sides = np.full(max_n + 1, np.inf)
+    best = np.zeros((max_n + 1, 2))
+    m = min(max_n, len(bounds))
+    for start in range(0, len(origins), CHUNK):
+        chunk = origins[start:start + CHUNK]
+        # Sorted reach: column N-1 is the side needed for N trees
+        r = np.sort(_reach(bounds, chunk), axis=1)[:, :m]
+        idx = r.argmin(axis=0)
+        side = r[idx, np.arange(m)]
+        better = side < sides[1:m + 1]
+        sides[1:m + 1][better] = side[better]
+        best[1:m + 1][better] = chunk[idx[better]]
+    return sides, best
+
+def crop(lattice, theta, origin, n, max_n=MAX_N):
+    """The n trees of the best window at origin, as (xs, ys, degs)."""
+    (xs, ys, ds), bounds, _ = _window(lattice, theta, max_n)
+    r = _reach(bounds, np.asarray(origin, dtype=np.float64)[None, :])[0]
+    pick = np.argsort(r, kind='stable')[:n]
+    return xs[pick], ys[pick], ds[pick] % 360.0
+
+def _separate(xs, ys, degs):
+    # Spread about the centre until no pair overlaps; None if it never does
+    cx, cy = xs.mean(), ys.mean()
+    factor = SPREAD
+    for _ in range(SPREAD_ROUNDS):
+        if not len(overlapping_pairs(tree_vertices(xs, ys, degs))[0]):
+            return xs, ys
+        xs = cx + (xs - cx) * (1 + factor)
+        ys = cy + (ys - cy) * (1 + factor)
+        factor *= 2
+    return None
+
+def compute_seeds(lattices, max_n=MAX_N, angle_step=ANGLE_STEP):
+    """{n: {'side', 'trees'}} over all cells and orientations, n = 1..max_n."""
+    sides = np.full(max_n + 1, np.inf)
+    source = [None] * (max_n + 1)
+    for li, lattice in enumerate(lattices):
+        for theta in np.arange(0.0, 90.0, angle_step):
+            s, origin = best_crops(lattice, float(theta), max_n)
+            better = s < sides
+            sides[better] = s[better]
+            for n in np.nonzero(better)[0]:
+                source[n] = (li, float(theta), origin[n])
+
+    seeds = {}
+    for n in range(1, max_n + 1):
+        if source[n] is None:
+            continue
+        li, theta, origin = source[n]
+        xs, ys, degs = crop(lattices[li], theta, origin, n, max_n)
+        spread = _separate(xs, ys, degs)
+        if spread is None:
+            continue
+        xs, ys = spread
+        bounds = tree_bounds(xs, ys, degs)
+        side = float(max(bounds[:, 2].max() - bounds[:, 0].min(), bounds[:, 3].max() - bounds[:, 1].min()))
+        seeds[n] = {
+            'side': side,
+            'lattice': li,
+            'theta': theta,
+            'trees': np.column_stack([xs, ys, degs]).tolist(),
+        }
+    return seeds
+
+def cached_seeds(lattice_file=LATTICE_FILE, cache_file=CACHE_FILE):
+    """Seeds of every group, recomputed only when lattice_file changes."""
+    with open(lattice_file, 'rb') as f:
+        digest = hashlib.sha1(f.read() + repr((ANGLE_STEP, MAX_N)).encode()).hexdigest()
+    try:
+        with open(cache_file, 'r') as f:
+            cache = json.load(f)
+        if cache.get('version') == CACHE_VERSION and cache.get('hash') == digest:
+            return {int(n): entry for n, entry in cache['groups'].items()}
+    except (FileNotFoundError, ValueError):
+        pass
+
+    seeds = compute_seeds(load_lattices(lattice_file))
+    tmp = cache_file + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'version': CACHE_VERSION, 'hash': digest,
+                   'groups': {str(n): seeds[n] for n in sorted(seeds)}}, f)
+    os.replace(tmp, cache_file)
+    return seeds
+
+def lattice_seed(n, lattice_file=LATTICE_FILE):
+    """(xs, ys, degs) of group N's lattice seed, or None without lattices."""
+    if not os.path.exists(lattice_file):
+        return None
+    entry = cached_seeds(lattice_file).get(n)
+    if entry is None:
+        return None
+    xs, ys, degs = np.array(entry['trees']).T
+    return xs, ys, degs
+
+def seed_rows(n, entry):
+    """Submission CSV lines of a cached seed entry."""
+    return [f"{n:03d}_{i},s{x!r},s{y!r},s{d!r}" for i, (x, y, d) in enumerate(entry['trees'])]
+
+def main():
+    # Imported here: optimize_manager is only needed to run the optimizer
+    from optimize_manager import SUBMISSION_FILE, compile_optimizer, run_optimizer_for_group
+    from score_calculator import cached_group_scores
+
+    parser = argparse.ArgumentParser(description="Lattice-tiling seeds for large groups")
+    parser.add_argument("--lattices", default=LATTICE_FILE, help="Unit cells written by lattice_solver")
+    parser.add_argument("--groups", type=str, help="N to seed, e.g. '100-200' (default: seeds within SLACK of the current side)")
+    parser.add_argument("--optimize", action="store_true", help="Optimize each seed with single_group_optimizer and merge improvements")
+    parser.add_argument("--iter", type=int, default=10000)
+    parser.add_argument("--restarts", type=int, default=16)
+    parser.add_argument("--time-budget", type=float, default=None)
+    args = parser.parse_args()
+
+    seeds = cached_seeds(args.lattices)
+    current = cached_group_scores(SUBMISSION_FILE) if os.path.exists(SUBMISSION_FILE) else {}
+
+    if args.groups:
+        groups = []
+        for part in args.groups.split(','):
+            lo, _, hi = part.partition('-')
+            groups.extend(range(int(lo), int(hi or lo) + 1))
+        missing = [n for n in groups if n not in seeds]
+        if missing:
+            print(f"No lattice seed for N={missing}, skipping")
+        groups = [n for n in groups if n in seeds]
+    else:
+        groups = [n for n in sorted(seeds)
+                  if n not in current or seeds[n]['side'] <= current[n]['side'] * (1 + SLACK)]
+
+    for n in groups:
+        have = current[n]['side'] if n in current else float('nan')
+        print(f"N={n}: lattice side {seeds[n]['side']:.6f}, current {have:.6f}")
+
+    if args.optimize:
+        if not compile_optimizer():
+            return
+        for n in groups:
+            run_optimizer_for_group(n, args.iter, args.restarts, time_budget=args.time_budget,
+                                    rows=seed_rows(n, seeds[n]))
+
+if __name__ == '__main__':
+    main()
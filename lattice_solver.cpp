@@ -1,9 +1,10 @@
 #include <algorithm>
 #include <cmath>
-#include <ctime>
+#include <fstream>
 #include <iomanip>
 #include <iostream>
 #include <random>
+#include <string>
 #include <vector>
 
 // Use standard math constants
@@ -94,155 +95,280 @@ inline bool overlap(const Poly &a, const Poly &b) {
   return false;
 }
 
+// overlap(a, b moved by (dx, dy)); b is only copied once the boxes touch
+inline bool overlapAt(const Poly &a, const Poly &b, double dx, double dy) {
+  if (a.x1 < b.x0 + dx || b.x1 + dx < a.x0 || a.y1 < b.y0 + dy ||
+      b.y1 + dy < a.y0)
+    return false;
+  Poly s = b;
+  for (int k = 0; k < NV; ++k) {
+    s.px[k] += dx;
+    s.py[k] += dy;
+  }
+  s.x0 += dx;
+  s.x1 += dx;
+  s.y0 += dy;
+  s.y1 += dy;
+  return overlap(a, s);
+}
+
+// Area of one tree and the file the ranked cells are written to
+constexpr double TREE_AREA = 0.245625;
+const char *LATTICE_FILE = "lattices.json";
+
 // Config Struct
 struct Config {
   double x, y, deg;
 };
 
-// Canonical Lattice Check
-// Basis: (a, 0), (b, c)
-bool check_lattice_validity(const Config &t1, const Config &t2, double a,
-                            double b, double c) {
-  Poly p1, p2;
-  getPoly(t1.x, t1.y, t1.deg, p1);
-  getPoly(t2.x, t2.y, t2.deg, p2);
+// Periodic cell: basis (a, 0), (b, c) and k trees, tree 0 at the origin.
+// Trees other than tree 0 are kept inside the fundamental parallelogram,
+// which is the same tiling and keeps the cell's box small.
+struct Cell {
+  double a, b, c;
+  vector<Config> t;
+  vector<Poly> p;
+  double area() const { return a * c; }
+  double density() const { return t.size() * TREE_AREA / area(); }
+};
 
-  if (overlap(p1, p2))
-    return false;
+void wrapTree(Cell &cl, int i) {
+  Config &t = cl.t[i];
+  if (i == 0) {
+    t.x = t.y = 0;
+  } else {
+    double j = floor(t.y / cl.c);
+    t.x -= j * cl.b;
+    t.y -= j * cl.c;
+    t.x -= floor((t.x - cl.b * t.y / cl.c) / cl.a) * cl.a;
+  }
+  getPoly(t.x, t.y, t.deg, cl.p[i]);
+}
 
-  // Bounds check to avoid long slivers
-  if (a > 5.0 || c > 5.0)
-    return false;
+struct Offset {
+  double dx, dy;
+  bool half; // in the half plane j > 0 || (j == 0 && i > 0)
+};
 
-  // Check Neighbors
-  // Tree Size approx 1.0. Distance check 3.0 safe.
-  // Range 3
-  for (int i = -3; i <= 3; ++i) {
-    for (int j = -3; j <= 3; ++j) {
+// Lattice offsets that can bring two trees of the cell into contact: both
+// sit in the cell's box, so the offset must move that box onto itself.
+vector<Offset> neighbourOffsets(const Cell &cl) {
+  double x0 = 1e9, y0 = 1e9, x1 = -1e9, y1 = -1e9;
+  for (const Poly &q : cl.p) {
+    x0 = min(x0, q.x0);
+    y0 = min(y0, q.y0);
+    x1 = max(x1, q.x1);
+    y1 = max(y1, q.y1);
+  }
+  double w = x1 - x0, h = y1 - y0;
+  vector<Offset> offs;
+  int nj = (int)floor(h / cl.c);
+  for (int j = -nj; j <= nj; ++j) {
+    int i0 = (int)ceil((-w - j * cl.b) / cl.a);
+    int i1 = (int)floor((w - j * cl.b) / cl.a);
+    for (int i = i0; i <= i1; ++i) {
       if (i == 0 && j == 0)
         continue;
+      offs.push_back({i * cl.a + j * cl.b, j * cl.c, j > 0 || (j == 0 && i > 0)});
+    }
+  }
+  return offs;
+}
 
-      double dx = i * a + j * b;
-      double dy = j * c;
-
-      if (dx * dx + dy * dy > 9.0)
-        continue;
-
-      Poly p1_shift, p2_shift;
-
-      // Shift T1
-      p1_shift = p1;
-      for (int k = 0; k < NV; ++k) {
-        p1_shift.px[k] += dx;
-        p1_shift.py[k] += dy;
-      }
-      p1_shift.x0 += dx;
-      p1_shift.x1 += dx;
-      p1_shift.y0 += dy;
-      p1_shift.y1 += dy;
+// No two trees of the tiling overlap. With only >= 0 just the pairs
+// involving tree `only` are checked (the rest did not move).
+bool cellValid(const Cell &cl, int only = -1) {
+  int k = cl.t.size();
+  // Bounds check to avoid long slivers
+  if (cl.a > 5.0 + k || cl.c > 5.0 + k)
+    return false;
 
-      if (overlap(p1, p1_shift))
+  for (int p = 0; p < k; ++p)
+    for (int q = p + 1; q < k; ++q)
+      if ((only < 0 || p == only || q == only) && overlap(cl.p[p], cl.p[q]))
         return false;
 
-      // Shift T2
-      p2_shift = p2;
-      for (int k = 0; k < NV; ++k) {
-        p2_shift.px[k] += dx;
-        p2_shift.py[k] += dy;
+  // Offsets s and -s give the same pairs with p and q swapped, so a tree
+  // against its own copies needs only half of them
+  for (const Offset &o : neighbourOffsets(cl)) {
+    for (int p = 0; p < k; ++p) {
+      if (only >= 0 && p != only)
+        continue;
+      for (int q = 0; q < k; ++q) {
+        if (q == p ? !o.half : (only < 0 && q < p))
+          continue;
+        if (overlapAt(cl.p[p], cl.p[q], o.dx, o.dy))
+          return false;
       }
-      p2_shift.x0 += dx;
-      p2_shift.x1 += dx;
-      p2_shift.y0 += dy;
-      p2_shift.y1 += dy;
-
-      if (overlap(p2, p2_shift))
-        return false;
-
-      // Cross check
-      if (overlap(p1, p2_shift))
-        return false;
-      if (overlap(p2, p1_shift))
-        return false;
     }
   }
   return true;
 }
 
-int main() {
-  srand(time(0));
-
-  double a = 1.0;
-  double b = 0.0;
-  double c = 1.0;
-
-  Config t1 = {0, 0, 0};
-  Config t2 = {0.5, 0.5, 180};
-
-  double best_area = 1e9;
-
-  // Multi-start SA
-  for (int restart = 0; restart < 10; ++restart) {
-    double T = 0.5;
-    double cooling = 0.99995;
-
-    while (T > 1e-6) {
-      double n_a = a + ((rand() % 1000) / 500.0 - 1.0) * T * 0.5;
-      if (n_a < 0.5)
-        n_a = 0.5;
-
-      double n_b = b + ((rand() % 1000) / 500.0 - 1.0) * T * 0.5;
-
-      double n_c = c + ((rand() % 1000) / 500.0 - 1.0) * T * 0.5;
-      if (n_c < 0.5)
-        n_c = 0.5;
-
-      Config n_t2 = t2;
-      n_t2.x += ((rand() % 1000) / 500.0 - 1.0) * T;
-      n_t2.y += ((rand() % 1000) / 500.0 - 1.0) * T;
-      n_t2.deg += ((rand() % 1000) / 500.0 - 1.0) * T * 180.0;
-
-      // Bound T2 to Unit Cell
-      if (n_t2.x > 3.0)
-        n_t2.x = 3.0;
-      if (n_t2.x < -3.0)
-        n_t2.x = -3.0;
-      if (n_t2.y > 3.0)
-        n_t2.y = 3.0;
-      if (n_t2.y < -3.0)
-        n_t2.y = -3.0;
-
-      double area = n_a * n_c;
-
-      if (check_lattice_validity(t1, n_t2, n_a, n_b, n_c)) {
-        double diff = area - (a * c);
-        if (diff < 0 || (exp(-diff / T) > (rand() / (double)RAND_MAX))) {
-          a = n_a;
-          b = n_b;
-          c = n_c;
-          t2 = n_t2;
-          if (area < best_area) {
-            best_area = area;
-            cout << "\nNew Best R" << restart << " Area=" << best_area << endl;
-            cout << "  Lat: a=" << a << " b=" << b << " c=" << c << endl;
-            cout << "  T2: x=" << t2.x << " y=" << t2.y << " deg=" << t2.deg
-                 << endl;
-          }
-        }
+inline uint64_t splitmix64(uint64_t x) {
+  x += 0x9e3779b97f4a7c15ULL;
+  x = (x ^ (x >> 30)) * 0xbf58476d1ce4e5b9ULL;
+  x = (x ^ (x >> 27)) * 0x94d049bb133111ebULL;
+  return x ^ (x >> 31);
+}
+
+// One SA run for a k-tree cell. Each step moves the basis or one tree;
+// the energy is the cell area.
+Cell anneal(int k, uint64_t seed) {
+  mt19937_64 rng(seed);
+  uniform_real_distribution<double> uni(-1.0, 1.0), unit(0.0, 1.0);
+
+  // A loose start that is valid for any rotations: 1.7 > tree diameter
+  Cell cl;
+  cl.a = 1.7 * k;
+  cl.b = 0.0;
+  cl.c = 1.7;
+  cl.t.resize(k);
+  cl.p.resize(k);
+  for (int i = 0; i < k; ++i) {
+    cl.t[i] = {1.7 * i, 0.85 * unit(rng), unit(rng) * 360.0};
+    wrapTree(cl, i);
+  }
+
+  Cell best = cl;
+  double T = 0.5;
+  double cooling = 1.0 - 5e-5 / k;
+  while (T > 1e-6) {
+    Cell n = cl;
+    int which = rng() % (k + 1);
+    if (which == k) {
+      n.a = max(0.5, n.a + uni(rng) * T * 0.5);
+      n.b += uni(rng) * T * 0.5;
+      n.c = max(0.5, n.c + uni(rng) * T * 0.5);
+      // Trees keep their fractional coordinates, so the cell is squeezed
+      // or stretched with them
+      for (int i = 1; i < k; ++i) {
+        Config &t = n.t[i];
+        double v = t.y / cl.c, u = (t.x - cl.b * v) / cl.a;
+        t.x = u * n.a + v * n.b;
+        t.y = v * n.c;
+      }
+      // Same lattice with b in [-a/2, a/2]
+      n.b -= round(n.b / n.a) * n.a;
+      for (int i = 0; i < k; ++i)
+        wrapTree(n, i);
+    } else {
+      Config &t = n.t[which];
+      t.x += uni(rng) * T;
+      t.y += uni(rng) * T;
+      t.deg = fmod(t.deg + uni(rng) * T * 180.0, 360.0);
+      wrapTree(n, which);
+    }
+
+    if (cellValid(n, which == k ? -1 : which)) {
+      double diff = n.area() - cl.area();
+      if (diff < 0 || (exp(-diff / T) > unit(rng))) {
+        cl = n;
+        if (cl.area() < best.area())
+          best = cl;
       }
-      T *= cooling;
     }
-    // Jolt
-    a = 1.2;
-    b = 0.0;
-    c = 1.2;
-    t2.x = ((rand() % 200) / 100.0);
-    t2.y = ((rand() % 200) / 100.0);
-    t2.deg = rand() % 360;
-  }
-
-  cout << "\n\nFinal Robust Area: " << best_area << endl;
-  cout << "Vectors: (" << a << ",0), (" << b << "," << c << ")" << endl;
-  cout << "Tree Density: " << (0.245625 * 2) / best_area << endl;
+    T *= cooling;
+  }
+  return best;
+}
+
+// "--trees 1,2,4" style lists
+vector<int> parseList(const string &s) {
+  vector<int> v;
+  size_t pos = 0;
+  while (pos < s.size()) {
+    size_t end = s.find(',', pos);
+    if (end == string::npos)
+      end = s.size();
+    v.push_back(stoi(s.substr(pos, end - pos)));
+    pos = end + 1;
+  }
+  return v;
+}
+
+// --seed S makes a run reproducible; without it a seed is drawn and
+// printed, so any run can be repeated
+uint64_t parseSeed(int argc, char **argv) {
+  for (int i = 1; i + 1 < argc; i++)
+    if (string(argv[i]) == "--seed")
+      return stoull(argv[i + 1]);
+  return random_device{}();
+}
+
+// Usage: lattice_solver [--trees 1,2,3,4] [--restarts R] [--keep K]
+//                       [--seed S] [-o lattices.json]
+// Every (k, restart) is an independent SA with its own RNG stream, run in
+// parallel with OpenMP; the results do not depend on the thread count.
+int main(int argc, char **argv) {
+  uint64_t seed = parseSeed(argc, argv);
+  vector<int> trees = {1, 2, 3, 4};
+  int restarts = 10, keep = 10;
+  string outFile = LATTICE_FILE;
+  for (int i = 1; i + 1 < argc; i++) {
+    string arg = argv[i];
+    if (arg == "--trees")
+      trees = parseList(argv[++i]);
+    else if (arg == "--restarts")
+      restarts = stoi(argv[++i]);
+    else if (arg == "--keep")
+      keep = stoi(argv[++i]);
+    else if (arg == "-o")
+      outFile = argv[++i];
+  }
+  cout << "Seed: " << seed << endl;
+
+  vector<pair<int, int>> tasks;
+  for (int k : trees)
+    for (int r = 0; r < restarts; ++r)
+      tasks.push_back({k, r});
+  vector<Cell> found(tasks.size());
+
+#pragma omp parallel for schedule(dynamic)
+  for (int i = 0; i < (int)tasks.size(); ++i) {
+    auto [k, r] = tasks[i];
+    found[i] = anneal(k, splitmix64(splitmix64(seed ^ k) ^ r));
+#pragma omp critical
+    cout << "k=" << k << " R" << r << " Area=" << found[i].area()
+         << " Density=" << found[i].density() << endl;
+  }
+
+  // Ranked by density; restarts that found the same cell are kept once
+  stable_sort(found.begin(), found.end(), [](const Cell &x, const Cell &y) {
+    return x.density() > y.density();
+  });
+  vector<Cell> ranked;
+  for (const Cell &cl : found) {
+    bool dup = false;
+    for (const Cell &o : ranked)
+      dup |= o.t.size() == cl.t.size() &&
+             fabs(o.density() - cl.density()) < 1e-6;
+    if (!dup && (int)ranked.size() < keep)
+      ranked.push_back(cl);
+  }
+
+  cout << "\n\nBest Area: " << ranked[0].area() << " (" << ranked[0].t.size()
+       << " trees)" << endl;
+  cout << "Vectors: (" << ranked[0].a << ",0), (" << ranked[0].b << ","
+       << ranked[0].c << ")" << endl;
+  cout << "Tree Density: " << ranked[0].density() << endl;
+
+  // Unit cells for lattice_seeder.py, best first: basis (a, 0), (b, c)
+  // and the trees of one cell as (x, y, deg)
+  ofstream out(outFile);
+  out << setprecision(17) << "{\"lattices\": [";
+  for (size_t i = 0; i < ranked.size(); ++i) {
+    const Cell &cl = ranked[i];
+    out << (i ? ",\n  " : "\n  ") << "{\"a\": " << cl.a << ", \"b\": " << cl.b
+        << ", \"c\": " << cl.c << ", \"trees\": [";
+    for (size_t j = 0; j < cl.t.size(); ++j)
+      out << (j ? ", " : "") << "[" << cl.t[j].x << ", " << cl.t[j].y << ", "
+          << cl.t[j].deg << "]";
+    out << "], \"area\": " << cl.area() << ", \"density\": " << cl.density()
+        << "}";
+  }
+  out << "\n]}\n";
+  cout << "Wrote " << ranked.size() << " cells to " << outFile << endl;
 
   return 0;
 }
@@ -1,17 +1,59 @@
 import os
+import json
 import subprocess
 import csv
 import time
 import math
+import random
 import argparse
-from concurrent.futures import ThreadPoolExecutor
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from score_calculator import cached_group_scores, group_sides, parse_rows, read_group_rows, write_group_rows
+from rotate_groups import rotate_submission
+from validate import validate_arrays
 
 # Configuration
 BINARY_NAME = "./single_group_optimizer"
 SOURCE_NAME = "single_group_optimizer.cpp"
 SUBMISSION_FILE = "submission.csv"
 OUTPUT_FILE = "submission.csv" # Overwrite by default to save progress
-COMPILE_CMD = f"g++ -O3 -march=native -std=c++17 -o {BINARY_NAME} {SOURCE_NAME}"
+COMPILE_CMD = f"g++ -O3 -march=native -std=c++17 -fopenmp -o {BINARY_NAME} {SOURCE_NAME}"
+CHECKPOINT_DIR = "checkpoints"
+
+def checkpoint_path(n, checkpoint_dir=CHECKPOINT_DIR):
+    """Per-group PT state file used by the binary's --checkpoint."""
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    return os.path.join(checkpoint_dir, f"g{n:03d}.ckpt")
+
+def job_seed(base_seed, n, run):
+    """Seed for the run-th job on group N of a session started with base_seed.
+
+    Every job gets its own seed, so repeated runs of a group explore new
+    trajectories, while a session can be replayed from its base seed.
+    """
+    return (base_seed * 1000003 + run * 1009 + n) % 2**63
+
+def parse_telemetry(line):
+    """Event dict of one --json telemetry line of the binary's log, else None."""
+    if not line.startswith('{'):
+        return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+def describe_result(event):
+    """One-line summary of a "result" telemetry event."""
+    moves = event['moves']
+    attempted = sum(m['attempted'] for m in moves.values())
+    accepted = sum(m['accepted'] for m in moves.values())
+    checks = event['overlap_checks']
+    rates = event['swap_rates']
+    return (f"side {event['initial_side']:.9f} -> {event['final_side']:.9f}, "
+            f"{event['cycles']} cycles, {attempted / max(event['wall_time'], 1e-9):.0f} moves/s, "
+            f"{accepted}/{attempted} accepted, {checks['pairs']} pair checks "
+            f"({checks['narrow']} narrow), swap rate "
+            f"{sum(rates) / len(rates) if rates else 0:.2f}, {event['threads']} threads")
 
 def compile_optimizer():
     """Compiles the C++ optimizer."""
@@ -24,6 +66,13 @@ def compile_optimizer():
         print(f"Compilation failed: {e}")
         return False
 
+def ensure_optimizer():
+    """Compile the optimizer unless the binary is newer than its source."""
+    if (os.path.exists(BINARY_NAME)
+            and os.path.getmtime(BINARY_NAME) >= os.path.getmtime(SOURCE_NAME)):
+        return True
+    return compile_optimizer()
+
 def load_scores(filename):
     """Loads scores (area) for each N from the CSV file."""
     scores = {}
@@ -69,74 +118,180 @@ def load_scores(filename):
     
     return data
 
-def run_optimizer_for_group(n, iterations=5000, restarts=4):
-    """Runs the C++ optimizer for a specific group N."""
+# Serializes merges into OUTPUT_FILE between worker threads
+MERGE_LOCK = threading.Lock()
+
+def merge_group(n, lines, filename=OUTPUT_FILE):
+    """Merges one group's rows into filename if they are a valid improvement.
+
+    Runs under MERGE_LOCK and re-reads the master file, so it always compares
+    against (and keeps) whatever other workers merged in the meantime.
+    """
+    ns, xs, ys, degs = parse_rows(lines)
+    if len(ns) != n or validate_arrays(ns, xs, ys, degs):
+        print(f"[{n}] Fragment rejected (wrong size or overlapping trees)")
+        return False
+    new_side = group_sides(ns, xs, ys, degs)[n]
+
+    old_side = float('inf')
+    with MERGE_LOCK:
+        groups = read_group_rows(filename)
+        if n in groups:
+            old_side = group_sides(*parse_rows(groups[n]))[n]
+            if not new_side < old_side - 1e-12:
+                return False
+        groups[n] = lines
+        write_group_rows(filename, groups)
+
+    print(f"[{n}] \033[92mMerged improvement: side {old_side:.12f} -> {new_side:.12f}\033[0m")
+    return True
+
+def run_optimizer_for_group(n, iterations=5000, restarts=4, threads=None,
+                            time_budget=None, checkpoint_dir=None, seed=None, rows=None):
+    """Runs the C++ optimizer for a specific group N.
+
+    Only group N's rows are piped to the binary (--group-only, stdin/stdout)
+    and the returned fragment is merged into OUTPUT_FILE, so concurrent runs
+    never clobber each other. threads sets OMP_NUM_THREADS for this run.
+    time_budget (seconds) keeps the binary annealing until it is used up;
+    with checkpoint_dir the replica state is saved there and the next run
+    of the same group resumes from it instead of starting over. seed is
+    passed to the binary's --seed (a resumed run keeps its stored seed).
+    rows starts from other CSV lines (e.g. a lattice seed) instead of the
+    group in SUBMISSION_FILE; the merge still only keeps an improvement.
+    """
     env = os.environ.copy()
-    env["GROUP_NUMBER"] = str(n)
-    
+    if threads:
+        env["OMP_NUM_THREADS"] = str(threads)
+
+    if rows is None:
+        rows = read_group_rows(SUBMISSION_FILE).get(n)
+    if not rows:
+        print(f"[{n}] Group missing from {SUBMISSION_FILE}")
+        return False
+
     cmd = [
         BINARY_NAME, 
-        "-i", SUBMISSION_FILE, 
-        "-o", OUTPUT_FILE, 
+        "-g", str(n),
+        "--group-only",
+        "-i", "-", 
+        "-o", "-", 
         "-n", str(iterations), 
-        "-r", str(restarts)
+        "-r", str(restarts),
+        "--json"
     ]
+    if time_budget:
+        cmd += ["--time-budget", str(time_budget)]
+    if checkpoint_dir:
+        cmd += ["--checkpoint", checkpoint_path(n, checkpoint_dir)]
+    if seed is not None:
+        cmd += ["--seed", str(seed)]
     
-    print(f"[{n}] Starting optimization (Iter: {iterations}, Restarts: {restarts})...")
+    print(f"[{n}] Starting optimization (Iter: {iterations}, Restarts: {restarts}, Threads: {threads or 'all'}, Seed: {seed})...")
     start_time = time.time()
     
     try:
-        # Capture stdout to see if it improved
+        # Group rows in on stdin, optimized rows out on stdout, log on stderr
         result = subprocess.run(
             cmd, 
             env=env, 
+            input="id,x,y,deg\n" + "\n".join(rows) + "\n",
             capture_output=True, 
             text=True
         )
         
         duration = time.time() - start_time
-        output = result.stdout
-        
-        # Check for improvement message
-        # The C++ code prints "IMPROVEMENT! New score: ..." if it writes?
-        # Actually checking the C++ code:
-        # It loads, optimizes, and expects to WRITE to 'out'.
-        # It doesn't seem to rewrite the WHOLE file, just the group?
-        # Wait, the `saveCSV` function in C++ iterates 1..200 and writes ALL.
-        # This implies the C++ tool is designed to read the whole file and write the whole file.
-        # THIS IS DANGEROUS FOR CONCURRENCY.
-        # If we run multiple in parallel, they will overwrite each other's changes to other groups.
-        
-        # FIX: We can only run ONE instance at a time if the C++ tool rewrites the whole file.
-        # Unless we modify the C++ tool to output just the lines for this group, 
-        # and we integrate them in Python.
-        
-        # For now, let's run SEQUENTIALLY to be safe, or just use the tool's internal parallelism (OpenMP).
-        # The tool uses OpenMP, so it's already using multiple cores for ONE group.
-        # So running sequentially by group is actually efficient for CPU usage.
         
         if result.returncode != 0:
             print(f"[{n}] Failed: {result.stderr}")
-            return
+            return False
             
         print(f"[{n}] Finished in {duration:.2f}s.")
         
-        improved = False
-        for line in output.splitlines():
-            if "IMPROVED" in line or "New best" in line:
-                print(f"[{n}] \033[92m{line}\033[0m")
-                improved = True
-            elif "Initial score" in line:
-                print(f"[{n}] {line}")
-                
-        # Adaptive Strategy: If no improvement and iterations were low, boost them next time?
-        # Or better: return status to caller to decide.
-        return improved
+        for line in result.stderr.splitlines():
+            event = parse_telemetry(line)
+            if event and event['event'] == 'result':
+                print(f"[{n}] {describe_result(event)}")
+                if event['overlap']:
+                    print(f"[{n}] WARNING: optimizer result still overlaps")
+
+        # Improvement is decided by the merge, not by the binary's messages
+        lines = [l for l in result.stdout.splitlines()[1:] if l.strip()]
+        return merge_group(n, lines)
 
     except Exception as e:
         print(f"[{n}] Error execution: {e}")
         return False
 
+def run_engine_for_group(n, iterations=5000, restarts=4, threads=None,
+                         time_budget=None, seed=None):
+    """Like run_optimizer_for_group, but through the in-process engine.
+
+    The group goes to the C++ code as NumPy arrays (see sgo_engine); the GIL
+    is released while it runs, so --jobs threads really run in parallel.
+    """
+    # The engine builds a shared library on first use, so import it lazily
+    import sgo_engine
+
+    rows = read_group_rows(SUBMISSION_FILE).get(n)
+    if not rows:
+        print(f"[{n}] Group missing from {SUBMISSION_FILE}")
+        return False
+
+    print(f"[{n}] Starting in-process optimization (Iter: {iterations}, Restarts: {restarts}, Threads: {threads or 'all'}, Seed: {seed})...")
+    start_time = time.time()
+    _, xs, ys, degs = parse_rows(rows)
+    xs, ys, degs, improved = sgo_engine.optimize(
+        xs, ys, degs, iterations, restarts, time_budget=time_budget,
+        seed=42 if seed is None else seed, threads=threads)
+    print(f"[{n}] Finished in {time.time() - start_time:.2f}s.")
+    if not improved:
+        return False
+
+    lines = [f"{n:03d}_{i},s{x!r},s{y!r},s{d!r}"
+             for i, (x, y, d) in enumerate(zip(xs.tolist(), ys.tolist(), degs.tolist()))]
+    return merge_group(n, lines)
+
+def run_cascade(passes=1, threads=None):
+    """Rebuilds every group from its neighbours with the binary's --cascade.
+
+    Group N is re-derived from N+1 minus a boundary tree and from N-1 plus a
+    tree in its largest gap (compacted in C++, all groups in parallel); the
+    groups the binary replaced are merged into OUTPUT_FILE. Returns the
+    groups that were merged.
+    """
+    env = os.environ.copy()
+    if threads:
+        env["OMP_NUM_THREADS"] = str(threads)
+    out = OUTPUT_FILE + ".cascade.tmp"
+    cmd = [BINARY_NAME, "--cascade", str(passes), "-i", SUBMISSION_FILE, "-o", out, "--json"]
+
+    print(f"Cascade over all groups ({passes} passes, Threads: {threads or 'all'})...")
+    try:
+        result = subprocess.run(cmd, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"Cascade failed: {result.stderr}")
+            return []
+
+        derived = {}
+        for line in result.stdout.splitlines():
+            event = parse_telemetry(line)
+            if event and event['event'] == 'cascade':
+                derived[event['n']] = event
+            elif event and event['event'] == 'cascade_done':
+                print(f"Cascade replaced {event['replaced']} groups in {event['wall_time']:.1f}s")
+
+        groups = read_group_rows(out)
+        merged = []
+        for n, event in sorted(derived.items()):
+            print(f"[{n}] Derived from N={event['source']}: side {event['initial_side']:.9f} -> {event['final_side']:.9f}")
+            if merge_group(n, groups[n]):
+                merged.append(n)
+        return merged
+    finally:
+        if os.path.exists(out):
+            os.remove(out)
+
 def main():
     parser = argparse.ArgumentParser(description="Manager for Santa 2025 Optimizer")
     parser.add_argument("--groups", type=str, help="Comma-separated list of N to optimize (e.g., '1,2,3' or '1-10')")
@@ -144,103 +299,35 @@ def main():
     parser.add_argument("--restarts", type=int, default=16, help="Number of Replica Exchange cycles (formerly restarts)")
     parser.add_argument("--loop", action="store_true", help="Infinite loop over groups")
     parser.add_argument("--score", action="store_true", help="Calculate total score of the submission file")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of groups optimized concurrently")
+    parser.add_argument("--threads", type=int, default=None, help="OpenMP threads per job (default: cores / jobs)")
+    parser.add_argument("--time-budget", type=float, default=None, help="Seconds of annealing per group run (instead of a fixed number of cycles)")
+    parser.add_argument("--checkpoint-dir", type=str, default=None, help=f"Save/resume per-group replica state here (e.g. {CHECKPOINT_DIR})")
+    parser.add_argument("--in-process", action="store_true", help="Call the C++ engine through sgo_engine instead of running the binary")
+    parser.add_argument("--seed", type=int, default=None, help="Base seed of the session (default: random, printed so it can be replayed)")
+    parser.add_argument("--cascade", type=int, default=0, metavar="PASSES", help="Rebuild each group from N+1 and N-1 (warm-start cascade) and merge improvements")
     
     args = parser.parse_args()
     
     if args.score:
         print(f"Calculating score for {SUBMISSION_FILE}...")
-        try:
-            total_score = 0.0
-            # Read all coords
-            groups = {} # n -> list of (x,y)
-            with open(SUBMISSION_FILE, 'r') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    try:
-                        id_str = row['id']
-                        n, i = map(int, id_str.split('_'))
-                        
-                        def val(x): return float(x[1:]) if x.startswith('s') else float(x)
-                        
-                        x = val(row['x'])
-                        y = val(row['y'])
-                        
-                        if n not in groups: groups[n] = []
-                        groups[n].append((x, y))
-                    except ValueError:
-                        continue
-            
-            # Constants for polygon (approximate for bounding box check)
-            # To be exact we need the polygon vertices. 
-            # Replicating getPoly logic from C++
-            TX = [0, 0.125, 0.0625, 0.2, 0.1, 0.35, 0.075, 0.075, -0.075, -0.075, -0.35, -0.1, -0.2, -0.0625, -0.125]
-            TY = [0.8, 0.5, 0.5, 0.25, 0.25, 0, 0, -0.2, -0.2, 0, 0, 0.25, 0.25, 0.5, 0.5]
-            PI = 3.14159265358979323846
-            
-            for n in range(1, 201):
-                if n not in groups:
-                    print(f"Missing N={n}")
-                    continue
-                    
-                pts = groups[n]
-                # Calculate global bounds for this group
-                gx0, gy0, gx1, gy1 = 1e9, 1e9, -1e9, -1e9
-                
-                # For each tree, get its bounds. 
-                # Note: We don't have rotation (deg) in the simple list above?? 
-                # Wait, we need 'deg' to calculate exact bounds!
-                # I missed capturing 'deg' in the read loop above.
-                pass 
-                
-        except Exception:
-            pass
-            
-        # Let's retry reading WITH deg
-        groups = {}
-        with open(SUBMISSION_FILE, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                id_str = row['id']
-                n, i = map(int, id_str.split('_'))
-                def val(x): return float(x[1:]) if x.startswith('s') else float(x)
-                if n not in groups: groups[n] = []
-                groups[n].append((val(row['x']), val(row['y']), val(row['deg'])))
-        
-        TX = [0, 0.125, 0.0625, 0.2, 0.1, 0.35, 0.075, 0.075, -0.075, -0.075, -0.35, -0.1, -0.2, -0.0625, -0.125]
-        TY = [0.8, 0.5, 0.5, 0.25, 0.25, 0, 0, -0.2, -0.2, 0, 0, 0.25, 0.25, 0.5, 0.5]
-        PI = 3.14159265358979323846
-        
-        total_norm_area = 0.0
-        
+        entries = cached_group_scores(SUBMISSION_FILE)
         for n in range(1, 201):
-            if n not in groups:
-                 # Penalty or ignore? Challenge says 1-200 required.
-                 print(f"N={n} missing!")
-                 continue
-            
-            min_x, max_x = 1e9, -1e9
-            min_y, max_y = 1e9, -1e9
-            
-            for (x, y, d) in groups[n]:
-                rad = d * (PI / 180.0)
-                s, c = math.sin(rad), math.cos(rad)
-                for k in range(15):
-                    # Rotate and translate
-                    px = TX[k] * c - TY[k] * s + x
-                    py = TX[k] * s + TY[k] * c + y
-                    min_x = min(min_x, px)
-                    max_x = max(max_x, px)
-                    min_y = min(min_y, py)
-                    max_y = max(max_y, py)
-            
-            side = max(max_x - min_x, max_y - min_y)
-            score = (side * side) / n
-            total_norm_area += score
-            
+            if n not in entries:
+                # Penalty or ignore? Challenge says 1-200 required.
+                print(f"N={n} missing!")
+            elif entries[n]['overlap']:
+                print(f"N={n} has overlapping trees!")
+
+        total_norm_area = sum(entries[n]['score'] for n in entries if 1 <= n <= 200)
         print(f"Total Normalized Area Score: {total_norm_area:.6f}")
         return
 
-    if not compile_optimizer():
+    if not args.in_process and not compile_optimizer():
+        return
+
+    if args.cascade:
+        run_cascade(args.cascade, args.threads)
         return
 
     # Determine groups to process
@@ -268,25 +355,57 @@ def main():
 
     print(f"Processing {len(groups_to_process)} groups...")
     
+    # Split the cores between concurrent jobs. Many small OpenMP teams scale
+    # much better than one big team on a single group.
+    jobs = max(1, args.jobs)
+    threads = args.threads or (max(1, (os.cpu_count() or 1) // jobs) if jobs > 1 else None)
+    if jobs > 1:
+        print(f"Running {jobs} groups at a time with {threads} threads each")
+
     # Track "difficulty" or "stagnation" per group
     stagnation = {n: 0 for n in groups_to_process}
-    
+
+    # Each job derives its seed from the session's base seed
+    base_seed = args.seed if args.seed is not None else random.SystemRandom().getrandbits(32)
+    print(f"Base seed: {base_seed}")
+    runs = {n: 0 for n in groups_to_process}
+
+    def run_group(n):
+        # Scale parameters based on stagnation
+        current_iter = args.iter + (stagnation[n] * 2000)
+        current_restarts = args.restarts + (stagnation[n] // 2)
+        seed = job_seed(base_seed, n, runs[n])
+        runs[n] += 1
+        if args.in_process:
+            return run_engine_for_group(n, current_iter, current_restarts, threads,
+                                        args.time_budget, seed)
+        return run_optimizer_for_group(n, current_iter, current_restarts, threads,
+                                       args.time_budget, args.checkpoint_dir, seed)
+
+    def record(n, improved):
+        if improved:
+            print(f"[{n}] Improved! Resetting stagnation.")
+            stagnation[n] = 0
+        else:
+            stagnation[n] += 1
+            # Cap stagnation to avoid explosion
+            if stagnation[n] > 10: stagnation[n] = 10
+
     while True:
-        for n in groups_to_process:
-            # Scale parameters based on stagnation
-            current_iter = args.iter + (stagnation[n] * 2000)
-            current_restarts = args.restarts + (stagnation[n] // 2)
-            
-            improved = run_optimizer_for_group(n, current_iter, current_restarts)
-            
-            if improved:
-                print(f"[{n}] Improved! Resetting stagnation.")
-                stagnation[n] = 0
-            else:
-                stagnation[n] += 1
-                # Cap stagnation to avoid explosion
-                if stagnation[n] > 10: stagnation[n] = 10
+        if jobs == 1:
+            for n in groups_to_process:
+                record(n, run_group(n))
+        else:
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                futures = {pool.submit(run_group, n): n for n in groups_to_process}
+                for future in as_completed(futures):
+                    record(futures[future], future.result())
             
+        # Free gain after every sweep: turn whole groups to shrink their squares
+        turned = rotate_submission(OUTPUT_FILE)
+        if turned:
+            print(f"Rotated {len(turned)} groups to smaller bounding squares")
+
         if not args.loop:
             break
         print("--- Loop finished, restarting sequence ---")
@@ -1,122 +1,251 @@
 import math
 import random
-import time
 import numpy as np
-from shapely.geometry import Polygon
-from shapely import affinity
-import shapely.ops
-from tree_geometry import Tree
+import shapely
+from tree_geometry import LightTree, TEMPLATE, tree_vertices
+from lattice_seeder import lattice_seed
+
+# Convex hull of the tree template (tip, tier corners, trunk foot). A tree's
+# AABB is the AABB of these 5 points, which is cheap in plain Python.
+HULL = [tuple(TEMPLATE[k].tolist()) for k in (0, 5, 7, 8, 10)]
 
 class Packer:
+    # Struct-of-arrays population: x, y, deg, vertices and AABBs are NumPy
+    # arrays indexed by tree. A move rewrites one row; the global bounding
+    # box is kept incrementally together with the index of the tree that
+    # defines each side (min_x, min_y, max_x, max_y).
     def __init__(self, n_trees):
         self.n_trees = n_trees
-        self.trees = []
         self.init_population()
 
     def init_population(self):
-        # Initialize in a grid to ensure valid start (mostly)
+        # Start from the lattice seed when lattice_solver has written cells
+        seed = lattice_seed(self.n_trees)
+        if seed is not None:
+            self.set_state(*seed)
+            return
+
+        # Otherwise initialize in a grid to ensure valid start (mostly)
         # Approximate size of tree is 1.5 height, 1.4 width
         spacing = 1.5
         grid_side = math.ceil(math.sqrt(self.n_trees))
-        for i in range(self.n_trees):
-            r = i // grid_side
-            c = i % grid_side
-            self.trees.append(Tree(c * spacing, r * spacing, 0))
+        idx = np.arange(self.n_trees)
+        self.set_state(idx % grid_side * spacing, idx // grid_side * spacing, np.zeros(self.n_trees))
+
+    def set_state(self, xs, ys, degs):
+        """Replace the whole population and rebuild every derived array."""
+        self.x = np.array(xs, dtype=np.float64)
+        self.y = np.array(ys, dtype=np.float64)
+        self.deg = np.array(degs, dtype=np.float64)
+        self.verts = tree_vertices(self.x, self.y, self.deg)
+        self.aabb = np.concatenate([self.verts.min(axis=1), self.verts.max(axis=1)], axis=1)
+        self.polys = shapely.polygons(self.verts)
+        self._stale = set()
+        self._rot = np.empty((2, 2))
+        self._rebuild_bounds()
+        self._rebuild_overlap()
+
+    def _rebuild_bounds(self):
+        self.bounds_idx = [int(np.argmin(self.aabb[:, 0])), int(np.argmin(self.aabb[:, 1])),
+                           int(np.argmax(self.aabb[:, 2])), int(np.argmax(self.aabb[:, 3]))]
+        self.bounds = [float(self.aabb[i, k]) for k, i in enumerate(self.bounds_idx)]
+
+    def _update_bounds(self, i, box):
+        # Tree i changed to AABB box. A side grows in O(1); a side only needs
+        # a rescan of its column when tree i defined it and moved inwards.
+        for k in range(4):
+            lower = k < 2
+            v = box[k]
+            if (v <= self.bounds[k]) if lower else (v >= self.bounds[k]):
+                self.bounds[k] = v
+                self.bounds_idx[k] = i
+            elif self.bounds_idx[k] == i:
+                col = self.aabb[:, k]
+                j = int(np.argmin(col) if lower else np.argmax(col))
+                self.bounds_idx[k] = j
+                self.bounds[k] = float(col[j])
+
+    def move(self, i, x, y, deg):
+        """Move tree i, updating its AABB and the global bounds.
+
+        Only the AABB is computed here, in scalar maths from HULL. Vertices
+        and the shapely polygon are rebuilt by _fresh_polys() when an
+        overlap test needs them; most moves never get that far.
+        """
+        rad = math.radians(deg)
+        c, s = math.cos(rad), math.sin(rad)
+        self.x[i], self.y[i], self.deg[i] = x, y, deg
+        hx = [tx * c - ty * s for tx, ty in HULL]
+        hy = [tx * s + ty * c for tx, ty in HULL]
+        box = [min(hx) + x, min(hy) + y, max(hx) + x, max(hy) + y]
+        self.aabb[i] = box
+        self.polys[i] = None
+        self._stale.add(i)
+        self._update_bounds(i, box)
+
+    def _fresh_polys(self):
+        # Vertices and polygons of the trees moved since they were last built
+        if len(self._stale) == 1:
+            # The usual case after one move: one small matmul, no batch setup
+            i = self._stale.pop()
+            rad = math.radians(self.deg[i])
+            c, s = math.cos(rad), math.sin(rad)
+            rot = self._rot
+            rot[0, 0], rot[0, 1], rot[1, 0], rot[1, 1] = c, s, -s, c
+            v = np.matmul(TEMPLATE, rot, out=self.verts[i])
+            v[:, 0] += self.x[i]
+            v[:, 1] += self.y[i]
+            self.polys[i] = shapely.polygons(v)
+        elif self._stale:
+            idx = np.fromiter(self._stale, dtype=np.intp, count=len(self._stale))
+            self.verts[idx] = tree_vertices(self.x[idx], self.y[idx], self.deg[idx])
+            self.polys[idx] = shapely.polygons(self.verts[idx])
+            self._stale.clear()
+        return self.polys
+
+    @property
+    def trees(self):
+        # Row views as lightweight trees, e.g. for writing a submission
+        return [LightTree(x, y, d) for x, y, d in zip(self.x.tolist(), self.y.tolist(), self.deg.tolist())]
 
     def get_polygons(self):
-        return [t.get_polygon() for t in self.trees]
+        return list(self._fresh_polys())
 
     def current_score(self):
         # Metric: (max_side)^2 / n
         # But during optimization, simplified to just bounding box side or area.
-        min_x = min(t.x for t in self.trees) # Simplified center check
-        max_x = max(t.x for t in self.trees)
-        min_y = min(t.y for t in self.trees)
-        max_y = max(t.y for t in self.trees)
-        
-        # We really want the bounding box of the POLYGONS, not centers.
-        # But centers are faster. Let's use exact bounding box for final check.
-        
-        all_polys = self.get_polygons()
-        
-        # Quick bounds
-        bounds = [p.bounds for p in all_polys]
-        min_x = min(b[0] for b in bounds)
-        min_y = min(b[1] for b in bounds)
-        max_x = max(b[2] for b in bounds)
-        max_y = max(b[3] for b in bounds)
-        
+        # Global bounds of the POLYGONS are maintained on every move.
+        min_x, min_y, max_x, max_y = self.bounds
+
         width = max_x - min_x
         height = max_y - min_y
         side = max(width, height)
-        
+
         return side**2 # Minimize area of the bounding square
 
     def check_overlap(self):
-        polys = self.get_polygons()
-        # STRtree or simple loop
-        # Simple loop for now
-        total_overlap = 0.0
-        for i in range(len(polys)):
-            for j in range(i + 1, len(polys)):
-                if polys[i].intersects(polys[j]):
-                    total_overlap += polys[i].intersection(polys[j]).area
-        return total_overlap
+        # Full sweep: AABB broad phase on the arrays, shapely areas only for
+        # pairs that actually intersect
+        lo, hi = self.aabb[:, :2], self.aabb[:, 2:]
+        touch = ((lo[:, None, :] <= hi[None, :, :]) & (lo[None, :, :] <= hi[:, None, :])).all(axis=2)
+        i, j = np.nonzero(np.triu(touch, k=1))
+        if not len(i):
+            return 0.0
+        polys = self._fresh_polys()
+        hit = shapely.intersects(polys[i], polys[j])
+        if not hit.any():
+            return 0.0
+        return float(shapely.area(shapely.intersection(polys[i[hit]], polys[j[hit]])).sum())
+
+    def _rebuild_overlap(self):
+        # Pairwise overlap areas (symmetric, zero diagonal) and their total
+        self.overlap = np.zeros((self.n_trees, self.n_trees))
+        for i in range(self.n_trees):
+            self.overlap[i] = self.overlap_row(i)
+        self.overlap_total = float(np.triu(self.overlap, k=1).sum())
+
+    def overlap_row(self, i):
+        """Overlap area of tree i with every other tree, as a length-n array."""
+        row = np.zeros(self.n_trees)
+        a = self.aabb
+        x0, y0, x1, y1 = a[i].tolist()
+        touch = (a[:, 0] <= x1) & (a[:, 2] >= x0) & (a[:, 1] <= y1) & (a[:, 3] >= y0)
+        touch[i] = False
+        j = np.nonzero(touch)[0]
+        if len(j):
+            polys = self._fresh_polys()
+            hit = shapely.intersects(polys[i], polys[j])
+            j = j[hit]
+            if len(j):
+                row[j] = shapely.area(shapely.intersection(polys[i], polys[j]))
+        return row
+
+    def delta_overlap(self, i):
+        """Total overlap after tree i moved, from the cached pairwise areas.
+
+        Only tree i's row is recomputed against its AABB neighbours. Returns
+        (total, row); pass both to commit_overlap() if the move is kept.
+        """
+        row = self.overlap_row(i)
+        return self.overlap_total - self.overlap[i].sum() + row.sum(), row
+
+    def commit_overlap(self, i, total, row):
+        self.overlap[i] = row
+        self.overlap[:, i] = row
+        self.overlap_total = total
 
     def step(self, temp):
         # Mutate one tree
         idx = random.randint(0, self.n_trees - 1)
-        tree = self.trees[idx]
-        
-        old_x, old_y, old_deg = tree.x, tree.y, tree.deg
-        
+
+        # Row snapshot plus global bounds, so revert is O(1). The vertex row
+        # is only worth keeping when it is current.
+        fresh = idx not in self._stale
+        old_state = (self.x[idx], self.y[idx], self.deg[idx],
+                     self.verts[idx].copy() if fresh else None, self.aabb[idx].copy(),
+                     self.polys[idx], list(self.bounds), list(self.bounds_idx))
+
         # Adaptive move size based on temp
         move_scale = temp * 2.0
         rot_scale = temp * 180.0
-        
-        tree.x += random.uniform(-move_scale, move_scale)
-        tree.y += random.uniform(-move_scale, move_scale)
-        tree.deg += random.uniform(-rot_scale, rot_scale)
-        tree.polygon = tree._update_polygon() # Update cached poly
-        
-        return idx, old_x, old_y, old_deg
-
-    def revert(self, idx, old_x, old_y, old_deg):
-        tree = self.trees[idx]
-        tree.x = old_x
-        tree.y = old_y
-        tree.deg = old_deg
-        tree.polygon = tree._update_polygon()
-
-    def optimize(self, iterations=1000, start_temp=1.0, cooling=0.99):
-        current_energy = self.current_score() + (self.check_overlap() * 10000) # Heavy penalty
+
+        self.move(idx,
+                  self.x[idx] + random.uniform(-move_scale, move_scale),
+                  self.y[idx] + random.uniform(-move_scale, move_scale),
+                  self.deg[idx] + random.uniform(-rot_scale, rot_scale))
+
+        return idx, old_state
+
+    def revert(self, idx, old_state):
+        (self.x[idx], self.y[idx], self.deg[idx], verts, self.aabb[idx],
+         self.polys[idx], self.bounds, self.bounds_idx) = old_state
+        if verts is None:
+            self._stale.add(idx)
+        else:
+            self.verts[idx] = verts
+            self._stale.discard(idx)
+
+    def optimize(self, iterations=1000, start_temp=1.0, cooling=0.99, incremental=True):
+        # incremental: overlap from the cached pairwise areas, only the moved
+        # tree's row is recomputed. False does the full sweep every step
+        # (same energy, kept for cross-checking).
+        if not incremental:
+            self._rebuild_overlap()
+        current_energy = self.current_score() + (self.overlap_total * 10000) # Heavy penalty
         best_energy = current_energy
         temp = start_temp
-        
+
         for i in range(iterations):
-            idx, ox, oy, od = self.step(temp)
-            
-            overlap = self.check_overlap()
+            idx, old_state = self.step(temp)
+
+            if incremental:
+                overlap, row = self.delta_overlap(idx)
+            else:
+                overlap = self.check_overlap()
             score = self.current_score()
-            
+
             new_energy = score + (overlap * 10000)
-            
+
             exponent = (current_energy - new_energy) / max(temp, 1e-5)
             if exponent > 700: # math.exp overflow limit is around 709
                 prob = float('inf')
             else:
                 prob = math.exp(exponent)
-            
+
             if new_energy < current_energy or random.random() < prob:
                 current_energy = new_energy
+                if incremental:
+                    self.commit_overlap(idx, overlap, row)
                 if current_energy < best_energy:
                     best_energy = current_energy
                     print(f"Iter {i}: New Best {best_energy:.4f} (Overlap: {overlap:.4f})")
             else:
-                self.revert(idx, ox, oy, od)
-            
+                self.revert(idx, old_state)
+
             temp *= cooling
-            
+
+        if not incremental:
+            self._rebuild_overlap()
         return best_energy
 
 if __name__ == "__main__":
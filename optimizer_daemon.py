@@ -0,0 +1,94 @@
+import json
+import os
+import subprocess
+import sys
+from optimize_manager import BINARY_NAME, SUBMISSION_FILE, describe_result, ensure_optimizer
+
+class OptimizerDaemon:
+    """Client for a long-running `single_group_optimizer --daemon`.
+
+    The binary loads the submission once and keeps every group's best and
+    replica state in memory; each optimize() is one command line on its
+    stdin and one JSON reply line on its stdout, so a job costs no process
+    start, CSV parse or file write. Improved groups are merged into output
+    at most every flush_every seconds, on flush() and on close().
+    """
+
+    def __init__(self, submission=SUBMISSION_FILE, output=None, binary=BINARY_NAME,
+                 threads=None, replicas=None, seed=None, iterations=None,
+                 flush_every=60, log=None):
+        # The tracked binary can predate the daemon protocol
+        if binary == BINARY_NAME and not ensure_optimizer():
+            raise RuntimeError(f"could not build {binary}")
+        cmd = [binary, "--daemon", "-i", submission, "-o", output or submission,
+               "--flush-every", str(flush_every)]
+        if replicas:
+            cmd += ["--replicas", str(replicas)]
+        if seed is not None:
+            cmd += ["--seed", str(seed)]
+        if iterations:
+            cmd += ["-n", str(iterations)]
+        env = os.environ.copy()
+        if threads:
+            env["OMP_NUM_THREADS"] = str(threads)
+
+        # The binary's log goes to stderr; log=subprocess.DEVNULL silences it
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=log, text=True, bufsize=1, env=env)
+        self.info = self._reply()
+
+    def _reply(self):
+        line = self.proc.stdout.readline()
+        if not line:
+            raise RuntimeError(f"optimizer daemon exited (code {self.proc.wait()})")
+        event = json.loads(line)
+        if event['event'] == 'error':
+            raise ValueError(event['message'])
+        return event
+
+    def _send(self, command):
+        self.proc.stdin.write(command + "\n")
+        self.proc.stdin.flush()
+        return self._reply()
+
+    def optimize(self, n, seconds):
+        """Anneal group N for about `seconds`; returns the "result" event."""
+        return self._send(f"optimize {n} {seconds}")
+
+    def flush(self):
+        """Write improved groups now; returns the groups that were written."""
+        return self._send("flush")['groups']
+
+    def reload(self, groups):
+        """Re-read groups from the output file (e.g. after rotate_submission
+        rewrote them); returns the groups that were taken."""
+        return self._send("reload " + " ".join(map(str, groups)))['groups']
+
+    def status(self):
+        """{'groups', 'score', 'resident', 'unflushed'} of the in-memory state."""
+        return self._send("status")
+
+    def close(self):
+        """Flush and stop the daemon; returns the groups written on exit."""
+        if self.proc.poll() is not None:
+            return []
+        written = self._send("quit")['groups']
+        self.proc.wait()
+        return written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+if __name__ == '__main__':
+    # python optimizer_daemon.py SECONDS N [N ...]: one pass over the groups
+    if len(sys.argv) < 3:
+        print("Usage: python optimizer_daemon.py <seconds> <n> [n ...]")
+        sys.exit(1)
+    seconds = float(sys.argv[1])
+    with OptimizerDaemon() as daemon:
+        for n in map(int, sys.argv[2:]):
+            print(f"N={n}: {describe_result(daemon.optimize(n, seconds))}")
+        print(f"Score: {daemon.status()['score']:.6f}")
@@ -0,0 +1,104 @@
+import argparse
+import time
+import numpy as np
+import shapely
+from score_calculator import group_sides, parse_rows, read_group_rows, write_group_rows
+from tree_geometry import tree_vertices
+from validate import validate_arrays
+
+# Rigid rotation of whole groups. The bounding square only depends on the
+# convex hull of a group's vertices, so the hull is taken once and
+# max(width, height) of the turned hull is minimised over the angle: a
+# sweep over [0, 90) degrees (the square repeats every 90) and then ZOOM
+# rounds that resample around the best angle so far. The trees turn about
+# the centre of the group's box and every deg gets the same angle.
+
+SUBMISSION_FILE = "submission.csv"
+
+SWEEP = 360
+ZOOM = 8
+ZOOM_SAMPLES = 41 # odd, so the best angle so far is always resampled
+
+# Rotations that shrink the side by less than this are not worth rewriting
+# a group (and reloading it into the daemon) for
+MIN_GAIN = 1e-8
+
+def hull_points(xs, ys, degs):
+    """Convex hull vertices of a group's trees, as an (M, 2) array."""
+    verts = tree_vertices(xs, ys, degs).reshape(-1, 2)
+    return shapely.get_coordinates(shapely.convex_hull(shapely.multipoints(verts)))
+
+def turned_sides(points, angles):
+    """max(width, height) of points turned by each angle (degrees)."""
+    t = np.radians(angles)[:, None]
+    c, s = np.cos(t), np.sin(t)
+    u = points[:, 0] * c - points[:, 1] * s
+    v = points[:, 0] * s + points[:, 1] * c
+    return np.maximum(u.max(axis=1) - u.min(axis=1), v.max(axis=1) - v.min(axis=1))
+
+def best_angle(points):
+    """(angle, side) minimising the bounding square of points; 0 is a candidate."""
+    angles = np.arange(SWEEP) * (90.0 / SWEEP)
+    sides = turned_sides(points, angles)
+    best = angles[sides.argmin()]
+    span = 90.0 / SWEEP
+    for _ in range(ZOOM):
+        angles = best + np.linspace(-span, span, ZOOM_SAMPLES)
+        sides = turned_sides(points, angles)
+        best = angles[sides.argmin()]
+        span *= 2.0 / (ZOOM_SAMPLES - 1)
+    return float(best), float(sides.min())
+
+def rotate_group(xs, ys, degs):
+    """The group turned by best_angle about its box centre: (xs, ys, degs, angle)."""
+    points = hull_points(xs, ys, degs)
+    angle, _ = best_angle(points)
+    cx = (points[:, 0].min() + points[:, 0].max()) / 2
+    cy = (points[:, 1].min() + points[:, 1].max()) / 2
+    t = np.radians(angle)
+    c, s = np.cos(t), np.sin(t)
+    dx, dy = xs - cx, ys - cy
+    return cx + dx * c - dy * s, cy + dx * s + dy * c, (degs + angle) % 360.0, angle
+
+def rotate_submission(filename=SUBMISSION_FILE, output=None):
+    """Turn every group of filename that gets a smaller square that way.
+
+    Turned groups are re-validated and only kept if they do not overlap
+    (rounding can make touching trees cross). The result is written to
+    output (default: filename) if anything changed. Returns
+    {n: (old_side, new_side)} of the turned groups.
+    """
+    groups = read_group_rows(filename)
+    turned = {}
+    for n, lines in groups.items():
+        ns, xs, ys, degs = parse_rows(lines)
+        old = group_sides(ns, xs, ys, degs)[n]
+        xs, ys, degs, angle = rotate_group(xs, ys, degs)
+        if angle == 0:
+            continue
+        new = group_sides(ns, xs, ys, degs)[n]
+        if not new < old - MIN_GAIN or validate_arrays(ns, xs, ys, degs):
+            continue
+        groups[n] = [f"{n:03d}_{i},s{x!r},s{y!r},s{d!r}"
+                     for i, (x, y, d) in enumerate(zip(xs.tolist(), ys.tolist(), degs.tolist()))]
+        turned[n] = (old, new)
+
+    if turned or (output and output != filename):
+        write_group_rows(output or filename, groups)
+    return turned
+
+def main():
+    parser = argparse.ArgumentParser(description="Rotate each group rigidly to shrink its bounding square")
+    parser.add_argument("-i", "--input", default=SUBMISSION_FILE)
+    parser.add_argument("-o", "--output", default=None, help="Where to write (default: overwrite the input)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    turned = rotate_submission(args.input, args.output)
+    for n, (old, new) in sorted(turned.items()):
+        print(f"N={n}: side {old:.12f} -> {new:.12f}, score {old * old / n:.9f} -> {new * new / n:.9f}")
+    gain = sum((old * old - new * new) / n for n, (old, new) in turned.items())
+    print(f"Rotated {len(turned)} groups in {time.perf_counter() - start:.2f}s, score -{gain:.9f}")
+
+if __name__ == '__main__':
+    main()
@@ -5,8 +5,27 @@ import os
 import sys
 import time
 import random
+from score_calculator import cached_group_scores, read_group_rows
+from optimize_manager import checkpoint_path, compile_optimizer, describe_result, job_seed, merge_group, parse_telemetry
+from optimizer_daemon import OptimizerDaemon
+from rotate_groups import rotate_submission
 
 # User's logic adapted
+
+# Seconds per group job; None runs the fixed 200k iterations instead
+TIME_BUDGET = None
+
+# Opt-in: run every job in one resident optimizer process (see
+# optimizer_daemon) instead of a new process per job. Jobs then need a time
+# budget: TIME_BUDGET, or DAEMON_SECONDS when that is None, instead of the
+# fixed 200k iterations. The file is written at the end of every pass.
+USE_DAEMON = False
+DAEMON_SECONDS = 10
+
+# Base seed of a session; None picks one at random. Every job gets its own
+# seed from it (see job_seed), so passes explore different trajectories and
+# a session can be replayed by setting the printed value here.
+SEED = None
     
 def main():
     # Make sure we have the latest submission file
@@ -17,6 +36,11 @@ def main():
             print("No submission.csv found!")
             return
 
+    # Build first, as optimize_manager does: the jobs use flags the
+    # committed binary may not have yet
+    if not compile_optimizer():
+        return
+
     # Target the "Worst Groups" first (Highest Normalized Area)
     # Based on analysis:
     targets = [1, 2, 3, 5, 4, 7, 6, 8, 9, 14, 15, 22, 10, 21, 20, 11, 26, 16, 12, 13]
@@ -27,11 +51,19 @@ def main():
             targets.append(n)
             
     print(f"Targeting groups: {targets}")
+
+    base_seed = SEED if SEED is not None else random.SystemRandom().getrandbits(32)
+    print(f"Base seed: {base_seed}")
+    rng = random.Random(base_seed)
     
+    if USE_DAEMON:
+        run_daemon_passes(targets, base_seed, rng)
+        return
+
     pass_count = 1
     while True:
         print(f"\n=== STARTING PASS {pass_count} ===")
-        random.shuffle(targets) # Shuffle to mix it up
+        rng.shuffle(targets) # Shuffle to mix it up
         
         for n in targets:
             print(f"\nCreated aggressive job for N={n} (Pass {pass_count})")
@@ -42,44 +74,142 @@ def main():
             iter_cmd = 200000
             restarts_cmd = 64
             
-            success = run_optimizer(n, restarts=restarts_cmd) 
+            success = run_optimizer(n, restarts=restarts_cmd, seed=job_seed(base_seed, n, pass_count))
             
             if success:
                 print(f"N={n} finished pass in {time.time()-start_t:.2f}s")
             else:
                 print(f"N={n} failed")
-        
+
+            # Only the group that was just optimized gets rescored
+            entries = cached_group_scores("submission.csv")
+            print(f"Estimated total score: {sum(e['score'] for e in entries.values()):.6f}")
+            update_best()
+
+        rotate_pass()
         pass_count += 1
         print(f"=== FINISHED PASS {pass_count-1} (looping...) ===")
 
-def run_optimizer(n, restarts=1000):
+def run_daemon_passes(targets, base_seed, rng):
+    # Same passes as main(), but the groups stay loaded in one process
+    seconds = TIME_BUDGET or DAEMON_SECONDS
+    with OptimizerDaemon("submission.csv", seed=base_seed, iterations=200000,
+                         flush_every=3600) as daemon:
+        print(f"Optimizer daemon ready: {daemon.info['groups']} groups, {daemon.info['threads']} threads, "
+              f"{seconds}s per job")
+        pass_count = 1
+        while True:
+            print(f"\n=== STARTING PASS {pass_count} ===")
+            rng.shuffle(targets)
+            for n in targets:
+                result = daemon.optimize(n, seconds)
+                print(f"N={n}: {describe_result(result)}")
+                if result['improved']:
+                    print(f"!!! FOUND IMPROVEMENT FOR N={n} !!!")
+                print(f"Estimated total score: {daemon.status()['score']:.6f}")
+
+            written = daemon.flush()
+            if written:
+                print(f"Wrote improved groups {written} to submission.csv")
+                update_best()
+            # Rotated groups go back into the daemon, so the next pass
+            # anneals the turned poses instead of overwriting them
+            turned = rotate_pass()
+            if turned:
+                daemon.reload(sorted(turned))
+            pass_count += 1
+            print(f"=== FINISHED PASS {pass_count-1} (looping...) ===")
+
+def rotate_pass(filename="submission.csv"):
+    """Turn whole groups of filename to smaller bounding squares.
+
+    Returns {n: (old_side, new_side)} of the turned groups.
+    """
+    turned = rotate_submission(filename)
+    if turned:
+        print(f"Rotated {len(turned)} groups to smaller bounding squares")
+        update_best(filename)
+        # Their replicas hold the unrotated poses; the next job starts over
+        for n in turned:
+            if os.path.exists(checkpoint_path(n)):
+                os.remove(checkpoint_path(n))
+    return turned
+
+def update_best(src="submission.csv", dst="submission_best.csv"):
+    """Copy src over dst if it is complete, overlap-free and scores better."""
+    entries = cached_group_scores(src)
+    bad = sorted(n for n, e in entries.items() if e['overlap'])
+    if len(entries) < 200 or bad:
+        print(f"Not updating {dst}: {src} invalid (overlaps in {bad})")
+        return False
+
+    new_total = sum(e['score'] for e in entries.values())
+    if os.path.exists(dst):
+        best_total = sum(e['score'] for e in cached_group_scores(dst).values())
+        if new_total >= best_total:
+            return False
+
+    # Copy then rename so dst is never half-written
+    shutil.copy(src, dst + ".tmp")
+    os.replace(dst + ".tmp", dst)
+    print(f"Updated {dst}: {new_total:.6f}")
+    return True
+
+def run_optimizer(n, restarts=1000, seed=None):
     # Updated to accept higher iterations via command line if we change the C++ arg parsing
     # The C++ code takes -n for iterations.
-    cmd = f'GROUP_NUMBER={n} ./single_group_optimizer -n 200000 -r {restarts} -i submission.csv -o submission.csv'
-    print(f"Running for N={n} with 200k iters / {restarts} restart...")
+    # Only group n is piped through the binary; the result is merged back.
+    # The replica state is checkpointed per group, so a killed job resumes
+    # and every pass continues annealing where the last one stopped.
+    cmd = ["./single_group_optimizer", "-g", str(n), "--group-only",
+           "-n", "200000", "-r", str(restarts), "-i", "-", "-o", "-",
+           "--checkpoint", checkpoint_path(n), "--json"]
+    if TIME_BUDGET:
+        cmd += ["--time-budget", str(TIME_BUDGET)]
+    if seed is not None:
+        cmd += ["--seed", str(seed)]
+    print(f"Running for N={n} with 200k iters / {restarts} restart, seed {seed}...")
+
+    rows = read_group_rows("submission.csv").get(n)
+    if not rows:
+        print(f"N={n} missing from submission.csv")
+        return False
     
     try:
         process = subprocess.Popen(
             cmd,
+            stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
+            stderr=subprocess.PIPE,
             text=True,
-            shell=True,
             bufsize=1,
             universal_newlines=True
         )
+        process.stdin.write("id,x,y,deg\n" + "\n".join(rows) + "\n")
+        process.stdin.close()
         
-        output = []
-        for line in process.stdout:
-            print(line, end='')
-            output.append(line)
+        # The log streams on stderr; the group's rows arrive on stdout at the end
+        result = None
+        for line in process.stderr:
+            event = parse_telemetry(line)
+            if event is None:
+                print(line, end='')
+            elif event['event'] == 'cycle':
+                print(f"N={n} cycle {event['cycle']}/{event['end_cycle']}: "
+                      f"best side {event['best_side']:.9f} ({event['elapsed']:.1f}s)")
+            elif event['event'] == 'result':
+                result = event
+        fragment = process.stdout.read()
             
         process.wait()
         
-        # simple check for "Improvement:" in output
-        combined = "".join(output)
-        if "Improvement:" in combined and "No improvement" not in combined:
-             print(f"!!! FOUND IMPROVEMENT FOR N={n} !!!")
+        if result:
+            print(f"N={n}: {describe_result(result)}")
+            if result['improved']:
+                print(f"!!! FOUND IMPROVEMENT FOR N={n} !!!")
+
+        if process.returncode == 0:
+            merge_group(n, [l for l in fragment.splitlines()[1:] if l.strip()], "submission.csv")
              
         return process.returncode == 0
     except Exception as e:
@@ -1,81 +1,221 @@
-import csv
-import math
-from tree_geometry import Tree
-from shapely.geometry import box
-
-def calculate_score():
-    configs = {}
-    
-    # Read CSV
+import hashlib
+import json
+import os
+import sys
+import numpy as np
+from tree_geometry import tree_bounds
+from submission_store import is_store, load_store
+
+MAX_N = 200
+
+# Sidecar next to the submission: submission.csv -> submission.csv.scores.json
+CACHE_SUFFIX = '.scores.json'
+CACHE_VERSION = 2
+
+def load_submission(filename='submission.csv'):
+    """Load a submission into flat arrays.
+
+    Returns (ns, xs, ys, degs), one entry per row, in file order. Rows with
+    missing values are reported and skipped. A binary store (see
+    submission_store) is memory-mapped instead of parsed.
+    """
+    if is_store(filename):
+        return load_store(filename).arrays()
+
+    with open(filename, 'r') as f:
+        next(f, None) # Skip header
+        return parse_rows(f)
+
+def parse_rows(lines):
+    """Parse submission CSV lines (no header) into (ns, xs, ys, degs) arrays."""
+    ns, xs, ys, degs = [], [], [], []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        id_str, raw_x, raw_y, raw_deg = line.split(',')
+
+        # Strip 's'
+        raw_x = raw_x.replace('s', '')
+        raw_y = raw_y.replace('s', '')
+        raw_deg = raw_deg.replace('s', '')
+
+        if not raw_x or not raw_y:
+            print(f"Warning: Invalid data at {id_str}")
+            continue
+
+        ns.append(int(id_str[:id_str.index('_')]))
+        xs.append(float(raw_x))
+        ys.append(float(raw_y))
+        degs.append(float(raw_deg))
+
+    return (np.array(ns, dtype=np.int64), np.array(xs), np.array(ys), np.array(degs))
+
+def group_sides(ns, xs, ys, degs):
+    """Bounding-square side of every group.
+
+    Returns an array of length MAX_N + 1 indexed by N; groups with no rows
+    are NaN (index 0 is always NaN).
+    """
+    bounds = tree_bounds(xs, ys, degs)
+
+    # Grouped min/max: sort rows by N, then reduce each contiguous run
+    order = np.argsort(ns, kind='stable')
+    ns_sorted = ns[order]
+    bounds = bounds[order]
+    groups, starts = np.unique(ns_sorted, return_index=True)
+
+    lo = np.minimum.reduceat(bounds[:, :2], starts, axis=0)
+    hi = np.maximum.reduceat(bounds[:, 2:], starts, axis=0)
+    ext = hi - lo
+
+    sides = np.full(MAX_N + 1, np.nan)
+    keep = (groups >= 1) & (groups <= MAX_N)
+    sides[groups[keep]] = np.maximum(ext[keep, 0], ext[keep, 1])
+    return sides
+
+def score_groups(filename='submission.csv'):
+    """Per-group score (side^2 / N) of a submission file.
+
+    Returns an array of length MAX_N + 1 indexed by N, NaN where the group is
+    missing. The total leaderboard score is np.nansum of the result.
+    """
+    sides = group_sides(*load_submission(filename))
+    return sides * sides / np.arange(MAX_N + 1).clip(min=1)
+
+def read_group_rows(filename):
+    """Raw CSV lines of every group, {n: [line, ...]} in file order."""
+    groups = {}
+    with open(filename, 'r') as f:
+        next(f, None) # Skip header
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            n = int(line[:line.index('_')])
+            groups.setdefault(n, []).append(line)
+    return groups
+
+def write_group_rows(filename, groups):
+    """Write {n: [line, ...]} back as a submission file, groups in N order.
+
+    Goes through a temp file and a rename, so readers never see a partial
+    file.
+    """
+    tmp = filename + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write('id,x,y,deg\n')
+        for n in sorted(groups):
+            for line in groups[n]:
+                f.write(line + '\n')
+    os.replace(tmp, filename)
+
+def _load_cache(cache_file):
     try:
-        with open('submission.csv', 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                id_str = row['id']
-                n = int(id_str.split('_')[0])
-                idx = int(id_str.split('_')[1])
-                
-                # Strip 's'
-                raw_x = row['x'].replace('s', '')
-                raw_y = row['y'].replace('s', '')
-                raw_deg = row['deg'].replace('s', '')
-                
-                if not raw_x or not raw_y:
-                    print(f"Warning: Invalid data at {id_str}")
-                    continue
-                    
-                x = float(raw_x)
-                y = float(raw_y)
-                deg = float(raw_deg)
-                
-                deg = float(raw_deg)
-                
-                if n not in configs:
-                    configs[n] = []
-                configs[n].append(Tree(x, y, deg))
-                
+        with open(cache_file, 'r') as f:
+            cache = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if cache.get('version') != CACHE_VERSION:
+        return {}
+    return {int(n): entry for n, entry in cache.get('groups', {}).items()}
+
+def _save_cache(cache_file, entries):
+    # Write to a temp file and rename so a killed run never leaves half a cache
+    tmp = cache_file + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'version': CACHE_VERSION,
+                   'groups': {str(n): entries[n] for n in sorted(entries)}}, f)
+    os.replace(tmp, cache_file)
+
+def _group_digests(filename):
+    # n -> (hash, rows); rows are raw CSV lines, or a (k, 3) view for a store
+    if is_store(filename):
+        store = load_store(filename)
+        return {n: (hashlib.sha1(store.group(n).tobytes()).hexdigest(), store.group(n))
+                for n in store.groups()}
+    return {n: (hashlib.sha1('\n'.join(lines).encode()).hexdigest(), lines)
+            for n, lines in read_group_rows(filename).items()}
+
+def cached_group_scores(filename='submission.csv'):
+    """Per-group side, score and overlap status, reusing a sidecar cache.
+
+    Each group's raw rows (or store bytes) are hashed; only groups whose hash is not in
+    <filename>.scores.json are parsed and rescored, then the cache is
+    rewritten. Returns {n: {'hash', 'side', 'score', 'overlap'}}.
+    """
+    cache_file = filename + CACHE_SUFFIX
+    cache = _load_cache(cache_file)
+
+    entries = {}
+    stale = []
+    for n, (digest, rows) in _group_digests(filename).items():
+        entry = cache.get(n)
+        if entry is not None and entry['hash'] == digest:
+            entries[n] = entry
+        else:
+            stale.append((n, digest, rows))
+
+    if stale:
+        # validate imports this module, so pull it in lazily
+        from validate import validate_arrays
+
+        # Rescore all stale groups in one batched pass
+        if is_store(filename):
+            ns = np.concatenate([np.full(len(rows), n) for n, _, rows in stale])
+            xs, ys, degs = np.concatenate([rows for _, _, rows in stale]).T
+        else:
+            ns, xs, ys, degs = parse_rows(line for _, _, lines in stale for line in lines)
+        sides = group_sides(ns, xs, ys, degs)
+        overlaps = validate_arrays(ns, xs, ys, degs)
+        for n, digest, _ in stale:
+            side = float(sides[n])
+            entries[n] = {
+                'hash': digest,
+                'side': side,
+                'score': side * side / n,
+                'overlap': n in overlaps,
+            }
+
+    if stale or entries.keys() != cache.keys():
+        _save_cache(cache_file, entries)
+
+    return entries
+
+def calculate_score(filename='submission.csv'):
+    try:
+        entries = cached_group_scores(filename)
     except FileNotFoundError:
-        print("submission.csv not found")
+        print(f"{filename} not found")
         return
 
-    if len(configs) < 200:
-        print(f"ERROR: Only found {len(configs)} groups! Scoring is invalid.")
-        missing = [n for n in range(1, 201) if n not in configs]
+    scores = np.full(MAX_N + 1, np.nan)
+    for n, entry in entries.items():
+        if 1 <= n <= MAX_N:
+            scores[n] = entry['score']
+
+    missing = [n for n in range(1, MAX_N + 1) if np.isnan(scores[n])]
+    if missing:
+        print(f"ERROR: Only found {MAX_N - len(missing)} groups! Scoring is invalid.")
         print(f"Missing: {missing}")
         return
 
-    total_score = 0.0
-    
-    scores_list = []
-    
-    # Calculate for each N
-    for n, trees in configs.items():
-        min_x, min_y = float('inf'), float('inf')
-        max_x, max_y = float('-inf'), float('-inf')
-        
-        for tree in trees:
-            poly = tree.get_polygon()
-            xmin, ymin, xmax, ymax = poly.bounds
-            min_x = min(min_x, xmin)
-            min_y = min(min_y, ymin)
-            max_x = max(max_x, xmax)
-            max_y = max(max_y, ymax)
-            
-        side = max(max_x - min_x, max_y - min_y)
-        score_n = (side * side) / n
-        total_score += score_n
-        
-        scores_list.append((n, score_n))
+    total_score = float(np.nansum(scores))
+    scores_list = [(n, scores[n]) for n in range(1, MAX_N + 1)]
 
     print(f"Total Combined Score: {total_score:.6f}")
-    
+
+    overlapping = sorted(n for n, entry in entries.items() if entry['overlap'])
+    if overlapping:
+        print(f"WARNING: Overlapping trees in groups {overlapping}")
+
     # Sort by score descending (Worst offenders first)
     scores_list.sort(key=lambda x: x[1], reverse=True)
-    
+
     print("\nTop 20 Worst Groups (Highest Norm Area):")
     for n, s in scores_list[:20]:
         print(f"N={n}: {s:.6f}")
-        
+
     # Also sort by 'Efficiency' (Metric / Theoretical Min Area) if we want?
     # Actually raw Metric is what matters for the sum.
     # N=1 score is ~0.66. N=200 score is ~0.35.
@@ -85,5 +225,7 @@ def calculate_score():
     # Reducing N=200 from 0.35 to 0.30 saves 0.05.
     # So yes, generally Small N are high value targets.
 
+    return total_score
+
 if __name__ == '__main__':
-    calculate_score()
+    calculate_score(sys.argv[1] if len(sys.argv) > 1 else 'submission.csv')
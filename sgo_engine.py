@@ -0,0 +1,117 @@
+import ctypes
+import os
+import subprocess
+import threading
+import numpy as np
+from numpy.ctypeslib import ndpointer
+
+# In-process binding to the C++ engine in single_group_optimizer.cpp, built
+# as a shared library (-DSGO_LIBRARY) and loaded with ctypes. Groups are
+# passed as NumPy x, y, deg arrays; nothing goes through CSV text. ctypes
+# releases the GIL for every call, so several groups can be optimized at
+# once from Python threads.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SOURCE_NAME = os.path.join(HERE, "single_group_optimizer.cpp")
+LIBRARY_NAME = os.path.join(HERE, "libsgo.so")
+BUILD_CMD = ["g++", "-O3", "-march=native", "-std=c++17", "-fopenmp",
+             "-DSGO_LIBRARY", "-shared", "-fPIC", "-o", LIBRARY_NAME, SOURCE_NAME]
+
+NV = 15
+
+_lib = None
+_lib_lock = threading.Lock()
+
+def build_library():
+    """Compile libsgo.so from single_group_optimizer.cpp."""
+    print(f"Building {LIBRARY_NAME}...")
+    subprocess.run(BUILD_CMD, check=True)
+
+def load_library():
+    """The loaded engine, (re)building it first if it is missing or stale."""
+    global _lib
+    with _lib_lock:
+        if _lib is not None:
+            return _lib
+        if (not os.path.exists(LIBRARY_NAME) or
+                os.path.getmtime(LIBRARY_NAME) < os.path.getmtime(SOURCE_NAME)):
+            build_library()
+
+        lib = ctypes.CDLL(LIBRARY_NAME)
+        arr = ndpointer(np.float64, flags='C_CONTIGUOUS')
+        out = ndpointer(np.float64, flags='C_CONTIGUOUS,WRITEABLE')
+        pairs = ndpointer(np.int32, flags='C_CONTIGUOUS,WRITEABLE')
+        d = ctypes.c_double
+        lib.sgo_max_n.restype = ctypes.c_int
+        lib.sgo_polygons.argtypes = [ctypes.c_int, arr, arr, arr, out]
+        lib.sgo_polygons.restype = None
+        lib.sgo_overlap.argtypes = [d, d, d, d, d, d]
+        lib.sgo_overlap.restype = ctypes.c_int
+        lib.sgo_overlapping_pairs.argtypes = [ctypes.c_int, arr, arr, arr, ctypes.c_int, pairs, ctypes.c_int]
+        lib.sgo_overlapping_pairs.restype = ctypes.c_int
+        lib.sgo_side.argtypes = [ctypes.c_int, arr, arr, arr]
+        lib.sgo_side.restype = d
+        lib.sgo_score.argtypes = [ctypes.c_int, arr, arr, arr]
+        lib.sgo_score.restype = d
+        lib.sgo_optimize.argtypes = [ctypes.c_int, out, out, out, ctypes.c_int, ctypes.c_int,
+                                     ctypes.c_int, d, ctypes.c_uint64, ctypes.c_int]
+        lib.sgo_optimize.restype = ctypes.c_int
+        _lib = lib
+        return lib
+
+def _group(xs, ys, degs):
+    # Contiguous float64 copies the C side may read (and sgo_optimize write)
+    xs = np.array(xs, dtype=np.float64)
+    ys = np.array(ys, dtype=np.float64)
+    degs = np.array(degs, dtype=np.float64)
+    n = len(xs)
+    if not (len(ys) == len(degs) == n):
+        raise ValueError("x, y and deg must have the same length")
+    if not 1 <= n <= load_library().sgo_max_n():
+        raise ValueError(f"group size {n} out of range")
+    return n, xs, ys, degs
+
+def polygons(xs, ys, degs):
+    """Tree vertices from the C++ getPoly, as an (N, 15, 2) array."""
+    n, xs, ys, degs = _group(xs, ys, degs)
+    out = np.empty((n, NV, 2))
+    load_library().sgo_polygons(n, xs, ys, degs, out)
+    return out
+
+def overlap(a, b):
+    """Whether trees a and b, each (x, y, deg), overlap (fast kernel)."""
+    return bool(load_library().sgo_overlap(*map(float, a), *map(float, b)))
+
+def overlapping_pairs(xs, ys, degs, exact=False):
+    """Overlapping (i, j) pairs of a group; exact uses the long double test."""
+    n, xs, ys, degs = _group(xs, ys, degs)
+    lib = load_library()
+    out = np.empty(2 * n, dtype=np.int32)
+    found = lib.sgo_overlapping_pairs(n, xs, ys, degs, int(exact), out, n)
+    if found > n:
+        out = np.empty(2 * found, dtype=np.int32)
+        lib.sgo_overlapping_pairs(n, xs, ys, degs, int(exact), out, found)
+    return [tuple(p) for p in out[:2 * found].reshape(-1, 2).tolist()]
+
+def side(xs, ys, degs):
+    """Bounding-square side of a group."""
+    n, xs, ys, degs = _group(xs, ys, degs)
+    return load_library().sgo_side(n, xs, ys, degs)
+
+def score(xs, ys, degs):
+    """side^2 / N of a group."""
+    n, xs, ys, degs = _group(xs, ys, degs)
+    return load_library().sgo_score(n, xs, ys, degs)
+
+def optimize(xs, ys, degs, iterations=15000, restarts=16, replicas=None,
+             time_budget=0, seed=42, threads=None):
+    """Run optimizeParallel on one group, like the binary's -g N.
+
+    Returns (xs, ys, degs, improved) with new arrays; they are the input
+    unchanged unless the result passed the exact overlap check and is
+    better. threads sets the OpenMP team of this call only.
+    """
+    n, xs, ys, degs = _group(xs, ys, degs)
+    improved = load_library().sgo_optimize(n, xs, ys, degs, iterations, restarts,
+                                           replicas or 0, time_budget or 0, seed, threads or 0)
+    return xs, ys, degs, improved == 1
@@ -1,17 +1,46 @@
 // Single Group Optimizer - Optimizes only one group (n value) specified by
 // environment variable Compile: g++ -O3 -march=native -std=c++17 -fopenmp -o
 // single_group_optimizer single_group_optimizer.cpp
+//
+// --group-only reads just the target group's rows and writes just that group.
+// "-" as -i/-o streams through stdin/stdout (the log then goes to stderr).
+// --bench runs -n SA moves on the group single-threaded and reports moves/s,
+// then getPoly and overlap() throughput (see benchmark.py).
+// --narrow sat|poly picks the overlap narrow phase (convex-piece SAT by
+// default); --crosscheck K compares both against the exact test and exits.
+// --replicas R sets the number of parallel-tempering replicas (default: one
+// per thread); replicas are spread over however many threads there are.
+// --time-budget S keeps running PT cycles until S seconds have passed.
+// --checkpoint F saves the full PT state after every cycle and resumes
+// from F if it holds a run of the same group and replica count that
+// started from, or ended with, the group now read from -i.
+// --seed S (default 42) seeds every random stream of the run; with the
+// same seed and replica count the result does not depend on the number of
+// threads (a --time-budget run still stops after a time-dependent number
+// of cycles).
+// --daemon keeps all groups in memory and serves "optimize N SECONDS"
+// commands from stdin (see runDaemon); --flush-every S (default 60) bounds
+// how long an improvement waits before it is written to -o.
+// --cascade P rebuilds every group from its neighbours N+1 and N-1 (see
+// runCascade), P passes, and writes all groups to -o.
+// --json adds machine-readable telemetry to the log: one JSON object per
+// line ("start", one "cycle" per PT cycle, "result"), each line starting
+// with '{' so it can be picked out of the human-readable log.
 
 #include <algorithm>
 #include <chrono>
 #include <cmath>
+#include <cstdint>
+#include <cstdio>
 #include <cstdlib>
+#include <cstring>
 #include <fstream>
 #include <iomanip>
 #include <iostream>
 #include <map>
-
+#include <memory>
 #include <random>
+#include <sstream>
 #include <string>
 #include <tuple>
 #include <vector>
@@ -35,6 +64,34 @@ alignas(64) const long double TX[NV] = {0,     0.125, 0.0625, 0.2,     0.1,
 alignas(64) const long double TY[NV] = {
     0.8, 0.5, 0.5, 0.25, 0.25, 0, 0, -0.2, -0.2, 0, 0, 0.25, 0.25, 0.5, 0.5};
 
+// Same template in double for the fast geometry kernel
+alignas(64) const double TXD[NV] = {0,     0.125, 0.0625, 0.2,     0.1,
+                                    0.35,  0.075, 0.075,  -0.075,  -0.075,
+                                    -0.35, -0.1,  -0.2,   -0.0625, -0.125};
+alignas(64) const double TYD[NV] = {
+    0.8, 0.5, 0.5, 0.25, 0.25, 0, 0, -0.2, -0.2, 0, 0, 0.25, 0.25, 0.5, 0.5};
+
+// SplitMix64 finalizer. Streams are split off a run seed by chaining it over
+// the stream's ids, so nearby ids (replica r, r + 1; cycle k, k + 1) still
+// give unrelated seeds.
+inline uint64_t splitmix64(uint64_t x) {
+  x += 0x9e3779b97f4a7c15ULL;
+  x = (x ^ (x >> 30)) * 0xbf58476d1ce4e5b9ULL;
+  x = (x ^ (x >> 27)) * 0x94d049bb133111ebULL;
+  return x ^ (x >> 31);
+}
+
+// What a stream is used for; part of its derivation
+enum Stream : uint64_t { STREAM_SWAP = 1, STREAM_WARMUP, STREAM_SA, STREAM_BENCH };
+
+inline uint64_t streamSeed(uint64_t seed, int n, Stream kind, uint64_t replica = 0,
+                           uint64_t cycle = 0) {
+  uint64_t h = splitmix64(seed);
+  for (uint64_t v : {(uint64_t)n, (uint64_t)kind, replica, cycle})
+    h = splitmix64(h ^ v);
+  return h;
+}
+
 struct FastRNG {
   uint64_t s[2];
   FastRNG(uint64_t seed = 42) {
@@ -58,12 +115,206 @@ struct FastRNG {
   }
 };
 
+// Fast path: double geometry laid out for packed lanes. Edge k runs from
+// vertex k to vertex k + 1; px[15] = px[16] = px[0] makes lane 15 a
+// zero-length edge that never crosses anything, so every edge loop is a
+// fixed 16 wide and the compiler vectorizes it (4 lanes with AVX2).
+constexpr int NL = 16;
+
+// Convex decomposition (same pieces as physics_packer / tree_geometry):
+// trunk, bottom tier, middle tier, top triangle. Indices into TX/TY; the
+// triangle repeats its apex so every piece has 4 vertices.
+constexpr int NP = 4;
+const int PIECE[NP][4] = {{8, 7, 6, 9}, {10, 5, 4, 11}, {12, 3, 2, 13},
+                          {14, 1, 0, 0}};
+
+// Edge normals of the template pieces and each piece's extent along its own
+// normals. The triangle's zero-length apex edge is replaced by a copy of
+// its first normal, so every piece has exactly 4 usable axes.
+struct PieceAxes {
+  double nx[NP][4], ny[NP][4], lo[NP][4], hi[NP][4];
+  PieceAxes() {
+    for (int p = 0; p < NP; p++) {
+      for (int k = 0; k < 4; k++) {
+        int a = PIECE[p][k], b = PIECE[p][(k + 1) % 4];
+        nx[p][k] = -(TYD[b] - TYD[a]);
+        ny[p][k] = TXD[b] - TXD[a];
+        if (nx[p][k] == 0 && ny[p][k] == 0) {
+          nx[p][k] = nx[p][0];
+          ny[p][k] = ny[p][0];
+        }
+        lo[p][k] = 1e300;
+        hi[p][k] = -1e300;
+        for (int v : PIECE[p]) {
+          double d = nx[p][k] * TXD[v] + ny[p][k] * TYD[v];
+          lo[p][k] = min(lo[p][k], d);
+          hi[p][k] = max(hi[p][k], d);
+        }
+      }
+    }
+  }
+};
+const PieceAxes PAX;
+
 struct Poly {
+  alignas(32) double px[NL + 4], py[NL + 4];
+  double x0, y0, x1, y1;
+  // SAT data, refreshed by getPoly: rotated piece normals, each piece's
+  // projection interval on them, and per-piece AABBs. This is 640 of the
+  // 992 bytes and takes a Cfg (MAX_N Polys) from ~90 KB to ~210 KB. It stays
+  // here because every narrow-phase test reads it and getPoly has sin/cos
+  // at hand; rebuilding it per test costs more than the larger copies.
+  // Anything that keeps many configurations stores Poses instead.
+  double nx[NP][4], ny[NP][4], lo[NP][4], hi[NP][4];
+  double bx0[NP], by0[NP], bx1[NP], by1[NP];
+};
+
+inline void getPoly(long double cx, long double cy, long double deg, Poly &q) {
+  double rad = (double)deg * (PI / 180.0);
+  double s = sin(rad), c = cos(rad);
+  double dx = (double)cx, dy = (double)cy;
+  for (int i = 0; i < NV; i++) {
+    q.px[i] = TXD[i] * c - TYD[i] * s + dx;
+    q.py[i] = TXD[i] * s + TYD[i] * c + dy;
+  }
+  q.px[NV] = q.px[NV + 1] = q.px[0];
+  q.py[NV] = q.py[NV + 1] = q.py[0];
+  double minx = q.px[0], miny = q.py[0], maxx = q.px[0], maxy = q.py[0];
+  for (int i = 1; i < NV; i++) {
+    minx = min(minx, q.px[i]);
+    maxx = max(maxx, q.px[i]);
+    miny = min(miny, q.py[i]);
+    maxy = max(maxy, q.py[i]);
+  }
+  q.x0 = minx;
+  q.y0 = miny;
+  q.x1 = maxx;
+  q.y1 = maxy;
+
+  // Normals rotate with the tree; own projections only shift by n . (x, y)
+  for (int p = 0; p < NP; p++) {
+    for (int k = 0; k < 4; k++) {
+      double nx = PAX.nx[p][k] * c - PAX.ny[p][k] * s;
+      double ny = PAX.nx[p][k] * s + PAX.ny[p][k] * c;
+      double off = nx * dx + ny * dy;
+      q.nx[p][k] = nx;
+      q.ny[p][k] = ny;
+      q.lo[p][k] = PAX.lo[p][k] + off;
+      q.hi[p][k] = PAX.hi[p][k] + off;
+    }
+    const int *v = PIECE[p];
+    q.bx0[p] = min(min(q.px[v[0]], q.px[v[1]]), min(q.px[v[2]], q.px[v[3]]));
+    q.bx1[p] = max(max(q.px[v[0]], q.px[v[1]]), max(q.px[v[2]], q.px[v[3]]));
+    q.by0[p] = min(min(q.py[v[0]], q.py[v[1]]), min(q.py[v[2]], q.py[v[3]]));
+    q.by1[p] = max(max(q.py[v[0]], q.py[v[1]]), max(q.py[v[2]], q.py[v[3]]));
+  }
+}
+
+// Even-odd test of (px, py) against all edges of q at once
+inline bool pip(double px, double py, const Poly &q) {
+  int cross = 0;
+  for (int k = 0; k < NL; k++) {
+    double ax = q.px[k], ay = q.py[k], bx = q.px[k + 1], by = q.py[k + 1];
+    // Non-straddling lanes may divide by zero; their result is masked off
+    double xi = (bx - ax) * (py - ay) / (by - ay) + ax;
+    cross += ((ay > py) != (by > py)) & (px < xi);
+  }
+  return cross & 1;
+}
+
+// Proper crossing of segment (ax, ay)-(bx, by) with any edge of q
+inline bool segHits(double ax, double ay, double bx, double by,
+                    const Poly &q) {
+  int hit = 0;
+  for (int k = 0; k < NL; k++) {
+    double cx = q.px[k], cy = q.py[k], dx = q.px[k + 1], dy = q.py[k + 1];
+    double d1 = (dx - cx) * (ay - cy) - (dy - cy) * (ax - cx);
+    double d2 = (dx - cx) * (by - cy) - (dy - cy) * (bx - cx);
+    double d3 = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax);
+    double d4 = (bx - ax) * (dy - ay) - (by - ay) * (dx - ax);
+    hit |= ((d1 > 0) != (d2 > 0)) & ((d3 > 0) != (d4 > 0));
+  }
+  return hit;
+}
+
+inline bool overlapPoly(const Poly &a, const Poly &b) {
+  for (int i = 0; i < NV; i++) {
+    if (pip(a.px[i], a.py[i], b))
+      return true;
+    if (pip(b.px[i], b.py[i], a))
+      return true;
+  }
+  for (int i = 0; i < NV; i++)
+    if (segHits(a.px[i], a.py[i], a.px[i + 1], a.py[i + 1], b))
+      return true;
+  return false;
+}
+
+// True if one of piece p of a's axes separates it from piece q of b.
+// Touching (projections meeting exactly) counts as separated, like the
+// strict tests of overlapPoly.
+inline bool sepAxes(const Poly &a, int p, const Poly &b, int q) {
+  const int *v = PIECE[q];
+  for (int k = 0; k < 4; k++) {
+    double nx = a.nx[p][k], ny = a.ny[p][k];
+    double d0 = nx * b.px[v[0]] + ny * b.py[v[0]];
+    double d1 = nx * b.px[v[1]] + ny * b.py[v[1]];
+    double d2 = nx * b.px[v[2]] + ny * b.py[v[2]];
+    double d3 = nx * b.px[v[3]] + ny * b.py[v[3]];
+    if (max(max(d0, d1), max(d2, d3)) <= a.lo[p][k] ||
+        min(min(d0, d1), min(d2, d3)) >= a.hi[p][k])
+      return true;
+  }
+  return false;
+}
+
+// Narrow phase on the 4 convex pieces: piece AABB cull, then SAT with an
+// exit on the first separating axis. Interiors of two trees intersect iff
+// the interiors of some pair of their pieces do.
+inline bool overlapSAT(const Poly &a, const Poly &b) {
+  for (int p = 0; p < NP; p++) {
+    if (a.bx1[p] < b.x0 || b.x1 < a.bx0[p] || a.by1[p] < b.y0 ||
+        b.y1 < a.by0[p])
+      continue;
+    for (int q = 0; q < NP; q++) {
+      if (a.bx1[p] < b.bx0[q] || b.bx1[q] < a.bx0[p] || a.by1[p] < b.by0[q] ||
+          b.by1[q] < a.by0[p])
+        continue;
+      if (!sepAxes(a, p, b, q) && !sepAxes(b, q, a, p))
+        return true;
+    }
+  }
+  return false;
+}
+
+// Narrow phase used by overlap(): convex-piece SAT (default) or the
+// 15-gon point-in-polygon / edge-crossing test. Chosen with --narrow.
+bool satNarrow = true;
+
+// Per-thread overlap() call counts for --json: pairs tested and pairs that
+// got past the AABB test into the narrow phase
+struct OvlCounters {
+  long long pairs = 0, narrow = 0;
+};
+thread_local OvlCounters ovlCount;
+
+inline bool overlap(const Poly &a, const Poly &b) {
+  ovlCount.pairs++;
+  if (a.x1 < b.x0 || b.x1 < a.x0 || a.y1 < b.y0 || b.y1 < a.y0)
+    return false;
+  ovlCount.narrow++;
+  return satNarrow ? overlapSAT(a, b) : overlapPoly(a, b);
+}
+
+// Exact path: the original long double kernel. Only used to verify a result
+// before it is written, so it is kept simple rather than fast.
+struct PolyL {
   long double px[NV], py[NV];
   long double x0, y0, x1, y1;
 };
 
-inline void getPoly(long double cx, long double cy, long double deg, Poly &q) {
+inline void getPolyL(long double cx, long double cy, long double deg,
+                     PolyL &q) {
   long double rad = deg * (PI / 180.0L);
   long double s = sinl(rad), c = cosl(rad);
   long double minx = 1e9L, miny = 1e9L, maxx = -1e9L, maxy = -1e9L;
@@ -87,7 +338,7 @@ inline void getPoly(long double cx, long double cy, long double deg, Poly &q) {
   q.y1 = maxy;
 }
 
-inline bool pip(long double px, long double py, const Poly &q) {
+inline bool pipL(long double px, long double py, const PolyL &q) {
   bool in = false;
   int j = NV - 1;
   for (int i = 0; i < NV; i++) {
@@ -100,9 +351,9 @@ inline bool pip(long double px, long double py, const Poly &q) {
   return in;
 }
 
-inline bool segInt(long double ax, long double ay, long double bx,
-                   long double by, long double cx, long double cy,
-                   long double dx, long double dy) {
+inline bool segIntL(long double ax, long double ay, long double bx,
+                    long double by, long double cx, long double cy,
+                    long double dx, long double dy) {
   long double d1 = (dx - cx) * (ay - cy) - (dy - cy) * (ax - cx);
   long double d2 = (dx - cx) * (by - cy) - (dy - cy) * (bx - cx);
   long double d3 = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax);
@@ -110,55 +361,220 @@ inline bool segInt(long double ax, long double ay, long double bx,
   return ((d1 > 0) != (d2 > 0)) && ((d3 > 0) != (d4 > 0));
 }
 
-inline bool overlap(const Poly &a, const Poly &b) {
+inline bool overlapL(const PolyL &a, const PolyL &b) {
   if (a.x1 < b.x0 || b.x1 < a.x0 || a.y1 < b.y0 || b.y1 < a.y0)
     return false;
   for (int i = 0; i < NV; i++) {
-    if (pip(a.px[i], a.py[i], b))
+    if (pipL(a.px[i], a.py[i], b))
       return true;
-    if (pip(b.px[i], b.py[i], a))
+    if (pipL(b.px[i], b.py[i], a))
       return true;
   }
   for (int i = 0; i < NV; i++) {
     int ni = (i + 1) % NV;
     for (int j = 0; j < NV; j++) {
       int nj = (j + 1) % NV;
-      if (segInt(a.px[i], a.py[i], a.px[ni], a.py[ni], b.px[j], b.py[j],
-                 b.px[nj], b.py[nj]))
+      if (segIntL(a.px[i], a.py[i], a.px[ni], a.py[ni], b.px[j], b.py[j],
+                  b.px[nj], b.py[nj]))
         return true;
     }
   }
   return false;
 }
 
+// Uniform grid over tree centres. Every vertex is within 0.8 of its tree's
+// (x, y), so two trees can only overlap if their centres are within 1.6 and
+// a 3x3 block of 1.6-wide cells covers every candidate. Cells are hashed
+// into a wrapped GRID_DIM x GRID_DIM table; colliding far-away cells only
+// cost an extra AABB test. Build with -DSGO_GRID=0 for the plain O(n) scan.
+#ifndef SGO_GRID
+#define SGO_GRID 1
+#endif
+constexpr int GRID_DIM = 32;
+constexpr long double GRID_CELL = 1.6001L;
+
+// Positions only. A Cfg is mostly derived geometry (Poly, grid), so state
+// that just has to be remembered is kept as a Pose and rebuilt on load.
+struct Pose {
+  int n;
+  long double x[MAX_N], y[MAX_N], a[MAX_N];
+};
+
 struct Cfg {
   int n;
   long double x[MAX_N], y[MAX_N], a[MAX_N];
   Poly pl[MAX_N];
   long double gx0, gy0, gx1, gy1;
+#if SGO_GRID
+  // Doubly linked list per cell, so moving a tree between cells is O(1).
+  // Plain arrays keep Cfg trivially copyable.
+  int16_t head[GRID_DIM * GRID_DIM];
+  int16_t nxt[MAX_N], prv[MAX_N];
+  int16_t cx[MAX_N], cy[MAX_N];
+
+  static inline int cellOf(long double v) {
+    long long k = (long long)floor((double)v * (1.0 / GRID_CELL)) % GRID_DIM;
+    return k < 0 ? (int)k + GRID_DIM : (int)k;
+  }
+  inline void link(int i) {
+    int c = cy[i] * GRID_DIM + cx[i];
+    prv[i] = -1;
+    nxt[i] = head[c];
+    if (head[c] >= 0)
+      prv[head[c]] = i;
+    head[c] = i;
+  }
+  inline void unlink(int i) {
+    if (prv[i] >= 0)
+      nxt[prv[i]] = nxt[i];
+    else
+      head[cy[i] * GRID_DIM + cx[i]] = nxt[i];
+    if (nxt[i] >= 0)
+      prv[nxt[i]] = prv[i];
+  }
+  inline void rebuildGrid() {
+    for (int c = 0; c < GRID_DIM * GRID_DIM; c++)
+      head[c] = -1;
+    for (int i = 0; i < n; i++) {
+      cx[i] = cellOf(x[i]);
+      cy[i] = cellOf(y[i]);
+      link(i);
+    }
+  }
 
-  inline void upd(int i) { getPoly(x[i], y[i], a[i], pl[i]); }
+#endif
+
+  // Global box, the tree defining each side (x0, y0, x1, y1) and the trees
+  // within BOUNDARY_EPS of a side. upd(i) keeps all of it current: a side
+  // only needs a rescan when its extreme tree moves inwards. The boundary
+  // list is patched per tree while the box is unchanged; once the box moves
+  // it is marked stale and rebuilt on the next boundarySize().
+  static constexpr long double BOUNDARY_EPS = 0.01L;
+  int16_t ext[4];
+  int16_t bList[MAX_N], bPos[MAX_N]; // bPos[i] = -1: not on the boundary
+  int bCount;
+  bool bStale;
+
+  // Tree i's coordinates changed. Tree i must already be in the grid.
+  inline void upd(int i) {
+    getPoly(x[i], y[i], a[i], pl[i]);
+#if SGO_GRID
+    int nx = cellOf(x[i]), ny = cellOf(y[i]);
+    if (nx != cx[i] || ny != cy[i]) {
+      unlink(i);
+      cx[i] = nx;
+      cy[i] = ny;
+      link(i);
+    }
+#endif
+    updBounds(i);
+  }
   inline void updAll() {
     for (int i = 0; i < n; i++)
-      upd(i);
+      getPoly(x[i], y[i], a[i], pl[i]);
+#if SGO_GRID
+    rebuildGrid();
+#endif
     updGlobal();
   }
 
+  inline long double boxSide(const Poly &p, int k) const {
+    return k == 0 ? p.x0 : k == 1 ? p.y0 : k == 2 ? p.x1 : p.y1;
+  }
+  inline long double &gSide(int k) {
+    return k == 0 ? gx0 : k == 1 ? gy0 : k == 2 ? gx1 : gy1;
+  }
+
+  inline void rescanSide(int k) {
+    bool lower = k < 2;
+    int best = 0;
+    for (int j = 1; j < n; j++) {
+      long double v = boxSide(pl[j], k), b = boxSide(pl[best], k);
+      if (lower ? v < b : v > b)
+        best = j;
+    }
+    ext[k] = best;
+    gSide(k) = boxSide(pl[best], k);
+  }
+
+  inline void updBounds(int i) {
+    bool moved = false;
+    for (int k = 0; k < 4; k++) {
+      long double v = boxSide(pl[i], k), &g = gSide(k);
+      if (k < 2 ? v <= g : v >= g) {
+        moved |= v != g;
+        g = v;
+        ext[k] = i;
+      } else if (ext[k] == i) {
+        rescanSide(k);
+        moved = true;
+      }
+    }
+    if (moved)
+      bStale = true;
+    else if (!bStale)
+      updBoundaryTree(i);
+  }
+
+  // Full rebuild of the box and the boundary list
   inline void updGlobal() {
-    gx0 = gy0 = 1e9L;
-    gx1 = gy1 = -1e9L;
+    for (int k = 0; k < 4; k++)
+      rescanSide(k);
+    rebuildBoundary();
+  }
+
+  inline bool onBoundary(int i) const {
+    return pl[i].x0 - gx0 < BOUNDARY_EPS || gx1 - pl[i].x1 < BOUNDARY_EPS ||
+           pl[i].y0 - gy0 < BOUNDARY_EPS || gy1 - pl[i].y1 < BOUNDARY_EPS;
+  }
+  inline void updBoundaryTree(int i) {
+    bool on = onBoundary(i);
+    if (on && bPos[i] < 0) {
+      bPos[i] = bCount;
+      bList[bCount++] = i;
+    } else if (!on && bPos[i] >= 0) {
+      int last = bList[--bCount];
+      bList[bPos[i]] = last;
+      bPos[last] = bPos[i];
+      bPos[i] = -1;
+    }
+  }
+  inline void rebuildBoundary() {
+    bCount = 0;
     for (int i = 0; i < n; i++) {
-      if (pl[i].x0 < gx0)
-        gx0 = pl[i].x0;
-      if (pl[i].x1 > gx1)
-        gx1 = pl[i].x1;
-      if (pl[i].y0 < gy0)
-        gy0 = pl[i].y0;
-      if (pl[i].y1 > gy1)
-        gy1 = pl[i].y1;
+      bPos[i] = -1;
+      if (onBoundary(i)) {
+        bPos[i] = bCount;
+        bList[bCount++] = i;
+      }
+    }
+    bStale = false;
+  }
+
+#if SGO_GRID
+  // Overlap of tree i with any tree j > minJ in the 3x3 cells around it
+  inline bool ovlNear(int i, int minJ) const {
+    for (int dy = -1; dy <= 1; dy++) {
+      int row = (cy[i] + dy + GRID_DIM) % GRID_DIM * GRID_DIM;
+      for (int dx = -1; dx <= 1; dx++) {
+        int c = row + (cx[i] + dx + GRID_DIM) % GRID_DIM;
+        for (int j = head[c]; j >= 0; j = nxt[j])
+          if (j > minJ && j != i && overlap(pl[i], pl[j]))
+            return true;
+      }
     }
+    return false;
   }
 
+  inline bool hasOvl(int i) const { return ovlNear(i, -1); }
+
+  inline bool anyOvl() const {
+    for (int i = 0; i < n; i++)
+      if (ovlNear(i, i))
+        return true;
+    return false;
+  }
+#else
   inline bool hasOvl(int i) const {
     for (int j = 0; j < n; j++)
       if (i != j && overlap(pl[i], pl[j]))
@@ -173,6 +589,21 @@ struct Cfg {
           return true;
     return false;
   }
+#endif
+
+  inline void save(Pose &p) const {
+    p.n = n;
+    copy(x, x + n, p.x);
+    copy(y, y + n, p.y);
+    copy(a, a + n, p.a);
+  }
+  inline void load(const Pose &p) {
+    n = p.n;
+    copy(p.x, p.x + n, x);
+    copy(p.y, p.y + n, y);
+    copy(p.a, p.a + n, a);
+    updAll();
+  }
 
   inline long double side() const { return max(gx1 - gx0, gy1 - gy0); }
   inline long double score() const {
@@ -180,37 +611,189 @@ struct Cfg {
     return s * s / n;
   }
 
-  void getBoundary(vector<int> &b) const {
-    b.clear();
-    long double eps = 0.01L;
-    for (int i = 0; i < n; i++) {
-      if (pl[i].x0 - gx0 < eps || gx1 - pl[i].x1 < eps ||
-          pl[i].y0 - gy0 < eps || gy1 - pl[i].y1 < eps)
-        b.push_back(i);
+  // Trees within BOUNDARY_EPS of a side: boundaryTree(0..boundarySize()-1)
+  inline int boundarySize() {
+    if (bStale)
+      rebuildBoundary();
+    return bCount;
+  }
+  inline int boundaryTree(int k) const { return bList[k]; }
+};
+
+// Exact long double overlap check of a whole configuration
+bool exactOvl(const Cfg &c) {
+  vector<PolyL> pl(c.n);
+  for (int i = 0; i < c.n; i++)
+    getPolyL(c.x[i], c.y[i], c.a[i], pl[i]);
+  for (int i = 0; i < c.n; i++)
+    for (int j = i + 1; j < c.n; j++)
+      if (overlapL(pl[i], pl[j]))
+        return true;
+  return false;
+}
+
+// Compare the SAT and 15-gon kernels with each other and with the exact
+// long double test on K random pairs, K pairs placed within 1e-7 of
+// contact (found by bisection), and every AABB-touching pair of c.
+void crossCheck(const Cfg &c, int pairs, FILE *logf) {
+  FastRNG rng(12345);
+  long long tested = 0, satPoly = 0, satExact = 0, polyExact = 0, hits = 0;
+  auto check = [&](long double x0, long double y0, long double a0,
+                   long double x1, long double y1, long double a1) {
+    Poly p, q;
+    PolyL pl, ql;
+    getPoly(x0, y0, a0, p);
+    getPoly(x1, y1, a1, q);
+    getPolyL(x0, y0, a0, pl);
+    getPolyL(x1, y1, a1, ql);
+    bool aabb = !(p.x1 < q.x0 || q.x1 < p.x0 || p.y1 < q.y0 || q.y1 < p.y0);
+    bool sat = aabb && overlapSAT(p, q), poly = aabb && overlapPoly(p, q);
+    bool exact = overlapL(pl, ql);
+    tested++;
+    hits += exact;
+    satPoly += sat != poly;
+    satExact += sat != exact;
+    polyExact += poly != exact;
+  };
+
+  for (int k = 0; k < pairs; k++)
+    check(0, 0, rng.rf() * 360, rng.rf2() * 1.6L, rng.rf2() * 1.6L,
+          rng.rf() * 360);
+
+  for (int k = 0; k < pairs; k++) {
+    long double a0 = rng.rf() * 360, a1 = rng.rf() * 360;
+    long double t = rng.rf() * 2 * PI, ux = cosl(t), uy = sinl(t);
+    long double lo = 0, hi = 1.7L;
+    PolyL pl, ql;
+    getPolyL(0, 0, a0, pl);
+    for (int it = 0; it < 60; it++) {
+      long double mid = (lo + hi) / 2;
+      getPolyL(mid * ux, mid * uy, a1, ql);
+      (overlapL(pl, ql) ? lo : hi) = mid;
     }
+    long double d = hi * (1 + rng.rf2() * 1e-7L);
+    check(0, 0, a0, d * ux, d * uy, a1);
   }
+
+  for (int i = 0; i < c.n; i++)
+    for (int j = i + 1; j < c.n; j++) {
+      const Poly &p = c.pl[i], &q = c.pl[j];
+      if (!(p.x1 < q.x0 || q.x1 < p.x0 || p.y1 < q.y0 || q.y1 < p.y0))
+        check(c.x[i], c.y[i], c.a[i], c.x[j], c.y[j], c.a[j]);
+    }
+
+  fprintf(logf,
+          "crosscheck pairs=%lld overlapping=%lld sat!=poly=%lld "
+          "sat!=exact=%lld poly!=exact=%lld\n",
+          tested, hits, satPoly, satExact, polyExact);
+}
+
+// Kernel throughput for --bench: getPoly calls/s and overlap() pairs/s on
+// three fixed pair sets built from c. "near" are c's AABB-touching pairs
+// (all reach the narrow phase), "far" pairs whose AABBs are disjoint, and
+// "touching" pairs of c's angles placed within 1e-7 of contact. Each timing
+// runs at least `calls` calls and at least BENCH_MIN_SEC seconds.
+constexpr double BENCH_MIN_SEC = 0.2;
+
+struct KernelBench {
+  double getPolyRate = 0, nearRate = 0, farRate = 0, touchRate = 0;
+  int nearPairs = 0, farPairs = 0, touchPairs = 0;
 };
 
-// Squeeze
-Cfg squeeze(Cfg c) {
+KernelBench benchKernels(const Cfg &c, int calls) {
+  KernelBench kb;
+  auto rate = [&](const vector<pair<Poly, Poly>> &ps) {
+    if (ps.empty())
+      return 0.0;
+    int hits = 0;
+    long long done = 0;
+    double sec = 0;
+    auto t0 = chrono::steady_clock::now();
+    while (done < calls || sec < BENCH_MIN_SEC) {
+      for (const auto &p : ps)
+        hits += overlap(p.first, p.second);
+      done += ps.size();
+      sec = chrono::duration<double>(chrono::steady_clock::now() - t0).count();
+    }
+    volatile int sink = hits;
+    (void)sink;
+    return done / sec;
+  };
+
+  vector<pair<Poly, Poly>> nearSet, farSet, touchSet;
+  for (int i = 0; i < c.n; i++)
+    for (int j = i + 1; j < c.n; j++) {
+      const Poly &p = c.pl[i], &q = c.pl[j];
+      bool aabb = !(p.x1 < q.x0 || q.x1 < p.x0 || p.y1 < q.y0 || q.y1 < p.y0);
+      (aabb ? nearSet : farSet).push_back({p, q});
+    }
+
+  FastRNG rng(12345);
+  for (int k = 0; k < 256; k++) {
+    long double a0 = c.a[rng.ri(c.n)], a1 = c.a[rng.ri(c.n)];
+    long double t = rng.rf() * 2 * PI, ux = cosl(t), uy = sinl(t);
+    long double lo = 0, hi = 1.7L;
+    PolyL pl, ql;
+    getPolyL(0, 0, a0, pl);
+    for (int it = 0; it < 60; it++) {
+      long double mid = (lo + hi) / 2;
+      getPolyL(mid * ux, mid * uy, a1, ql);
+      (overlapL(pl, ql) ? lo : hi) = mid;
+    }
+    long double d = hi * (1 + rng.rf2() * 1e-7L);
+    Poly p, q;
+    getPoly(0, 0, a0, p);
+    getPoly(d * ux, d * uy, a1, q);
+    touchSet.push_back({p, q});
+  }
+
+  kb.nearPairs = nearSet.size();
+  kb.farPairs = farSet.size();
+  kb.touchPairs = touchSet.size();
+  kb.nearRate = rate(nearSet);
+  kb.farRate = rate(farSet);
+  kb.touchRate = rate(touchSet);
+
+  Poly q;
+  double sum = 0, sec = 0;
+  long long done = 0;
+  auto t0 = chrono::steady_clock::now();
+  while (done < calls || sec < BENCH_MIN_SEC) {
+    for (int i = 0; i < c.n; i++, done++) {
+      getPoly(c.x[i], c.y[i], c.a[i] + done * 1e-9L, q);
+      sum += q.x0;
+    }
+    sec = chrono::duration<double>(chrono::steady_clock::now() - t0).count();
+  }
+  volatile double sink = sum;
+  (void)sink;
+  kb.getPolyRate = done / sec;
+  return kb;
+}
+
+// Squeeze (in place); each accepted step scales the previous one
+void squeeze(Cfg &c) {
   long double cx = (c.gx0 + c.gx1) / 2.0L, cy = (c.gy0 + c.gy1) / 2.0L;
+  long double px[MAX_N], py[MAX_N];
   for (long double scale = 0.9995L; scale >= 0.98L; scale -= 0.0005L) {
-    Cfg trial = c;
     for (int i = 0; i < c.n; i++) {
-      trial.x[i] = cx + (c.x[i] - cx) * scale;
-      trial.y[i] = cy + (c.y[i] - cy) * scale;
+      px[i] = c.x[i];
+      py[i] = c.y[i];
+      c.x[i] = cx + (px[i] - cx) * scale;
+      c.y[i] = cy + (py[i] - cy) * scale;
     }
-    trial.updAll();
-    if (!trial.anyOvl())
-      c = trial;
-    else
+    c.updAll();
+    if (c.anyOvl()) {
+      copy(px, px + c.n, c.x);
+      copy(py, py + c.n, c.y);
+      c.updAll();
       break;
+    }
   }
-  return c;
 }
 
-// Compaction
-Cfg compaction(Cfg c, int iters) {
+// Compaction (in place)
+void compaction(Cfg &c, int iters) {
   long double bs = c.side();
   for (int it = 0; it < iters; it++) {
     long double cx = (c.gx0 + c.gx1) / 2.0L, cy = (c.gy0 + c.gy1) / 2.0L;
@@ -226,7 +809,6 @@ Cfg compaction(Cfg c, int iters) {
         c.y[i] = oy + dy / d * step;
         c.upd(i);
         if (!c.hasOvl(i)) {
-          c.updGlobal();
           if (c.side() < bs - 1e-12L) {
             bs = c.side();
             improved = true;
@@ -244,15 +826,13 @@ Cfg compaction(Cfg c, int iters) {
         }
       }
     }
-    c.updGlobal();
     if (!improved)
       break;
   }
-  return c;
 }
 
-// Local search
-Cfg localSearch(Cfg c, int maxIter) {
+// Local search (in place)
+void localSearch(Cfg &c, int maxIter) {
   long double bs = c.side();
   const long double steps[] = {0.01L,   0.004L,   0.0015L,
                                0.0006L, 0.00025L, 0.0001L};
@@ -273,7 +853,6 @@ Cfg localSearch(Cfg c, int maxIter) {
           c.y[i] += ddy / dist * st;
           c.upd(i);
           if (!c.hasOvl(i)) {
-            c.updGlobal();
             if (c.side() < bs - 1e-12L) {
               bs = c.side();
               improved = true;
@@ -281,7 +860,6 @@ Cfg localSearch(Cfg c, int maxIter) {
               c.x[i] = ox;
               c.y[i] = oy;
               c.upd(i);
-              c.updGlobal();
             }
           } else {
             c.x[i] = ox;
@@ -297,7 +875,6 @@ Cfg localSearch(Cfg c, int maxIter) {
           c.y[i] += dy[d] * st;
           c.upd(i);
           if (!c.hasOvl(i)) {
-            c.updGlobal();
             if (c.side() < bs - 1e-12L) {
               bs = c.side();
               improved = true;
@@ -305,7 +882,6 @@ Cfg localSearch(Cfg c, int maxIter) {
               c.x[i] = ox;
               c.y[i] = oy;
               c.upd(i);
-              c.updGlobal();
             }
           } else {
             c.x[i] = ox;
@@ -324,14 +900,12 @@ Cfg localSearch(Cfg c, int maxIter) {
             c.a[i] -= 360.0L;
           c.upd(i);
           if (!c.hasOvl(i)) {
-            c.updGlobal();
             if (c.side() < bs - 1e-12L) {
               bs = c.side();
               improved = true;
             } else {
               c.a[i] = oa;
               c.upd(i);
-              c.updGlobal();
             }
           } else {
             c.a[i] = oa;
@@ -343,7 +917,6 @@ Cfg localSearch(Cfg c, int maxIter) {
     if (!improved)
       break;
   }
-  return c;
 }
 
 // Swap move operator
@@ -358,21 +931,78 @@ bool swapTrees(Cfg &c, int i, int j) {
   return !c.hasOvl(i) && !c.hasOvl(j);
 }
 
-// SA optimization (Enhanced with swap moves)
-Cfg sa_opt(Cfg c, int iter, long double T0, long double Tm, uint64_t seed) {
+// SA move kinds, as counted in SAStats (move types 9 and 11, and the pair
+// moves when n == 1, all end up in the small jitter move)
+constexpr int SA_KINDS = 11;
+const char *SA_KIND_NAME[SA_KINDS] = {
+    "shift", "center", "rotate", "shift_rotate", "boundary", "scale",
+    "levy",  "pair",   "align",  "jitter",       "swap"};
+
+struct SAStats {
+  long long att[SA_KINDS] = {}, valid[SA_KINDS] = {}, acc[SA_KINDS] = {};
+  long long ovlPairs = 0, ovlNarrow = 0;
+
+  void add(const SAStats &o) {
+    for (int k = 0; k < SA_KINDS; k++) {
+      att[k] += o.att[k];
+      valid[k] += o.valid[k];
+      acc[k] += o.acc[k];
+    }
+    ovlPairs += o.ovlPairs;
+    ovlNarrow += o.ovlNarrow;
+  }
+};
+
+// SA optimization (Enhanced with swap moves), in place: cur ends as the
+// best configuration seen. Move counts are added to stats if given.
+//
+// A rejected step returns to the best state. Instead of copying Cfgs, best
+// is a Pose and every tree changed since it was saved is journaled, so a
+// rejection reloads only those trees and a new best saves only those.
+void sa_opt(Cfg &cur, int iter, long double T0, long double Tm,
+            uint64_t seed, SAStats *stats = nullptr) {
   FastRNG rng(seed);
-  Cfg best = c, cur = c;
-  long double bs = best.side(), cs = bs, T = T0;
+  const int n = cur.n;
+  SAStats st;
+  Pose best;
+  cur.save(best);
+  bool dirty[MAX_N] = {};
+  int touched[MAX_N], nTouched = 0;
+  auto touch = [&](int i) {
+    if (!dirty[i]) {
+      dirty[i] = true;
+      touched[nTouched++] = i;
+    }
+  };
+  auto revert = [&]() {
+    for (int k = 0; k < nTouched; k++) {
+      int i = touched[k];
+      cur.x[i] = best.x[i];
+      cur.y[i] = best.y[i];
+      cur.a[i] = best.a[i];
+      cur.upd(i);
+      dirty[i] = false;
+    }
+    nTouched = 0;
+  };
+
+  long double bs = cur.side(), cs = bs, T = T0;
   long double alpha = powl(Tm / T0, 1.0L / iter);
   int noImp = 0;
 
   for (int it = 0; it < iter; it++) {
     int mt = rng.ri(12);
+    int kind = (mt == 11 || (n == 1 && (mt == 7 || mt == 8 || mt == 10)))
+                   ? 9
+                   : mt;
+    st.att[kind]++;
     long double sc = T / T0;
     bool valid = true;
+    int mi = -1, mj = -1; // Trees moved by this step (mt 5 moves all)
 
     if (mt == 0) {
-      int i = rng.ri(c.n);
+      int i = rng.ri(n);
+      mi = i;
       long double ox = cur.x[i], oy = cur.y[i];
       cur.x[i] += rng.gaussian() * 0.5L * sc;
       cur.y[i] += rng.gaussian() * 0.5L * sc;
@@ -384,7 +1014,8 @@ Cfg sa_opt(Cfg c, int iter, long double T0, long double Tm, uint64_t seed) {
         valid = false;
       }
     } else if (mt == 1) {
-      int i = rng.ri(c.n);
+      int i = rng.ri(n);
+      mi = i;
       long double ox = cur.x[i], oy = cur.y[i];
       long double bcx = (cur.gx0 + cur.gx1) / 2.0L,
                   bcy = (cur.gy0 + cur.gy1) / 2.0L;
@@ -402,7 +1033,8 @@ Cfg sa_opt(Cfg c, int iter, long double T0, long double Tm, uint64_t seed) {
         valid = false;
       }
     } else if (mt == 2) {
-      int i = rng.ri(c.n);
+      int i = rng.ri(n);
+      mi = i;
       long double oa = cur.a[i];
       cur.a[i] += rng.gaussian() * 80.0L * sc;
       while (cur.a[i] < 0)
@@ -416,7 +1048,8 @@ Cfg sa_opt(Cfg c, int iter, long double T0, long double Tm, uint64_t seed) {
         valid = false;
       }
     } else if (mt == 3) {
-      int i = rng.ri(c.n);
+      int i = rng.ri(n);
+      mi = i;
       long double ox = cur.x[i], oy = cur.y[i], oa = cur.a[i];
       cur.x[i] += rng.rf2() * 0.5L * sc;
       cur.y[i] += rng.rf2() * 0.5L * sc;
@@ -434,10 +1067,10 @@ Cfg sa_opt(Cfg c, int iter, long double T0, long double Tm, uint64_t seed) {
         valid = false;
       }
     } else if (mt == 4) {
-      vector<int> boundary;
-      cur.getBoundary(boundary);
-      if (!boundary.empty()) {
-        int i = boundary[rng.ri(boundary.size())];
+      int nb = cur.boundarySize();
+      if (nb > 0) {
+        int i = cur.boundaryTree(rng.ri(nb));
+        mi = i;
         long double ox = cur.x[i], oy = cur.y[i], oa = cur.a[i];
         long double bcx = (cur.gx0 + cur.gx1) / 2.0L,
                     bcy = (cur.gy0 + cur.gy1) / 2.0L;
@@ -466,18 +1099,26 @@ Cfg sa_opt(Cfg c, int iter, long double T0, long double Tm, uint64_t seed) {
       long double factor = 1.0L - rng.rf() * 0.004L * sc;
       long double cx = (cur.gx0 + cur.gx1) / 2.0L,
                   cy = (cur.gy0 + cur.gy1) / 2.0L;
-      Cfg trial = cur;
-      for (int i = 0; i < c.n; i++) {
-        trial.x[i] = cx + (cur.x[i] - cx) * factor;
-        trial.y[i] = cy + (cur.y[i] - cy) * factor;
-      }
-      trial.updAll();
-      if (!trial.anyOvl())
-        cur = trial;
-      else
+      long double px[MAX_N], py[MAX_N];
+      for (int i = 0; i < n; i++) {
+        px[i] = cur.x[i];
+        py[i] = cur.y[i];
+        cur.x[i] = cx + (px[i] - cx) * factor;
+        cur.y[i] = cy + (py[i] - cy) * factor;
+      }
+      cur.updAll();
+      if (cur.anyOvl()) {
+        copy(px, px + n, cur.x);
+        copy(py, py + n, cur.y);
+        cur.updAll();
         valid = false;
+      } else {
+        for (int i = 0; i < n; i++)
+          touch(i);
+      }
     } else if (mt == 6) {
-      int i = rng.ri(c.n);
+      int i = rng.ri(n);
+      mi = i;
       long double ox = cur.x[i], oy = cur.y[i];
       long double levy = powl(rng.rf() + 0.001L, -1.3L) * 0.008L;
       cur.x[i] += rng.rf2() * levy;
@@ -489,8 +1130,10 @@ Cfg sa_opt(Cfg c, int iter, long double T0, long double Tm, uint64_t seed) {
         cur.upd(i);
         valid = false;
       }
-    } else if (mt == 7 && c.n > 1) {
-      int i = rng.ri(c.n), j = (i + 1) % c.n;
+    } else if (mt == 7 && n > 1) {
+      int i = rng.ri(n), j = (i + 1) % n;
+      mi = i;
+      mj = j;
       long double oxi = cur.x[i], oyi = cur.y[i], oxj = cur.x[j],
                   oyj = cur.y[j];
       long double dx = rng.rf2() * 0.3L * sc, dy = rng.rf2() * 0.3L * sc;
@@ -509,17 +1152,21 @@ Cfg sa_opt(Cfg c, int iter, long double T0, long double Tm, uint64_t seed) {
         cur.upd(j);
         valid = false;
       }
-    } else if (mt == 10 && c.n > 1) {
-      int i = rng.ri(c.n), j = rng.ri(c.n);
-      Cfg old = cur;
+    } else if (mt == 10 && n > 1) {
+      int i = rng.ri(n), j = rng.ri(n);
+      mi = i;
+      mj = j;
       if (!swapTrees(cur, i, j)) {
-        cur = old;
+        // Swapping back restores the step exactly
+        if (i != j)
+          swapTrees(cur, i, j);
         valid = false;
       }
-    } else if (mt == 8 && c.n > 1) {
+    } else if (mt == 8 && n > 1) {
       // Alignment Move: Rotate to match a neighbor
-      int i = rng.ri(c.n);
-      int j = rng.ri(c.n);
+      int i = rng.ri(n);
+      mi = i;
+      int j = rng.ri(n);
       if (i != j) {
         long double oa = cur.a[i];
         // Try aligning with neighbor, or 180 flip, or 90 degree turn
@@ -544,7 +1191,8 @@ Cfg sa_opt(Cfg c, int iter, long double T0, long double Tm, uint64_t seed) {
         valid = false;
       }
     } else {
-      int i = rng.ri(c.n);
+      int i = rng.ri(n);
+      mi = i;
       long double ox = cur.x[i], oy = cur.y[i];
       cur.x[i] += rng.rf2() * 0.002L;
       cur.y[i] += rng.rf2() * 0.002L;
@@ -564,21 +1212,33 @@ Cfg sa_opt(Cfg c, int iter, long double T0, long double Tm, uint64_t seed) {
         T = Tm;
       continue;
     }
+    st.valid[kind]++;
+    if (mi >= 0)
+      touch(mi);
+    if (mj >= 0)
+      touch(mj);
 
-    cur.updGlobal();
     long double ns = cur.side();
     long double delta = ns - cs;
 
     if (delta < 0 || rng.rf() < expl(-delta / T)) {
+      st.acc[kind]++;
       cs = ns;
       if (ns < bs) {
         bs = ns;
-        best = cur;
+        for (int k = 0; k < nTouched; k++) {
+          int i = touched[k];
+          best.x[i] = cur.x[i];
+          best.y[i] = cur.y[i];
+          best.a[i] = cur.a[i];
+          dirty[i] = false;
+        }
+        nTouched = 0;
         noImp = 0;
       } else
         noImp++;
     } else {
-      cur = best;
+      revert();
       cs = bs;
       noImp++;
     }
@@ -591,12 +1251,15 @@ Cfg sa_opt(Cfg c, int iter, long double T0, long double Tm, uint64_t seed) {
     if (T < Tm)
       T = Tm;
   }
-  return best;
+  revert();
+  if (stats)
+    stats->add(st);
 }
 
-// Perturb
-Cfg perturb(Cfg c, long double str, FastRNG &rng) {
-  Cfg original = c;
+// Perturb (in place); c is left unchanged if no valid result is found
+void perturb(Cfg &c, long double str, FastRNG &rng) {
+  Pose original;
+  c.save(original);
   int np = max(1, (int)(c.n * 0.08L + str * 3.0L));
   for (int k = 0; k < np; k++) {
     int i = rng.ri(c.n);
@@ -632,160 +1295,529 @@ Cfg perturb(Cfg c, long double str, FastRNG &rng) {
     if (fixed)
       break;
   }
-  c.updGlobal();
   if (c.anyOvl())
-    return original;
-  return c;
+    c.load(original);
 }
 
-// PARALLEL optimization
-Cfg optimizeParallel(Cfg c, int iters, int restarts) {
-  Cfg globalBest = c;
-  long double globalBestSide = c.side();
+// PARALLEL optimization: parallel tempering
+//
+// R replicas (any number, independent of the thread count) sit on a ladder
+// of temperatures. Each cycle every replica runs one SA segment, annealing
+// from its rung's temperature down to the next colder rung, and the
+// replicas are spread over the threads. Then neighbouring rungs try to
+// swap: even pairs (0,1), (2,3)... on even cycles and odd pairs (1,2),
+// (3,4)... on odd cycles. A swap exchanges rungs, never configurations.
+//
+// Every PT_ADAPT_EVERY cycles the log-spacing of each pair of rungs is
+// stretched or shrunk toward PT_TARGET swap acceptance; the coldest and
+// hottest rungs stay where they are.
+constexpr long double PT_T_MIN = 0.0000001L;
+constexpr long double PT_T_MAX = 5.0L;
+constexpr long double PT_TARGET = 0.25L;
+constexpr int PT_ADAPT_EVERY = 4;
+
+struct Ladder {
+  vector<long double> T;              // rung temperatures, coldest first
+  vector<long long> att, acc;         // swap stats of pair (k, k + 1)
+  vector<long long> winAtt, winAcc;   // same, since the last adaptation
+
+  explicit Ladder(int R) : T(R), att(R), acc(R), winAtt(R), winAcc(R) {
+    // Geometric start between PT_T_MIN and PT_T_MAX
+    for (int k = 0; k < R; k++)
+      T[k] = PT_T_MIN * powl(PT_T_MAX / PT_T_MIN, (long double)k / max(1, R - 1));
+  }
+
+  // Segment end temperature for rung k
+  long double cold(int k) const {
+    if (k > 0)
+      return T[k - 1];
+    return T.size() > 1 ? T[0] * T[0] / T[1] : T[0];
+  }
+
+  void adapt() {
+    const size_t R = T.size();
+    vector<long double> gap(R - 1);
+    long double span = logl(T[R - 1] / T[0]), sum = 0;
+    for (size_t k = 0; k + 1 < R; k++) {
+      gap[k] = logl(T[k + 1] / T[k]);
+      if (winAtt[k] > 0) {
+        long double rate = (long double)winAcc[k] / winAtt[k];
+        // Too many swaps accepted: rungs are too close, widen the gap
+        gap[k] *= expl(rate - PT_TARGET);
+      }
+      sum += gap[k];
+      winAtt[k] = winAcc[k] = 0;
+    }
+    // Keep both ends of the ladder; only the spacing in between moves
+    for (size_t k = 0; k + 1 < R; k++)
+      T[k + 1] = T[k] * expl(gap[k] * span / sum);
+  }
+};
+
+struct PTOptions {
+  int replicas = 1;
+  double timeBudget = 0; // seconds; > 0 runs cycles until it is used up
+  string checkpoint;     // state file; resumed from if it matches
+  FILE *log = stdout;     // nullptr runs quietly
+  bool json = false;     // "cycle" telemetry lines on log
+  uint64_t seed = 42;    // run seed; an interrupted run resumes with its own
+};
+
+// What a PT run did, for the "result" telemetry line
+struct PTReport {
+  int cycles = 0;
+  SAStats moves;          // all replicas, incl. overlap checks of refinement
+  vector<double> swapRate; // accepted / attempted per neighbouring rung pair
+};
 
-#pragma omp parallel
+// Everything needed to continue a run: written after every cycle, so a
+// killed job loses at most one cycle. SA segments are seeded from the run
+// seed and the cycle number, so a resumed run repeats exactly what the
+// killed one would have done. Binary layout: magic, n, R, cycle, endCycle,
+// seed, swap RNG, the run's start and result Pose, ladder (T, att, acc,
+// winAtt, winAcc), rungOf, then per replica its current Pose, best Pose and
+// best side. A run only resumes from a group it started from or returned:
+// anything else (rotated, cascaded, improved elsewhere) starts afresh.
+const char CKPT_MAGIC[8] = {'S', 'G', 'O', 'C', 'K', 'P', 'T', '3'};
+
+struct PTState {
+  int cycle = 0, endCycle = 0;
+  uint64_t seed = 0;
+  FastRNG xrng;
+  Ladder ladder;
+  vector<int> rungOf;
+  Pose start, result;
+  vector<Pose> cur, best;
+  vector<long double> bestSide;
+
+  explicit PTState(int R)
+      : ladder(R), rungOf(R), cur(R), best(R), bestSide(R) {}
+};
+
+template <class T> static void putVec(ofstream &f, const vector<T> &v) {
+  f.write((const char *)v.data(), v.size() * sizeof(T));
+}
+template <class T> static void getVec(ifstream &f, vector<T> &v) {
+  f.read((char *)v.data(), v.size() * sizeof(T));
+}
+
+void saveCheckpoint(const string &fn, int n, const PTState &st) {
+  int R = st.rungOf.size();
+  string tmp = fn + ".tmp";
   {
-    int tid = omp_get_thread_num();
-    int num_threads = omp_get_max_threads();
-    FastRNG rng(42 + tid * 1000 + c.n);
+    ofstream f(tmp, ios::binary);
+    f.write(CKPT_MAGIC, 8);
+    for (int v : {n, R, st.cycle, st.endCycle})
+      f.write((const char *)&v, sizeof(v));
+    f.write((const char *)&st.seed, sizeof(st.seed));
+    f.write((const char *)st.xrng.s, sizeof(st.xrng.s));
+    f.write((const char *)&st.start, sizeof(st.start));
+    f.write((const char *)&st.result, sizeof(st.result));
+    putVec(f, st.ladder.T);
+    putVec(f, st.ladder.att);
+    putVec(f, st.ladder.acc);
+    putVec(f, st.ladder.winAtt);
+    putVec(f, st.ladder.winAcc);
+    putVec(f, st.rungOf);
+    putVec(f, st.cur);
+    putVec(f, st.best);
+    putVec(f, st.bestSide);
+    if (!f)
+      return;
+  }
+  rename(tmp.c_str(), fn.c_str());
+}
 
-    // Temperatures: Geometric spacing
-    long double T_min = 0.0000001L;
-    long double T_max = 5.0L;
-    long double T =
-        T_min * powl(T_max / T_min, (long double)tid / max(1, num_threads - 1));
+// c is p, up to the 17-decimal round trip through a CSV
+bool samePose(const Cfg &c, const Pose &p) {
+  if (c.n != p.n)
+    return false;
+  for (int i = 0; i < c.n; i++)
+    if (fabsl(c.x[i] - p.x[i]) > 1e-12L || fabsl(c.y[i] - p.y[i]) > 1e-12L ||
+        fabsl(c.a[i] - p.a[i]) > 1e-12L)
+      return false;
+  return true;
+}
+
+// False (and st untouched) if there is no usable checkpoint for c and R
+bool loadCheckpoint(const string &fn, const Cfg &c, PTState &st) {
+  const int n = c.n;
+  ifstream f(fn, ios::binary);
+  char magic[8];
+  int hdr[4];
+  if (!f.read(magic, 8) || memcmp(magic, CKPT_MAGIC, 8) != 0 ||
+      !f.read((char *)hdr, sizeof(hdr)))
+    return false;
+  int R = st.rungOf.size();
+  if (hdr[0] != n || hdr[1] != R)
+    return false;
+  PTState in(R);
+  in.cycle = hdr[2];
+  in.endCycle = hdr[3];
+  f.read((char *)&in.seed, sizeof(in.seed));
+  f.read((char *)in.xrng.s, sizeof(in.xrng.s));
+  f.read((char *)&in.start, sizeof(in.start));
+  f.read((char *)&in.result, sizeof(in.result));
+  getVec(f, in.ladder.T);
+  getVec(f, in.ladder.att);
+  getVec(f, in.ladder.acc);
+  getVec(f, in.ladder.winAtt);
+  getVec(f, in.ladder.winAcc);
+  getVec(f, in.rungOf);
+  getVec(f, in.cur);
+  getVec(f, in.best);
+  getVec(f, in.bestSide);
+  if (!f || !(samePose(c, in.start) || samePose(c, in.result)))
+    return false;
+  st = in;
+  return true;
+}
 
-    Cfg current = c;
-    long double currentSide = c.side();
+// resident (daemon mode) is an in-memory checkpoint: a run continues from
+// it when it holds state and leaves its final state there.
+Cfg optimizeParallel(Cfg c, int iters, int restarts, const PTOptions &opt,
+                     PTReport *report = nullptr, PTState *resident = nullptr) {
+  const int R = max(1, opt.replicas);
+  FILE *logf = opt.log;
+  PTState st(R);
+  st.seed = opt.seed;
+  st.xrng = FastRNG(streamSeed(st.seed, c.n, STREAM_SWAP)); // swap decisions
+  Ladder &ladder = st.ladder;
+  vector<int> &rungOf = st.rungOf;
+  vector<Pose> &localBest = st.best;
+  vector<long double> &localBestSide = st.bestSide;
+  vector<Cfg> rep(R, c);
+  vector<int> at(R); // rung -> replica
+  vector<SAStats> repStats(R);
+
+  int cycles = restarts; // Reuse restarts arg as "cycles" of PT
+  int steps_per_cycle = iters / cycles;
+  if (steps_per_cycle < 100)
+    steps_per_cycle = 100;
+
+  bool resumed = false;
+  if (resident && resident->cycle > 0 && (int)resident->rungOf.size() == R) {
+    st = *resident;
+    resumed = true;
+  } else if (!opt.checkpoint.empty() &&
+             loadCheckpoint(opt.checkpoint, c, st)) {
+    if (logf)
+      fprintf(logf, "Resumed %s at cycle %d of %d (seed %llu)\n",
+              opt.checkpoint.c_str(), st.cycle, st.endCycle,
+              (unsigned long long)st.seed);
+    resumed = true;
+  }
 
+  if (resumed) {
+    // An interrupted run finishes its cycles with its own seed; a finished
+    // one does more, as a new run seeded with opt.seed
+    if (st.cycle >= st.endCycle) {
+      st.endCycle = st.cycle + cycles;
+      st.seed = opt.seed;
+      st.xrng = FastRNG(streamSeed(st.seed, c.n, STREAM_SWAP, 0, st.cycle));
+    }
+    for (int r = 0; r < R; r++)
+      rep[r].load(st.cur[r]);
+  } else {
+    st.endCycle = cycles;
     // Warmup: Perturb diverse for high temp
-    if (tid > 0) {
-      current = perturb(c, 0.05L * tid, rng);
-      if (current.anyOvl())
-        current = c; // Fallback
-    }
-
-    // Best local
-    Cfg localBest = current;
-    long double localBestSide = current.side();
-
-    // Shared Exchange Buffer
-    static Cfg exchangePool[64]; // Max 64 threads supported for simple exchange
-    static long double exchangeScores[64];
-
-    int cycles = restarts; // Reuse restarts arg as "cycles" of PT
-    int steps_per_cycle = iters / cycles;
-    if (steps_per_cycle < 100)
-      steps_per_cycle = 100;
-
-    for (int cycle = 0; cycle < cycles; cycle++) {
-      // Run SA segment
-      current =
-          sa_opt(current, steps_per_cycle, T, T, 42 + tid * cycle + c.n * 999);
-
-      // Squeeze & Local Search (greedy step)
-      if (tid == 0 || cycle % 5 == 0) {
-        Cfg refined = squeeze(current);
-        refined = compaction(refined, 15);
-        refined = localSearch(refined, 20);
-        if (!refined.anyOvl() && refined.side() < localBestSide) {
-          localBestSide = refined.side();
-          localBest = refined;
+#pragma omp parallel for schedule(dynamic)
+    for (int r = 0; r < R; r++) {
+      rungOf[r] = r;
+      if (r > 0) {
+        FastRNG rng(streamSeed(st.seed, c.n, STREAM_WARMUP, r));
+        perturb(rep[r], 0.05L * r, rng);
+        if (rep[r].anyOvl())
+          rep[r] = c; // Fallback
+      }
+      rep[r].save(localBest[r]);
+      localBestSide[r] = rep[r].side();
+    }
+  }
+  for (int r = 0; r < R; r++)
+    at[rungOf[r]] = r;
+  const int firstCycle = st.cycle;
+  // Until the run returns, resuming is only right for this same input
+  c.save(st.start);
+  c.save(st.result);
+
+  auto start = chrono::steady_clock::now();
+  auto elapsed = [&]() {
+    return chrono::duration<double>(chrono::steady_clock::now() - start)
+        .count();
+  };
+
+  // With a time budget, cycles run until it is used up instead
+  while (opt.timeBudget > 0 || st.cycle < st.endCycle) {
+    const int cycle = st.cycle;
+#pragma omp parallel for schedule(dynamic)
+    for (int r = 0; r < R; r++) {
+      int k = rungOf[r];
+      Cfg &current = rep[r];
+      OvlCounters before = ovlCount;
+      sa_opt(current, steps_per_cycle, ladder.T[k], ladder.cold(k),
+             streamSeed(st.seed, c.n, STREAM_SA, r, cycle), &repStats[r]);
+
+      // Squeeze & Local Search (greedy step), always on the coldest rung
+      if (k == 0 || cycle % 5 == 0) {
+        Cfg refined = current;
+        squeeze(refined);
+        compaction(refined, 15);
+        localSearch(refined, 20);
+        if (!refined.anyOvl() && refined.side() < localBestSide[r]) {
+          localBestSide[r] = refined.side();
+          refined.save(localBest[r]);
         }
         // Recover current to refined if it's better
-        if (refined.side() < current.side()) {
+        if (refined.side() < current.side())
           current = refined;
-        }
       }
+      repStats[r].ovlPairs += ovlCount.pairs - before.pairs;
+      repStats[r].ovlNarrow += ovlCount.narrow - before.narrow;
+    }
 
-// --- REPLICA EXCHANGE (Sync) ---
-#pragma omp barrier
-
-      if (tid < 64) {
-        exchangePool[tid] = current;
-        exchangeScores[tid] = current.side();
-      }
-
-#pragma omp barrier
-
-      // Master performs swaps (simplified for OpenMP)
-      // Or randomized: Pick a neighbor and Metropolis swap
-      if (tid % 2 == 0 && tid + 1 < num_threads && tid + 1 < 64) {
-        int a = tid;
-        int b = tid + 1;
-        long double Ea = exchangeScores[a];
-        long double Eb = exchangeScores[b];
-        long double Ta = T_min * powl(T_max / T_min,
-                                      (long double)a / max(1, num_threads - 1));
-        long double Tb = T_min * powl(T_max / T_min,
-                                      (long double)b / max(1, num_threads - 1));
-
-        // Metropolis criterion for swap
-        long double delta = (1.0L / Ta - 1.0L / Tb) *
-                            (Ea - Eb); // E is Side (proportional to Energy)
-        // Note: Energy usually Area/N, Side is sqrt. We use Side diff.
-
-        if (delta <= 0 || rng.rf() < expl(-delta)) {
-          // Swap
-          Cfg temp = exchangePool[a];
-          exchangePool[a] = exchangePool[b];
-          exchangePool[b] = temp;
-          exchangeScores[a] = Eb;
-          exchangeScores[b] = Ea;
-        }
+    // --- REPLICA EXCHANGE: even or odd pairs of neighbouring rungs ---
+    for (int k = cycle % 2; k + 1 < R; k += 2) {
+      int a = at[k], b = at[k + 1];
+      long double Ea = rep[a].side(), Eb = rep[b].side();
+      // Accept with min(1, exp((1/Ta - 1/Tb)(Ea - Eb))): a hotter replica
+      // that found a lower energy always moves down
+      long double delta =
+          (1.0L / ladder.T[k] - 1.0L / ladder.T[k + 1]) * (Ea - Eb);
+      ladder.att[k]++;
+      ladder.winAtt[k]++;
+      if (delta >= 0 || st.xrng.rf() < expl(delta)) {
+        ladder.acc[k]++;
+        ladder.winAcc[k]++;
+        swap(rungOf[a], rungOf[b]);
+        swap(at[k], at[k + 1]);
       }
+    }
 
-#pragma omp barrier
+    if (R > 2 && (cycle + 1) % PT_ADAPT_EVERY == 0)
+      ladder.adapt();
+
+    st.cycle++;
+    if (opt.timeBudget > 0)
+      st.endCycle = max(st.endCycle, st.cycle);
+    if (opt.json && logf) {
+      long double bestSide = localBestSide[0];
+      for (int r = 1; r < R; r++)
+        bestSide = min(bestSide, localBestSide[r]);
+      fprintf(logf,
+              "{\"event\":\"cycle\",\"n\":%d,\"cycle\":%d,\"end_cycle\":%d,"
+              "\"best_side\":%.12Lf,\"cold_T\":%.6Lg,\"elapsed\":%.3f}\n",
+              c.n, st.cycle, st.endCycle, bestSide, ladder.T[0], elapsed());
+      fflush(logf);
+    }
+    if (!opt.checkpoint.empty() || resident)
+      for (int r = 0; r < R; r++)
+        rep[r].save(st.cur[r]);
+    if (!opt.checkpoint.empty())
+      saveCheckpoint(opt.checkpoint, c.n, st);
+    if (opt.timeBudget > 0 && elapsed() >= opt.timeBudget)
+      break;
+  }
 
-      // Pick up new state
-      if (tid < 64) {
-        current = exchangePool[tid];
-      }
+  if (R > 1 && logf) {
+    fprintf(logf, "PT: %d replicas, swap acceptance per pair:", R);
+    for (int k = 0; k + 1 < R; k++)
+      fprintf(logf, " %.2f",
+              ladder.att[k] ? (double)ladder.acc[k] / ladder.att[k] : 0.0);
+    fprintf(logf, "\nPT: final ladder T = %.3Lg .. %.3Lg\n", ladder.T[0],
+            ladder.T[R - 1]);
+  }
+  if (resident)
+    *resident = st;
+  if (report) {
+    report->cycles = st.cycle - firstCycle;
+    for (int r = 0; r < R; r++)
+      report->moves.add(repStats[r]);
+    report->swapRate.assign(R - 1, 0.0);
+    for (int k = 0; k + 1 < R; k++)
+      if (ladder.att[k])
+        report->swapRate[k] = (double)ladder.acc[k] / ladder.att[k];
+  }
 
-// Odd/Even phase 2
-#pragma omp barrier
-      if (tid % 2 == 1 && tid + 1 < num_threads && tid + 1 < 64) {
-        // Same logic ... simplified here:
-        // Just skip to keep code short, or duplicte swap logic.
-        // Ideally we want adjacent swaps.
+  Cfg globalBest = c;
+  long double globalBestSide = c.side();
+  for (int r = 0; r < R; r++) {
+    if (localBestSide[r] < globalBestSide) {
+      Cfg lb = c;
+      lb.load(localBest[r]);
+      if (!lb.anyOvl()) {
+        globalBestSide = localBestSide[r];
+        globalBest = lb;
       }
-#pragma omp barrier
     }
-
-#pragma omp critical
-    {
-      if (!localBest.anyOvl() && localBestSide < globalBestSide) {
-        globalBestSide = localBestSide;
-        globalBest = localBest;
-      }
-      // Also check current state of thread 0 (lowest temp)
-      if (!current.anyOvl() && current.side() < globalBestSide) {
-        globalBestSide = current.side();
-        globalBest = current;
-      }
+    // Also check this replica's final state
+    if (!rep[r].anyOvl() && rep[r].side() < globalBestSide) {
+      globalBestSide = rep[r].side();
+      globalBest = rep[r];
     }
   }
 
-  globalBest = squeeze(globalBest);
-  globalBest = compaction(globalBest, 80);
-  globalBest = localSearch(globalBest, 150);
+  squeeze(globalBest);
+  compaction(globalBest, 80);
+  localSearch(globalBest, 150);
 
   if (globalBest.anyOvl())
-    return c;
+    globalBest = c;
+  if (!opt.checkpoint.empty()) {
+    // The next run may well start from what this one returned
+    globalBest.save(st.result);
+    saveCheckpoint(opt.checkpoint, c.n, st);
+  }
   return globalBest;
 }
 
-map<int, Cfg> loadCSV(const string &fn) {
+// Iterations and PT cycles for group n: small groups get more of both
+void scaleForGroup(int n, int iters, int restarts, int &it, int &r) {
+  it = iters;
+  r = restarts;
+  if (n <= 10) {
+    it = (int)(iters * 2.5);
+    r = restarts * 2;
+  } else if (n <= 30) {
+    it = (int)(iters * 1.8);
+    r = (int)(restarts * 1.5);
+  } else if (n <= 60) {
+    it = (int)(iters * 1.3);
+    r = restarts;
+  } else if (n > 150) {
+    it = (int)(iters * 0.7);
+    r = (int)(restarts * 0.8);
+  }
+  r = max(4, r);
+}
+
+// The search runs on the double kernel; what gets saved is decided with the
+// exact long double check. Returns o if it should replace c, else c.
+Cfg keepBetter(const Cfg &c, const Cfg &o, bool &c_ovl, bool &o_ovl) {
+  o_ovl = exactOvl(o);
+  c_ovl = exactOvl(c);
+  if (!c_ovl && o_ovl)
+    return c;
+  if (c_ovl && !o_ovl)
+    return o;
+  return o.side() > c.side() + 1e-14L ? c : o;
+}
+
+// --json "result" line for a run that turned c into o
+void printResult(FILE *f, const Cfg &c, const Cfg &o, bool c_ovl, bool o_ovl,
+                 long double wall, int threads, int replicas,
+                 const PTReport &report) {
+  long double os = c.score(), ns = o.score();
+  const SAStats &m = report.moves;
+  fprintf(f,
+          "{\"event\":\"result\",\"n\":%d,\"initial_side\":%.12Lf,"
+          "\"final_side\":%.12Lf,\"initial_score\":%.12Lf,"
+          "\"final_score\":%.12Lf,\"improved\":%s,\"initial_overlap\":%s,"
+          "\"overlap\":%s,\"wall_time\":%.3Lf,\"threads\":%d,"
+          "\"replicas\":%d,\"cycles\":%d,\"moves\":{",
+          c.n, c.side(), o.side(), os, ns,
+          (ns < os - 1e-10L && !o_ovl) || (c_ovl && !o_ovl) ? "true" : "false",
+          c_ovl ? "true" : "false", o_ovl ? "true" : "false", wall, threads,
+          replicas, report.cycles);
+  for (int k = 0; k < SA_KINDS; k++)
+    fprintf(f,
+            "%s\"%s\":{\"attempted\":%lld,\"valid\":%lld,\"accepted\":%lld}",
+            k ? "," : "", SA_KIND_NAME[k], m.att[k], m.valid[k], m.acc[k]);
+  fprintf(f,
+          "},\"overlap_checks\":{\"pairs\":%lld,\"narrow\":%lld},"
+          "\"swap_rates\":[",
+          m.ovlPairs, m.ovlNarrow);
+  for (size_t k = 0; k < report.swapRate.size(); k++)
+    fprintf(f, "%s%.4f", k ? "," : "", report.swapRate[k]);
+  fprintf(f, "]}\n");
+  fflush(f);
+}
+
+// Binary store written by submission_store.py: 8-byte magic, 201 int64 row
+// offsets (group n is rows off[n-1]..off[n]), then float64 (x, y, deg) rows.
+// With onlyN > 0 the reader seeks straight to that group.
+map<int, Cfg> loadStore(const string &fn, int onlyN = 0) {
   map<int, Cfg> cfg;
-  ifstream f(fn);
-  if (!f)
+  ifstream f(fn, ios::binary);
+  char magic[8];
+  if (!f.read(magic, 8) || memcmp(magic, "SANTA25", 8) != 0)
     return cfg;
+  int64_t off[MAX_N + 1];
+  if (!f.read((char *)off, sizeof(off)))
+    return cfg;
+  const streamoff dataStart = 8 + sizeof(off);
+  vector<double> rows;
+  for (int n = 1; n <= MAX_N; n++) {
+    int64_t k = off[n] - off[n - 1];
+    if (k <= 0 || (onlyN > 0 && n != onlyN))
+      continue;
+    rows.resize(3 * k);
+    f.seekg(dataStart + off[n - 1] * 3 * (streamoff)sizeof(double));
+    if (!f.read((char *)rows.data(), rows.size() * sizeof(double)))
+      break;
+    Cfg c;
+    c.n = n;
+    for (int i = 0; i < min<int64_t>(k, n); i++) {
+      c.x[i] = rows[3 * i];
+      c.y[i] = rows[3 * i + 1];
+      c.a[i] = rows[3 * i + 2];
+    }
+    c.updAll();
+    cfg[n] = c;
+  }
+  return cfg;
+}
+
+// Same layout as loadStore reads, rows in double like submission_store.py
+void saveStore(const string &fn, const map<int, Cfg> &cfg) {
+  int64_t off[MAX_N + 1] = {0};
+  for (int n = 1; n <= MAX_N; n++)
+    off[n] = off[n - 1] + (cfg.count(n) ? n : 0);
+  vector<double> rows;
+  rows.reserve(3 * off[MAX_N]);
+  for (auto &[n, c] : cfg)
+    for (int i = 0; i < n; i++) {
+      rows.push_back((double)c.x[i]);
+      rows.push_back((double)c.y[i]);
+      rows.push_back((double)c.a[i]);
+    }
+  ofstream f(fn, ios::binary);
+  f.write("SANTA25", 8);
+  f.write((const char *)off, sizeof(off));
+  f.write((const char *)rows.data(), rows.size() * sizeof(double));
+}
+
+// Binary store or CSV, by the file name (as submission_store.is_store)
+inline bool isStore(const string &fn) {
+  return fn.size() > 4 && fn.compare(fn.size() - 4, 4, ".bin") == 0;
+}
+
+// Reads a submission from a file, or from stdin if fn is "-". With onlyN > 0
+// rows of every other group are skipped before any number is parsed.
+// Files ending in .bin are read as a binary store.
+map<int, Cfg> loadCSV(const string &fn, int onlyN = 0) {
+  if (isStore(fn))
+    return loadStore(fn, onlyN);
+  map<int, Cfg> cfg;
+  ifstream file;
+  if (fn != "-") {
+    file.open(fn);
+    if (!file)
+      return cfg;
+  }
+  istream &f = (fn == "-") ? cin : file;
   string ln;
   getline(f, ln);
+  char prefix[8];
+  snprintf(prefix, sizeof(prefix), "%03d_", onlyN);
   map<int, vector<tuple<int, long double, long double, long double>>> data;
   while (getline(f, ln)) {
+    if (onlyN > 0 && ln.compare(0, 4, prefix) != 0)
+      continue;
     size_t p1 = ln.find(','), p2 = ln.find(',', p1 + 1),
            p3 = ln.find(',', p2 + 1);
+    if (p1 == string::npos || p2 == string::npos || p3 == string::npos)
+      continue;
     string id = ln.substr(0, p1), xs = ln.substr(p1 + 1, p2 - p1 - 1),
            ys = ln.substr(p2 + 1, p3 - p2 - 1), ds = ln.substr(p3 + 1);
     if (!xs.empty() && xs[0] == 's')
@@ -812,8 +1844,16 @@ map<int, Cfg> loadCSV(const string &fn) {
   return cfg;
 }
 
-void saveCSV(const string &fn, const map<int, Cfg> &cfg) {
-  ofstream f(fn);
+// Writes every group in cfg to a file, or to stdout if fn is "-". store
+// writes a binary store instead (the default for .bin names).
+void saveCSV(const string &fn, const map<int, Cfg> &cfg,
+             bool store = false) {
+  if (store || isStore(fn))
+    return saveStore(fn, cfg);
+  ofstream file;
+  if (fn != "-")
+    file.open(fn);
+  ostream &f = (fn == "-") ? cout : file;
   f << fixed << setprecision(17) << "id,x,y,deg\n";
   for (int n = 1; n <= 200; n++) {
     if (cfg.count(n)) {
@@ -823,24 +1863,499 @@ void saveCSV(const string &fn, const map<int, Cfg> &cfg) {
           << c.y[i] << ",s" << c.a[i] << "\n";
     }
   }
+  f.flush();
 }
 
-int main(int argc, char **argv) {
-  string in = "submission.csv", out = "submission_optimized.csv";
-  int iters = 15000, restarts = 16;
+// Daemon mode (--daemon): the whole input is loaded once and the process
+// takes one command per line on stdin, answering each with one JSON line on
+// stdout (the log goes to stderr):
+//   optimize N SECONDS   PT on group N for SECONDS; each group's replicas,
+//                        ladder and bests stay resident between commands
+//   flush                write improved groups to the output file now
+//   status               groups loaded, total score, unflushed groups
+//   reload N [N ...]     take groups N from the output file again (after
+//                        another tool rewrote them), dropping their replicas
+//   quit                 flush and exit (so does end of input)
+// Improved groups are merged into the output file, re-read at flush time
+// so groups changed on disk by other tools are kept unless ours is better,
+// at most every flushEvery seconds and on exit.
+// Quotes and backslashes would break the JSON reply an echoed command goes in
+string jsonSafe(string s) {
+  for (char &ch : s)
+    if (ch == '"' || ch == '\\' || (unsigned char)ch < 0x20)
+      ch = '\'';
+  return s;
+}
 
-  // Get group number from environment variable
-  const char *groupEnv = getenv("GROUP_NUMBER");
-  if (!groupEnv) {
-    printf("Error: GROUP_NUMBER environment variable not set\n");
-    printf("Usage: export GROUP_NUMBER=<n> && ./single_group_optimizer\n");
+int runDaemon(const string &in, const string &out, PTOptions pt, int iters,
+              int restarts, double flushEvery) {
+  FILE *logf = stderr;
+  pt.log = logf;
+  pt.checkpoint.clear();
+  auto cfg = loadCSV(in);
+  if (cfg.empty()) {
+    printf("{\"event\":\"error\",\"message\":\"no data in %s\"}\n",
+           jsonSafe(in).c_str());
     return 1;
   }
-  int targetN = stoi(groupEnv);
-  if (targetN < 1 || targetN > 200) {
-    printf("Error: GROUP_NUMBER must be between 1 and 200, got %d\n", targetN);
+  fprintf(logf, "Daemon: %d groups from %s, %d threads, %d replicas\n",
+          (int)cfg.size(), in.c_str(), omp_get_max_threads(), pt.replicas);
+  printf("{\"event\":\"ready\",\"groups\":%d,\"threads\":%d,\"replicas\":%d}\n",
+         (int)cfg.size(), omp_get_max_threads(), pt.replicas);
+  fflush(stdout);
+
+  map<int, PTState> resident;
+  vector<int> dirty;
+  auto lastFlush = chrono::steady_clock::now();
+
+  auto flush = [&]() {
+    vector<int> written;
+    if (!dirty.empty()) {
+      auto disk = loadCSV(out);
+      // A new or partial output starts from the groups held here, so the
+      // file never ends up with only the dirty groups in it
+      bool seeded = false;
+      for (auto &[n, c] : cfg)
+        if (!disk.count(n)) {
+          disk[n] = c;
+          seeded = true;
+          if (find(dirty.begin(), dirty.end(), n) != dirty.end())
+            written.push_back(n);
+        }
+      for (int n : dirty) {
+        auto &d = disk[n];
+        if (d.n != n || exactOvl(d) || cfg[n].side() < d.side() - 1e-14L) {
+          d = cfg[n];
+          written.push_back(n);
+        }
+      }
+      if (seeded || !written.empty()) {
+        string tmp = out + ".tmp";
+        saveCSV(tmp, disk, isStore(out));
+        rename(tmp.c_str(), out.c_str());
+      }
+      dirty.clear();
+    }
+    lastFlush = chrono::steady_clock::now();
+    return written;
+  };
+  auto printGroups = [](const vector<int> &v) {
+    for (size_t k = 0; k < v.size(); k++)
+      printf("%s%d", k ? "," : "", v[k]);
+  };
+
+  string line;
+  while (getline(cin, line)) {
+    istringstream cmd(line);
+    string op;
+    if (!(cmd >> op))
+      continue;
+    if (op == "optimize") {
+      int n = 0;
+      double seconds = 0;
+      cmd >> n >> seconds;
+      if (!cfg.count(n) || seconds <= 0) {
+        printf("{\"event\":\"error\",\"message\":\"bad command: %s\"}\n",
+               jsonSafe(line).c_str());
+        fflush(stdout);
+        continue;
+      }
+      auto t0 = chrono::steady_clock::now();
+      Cfg c = cfg[n];
+      int it, r;
+      scaleForGroup(n, iters, restarts, it, r);
+      PTOptions opt = pt;
+      opt.timeBudget = seconds;
+      PTReport report;
+      auto st = resident.try_emplace(n, max(1, pt.replicas)).first;
+      Cfg o = optimizeParallel(c, it, r, opt, &report, &st->second);
+      bool c_ovl, o_ovl;
+      o = keepBetter(c, o, c_ovl, o_ovl);
+      if (o.side() < c.side() - 1e-14L || (c_ovl && !o_ovl)) {
+        cfg[n] = o;
+        if (find(dirty.begin(), dirty.end(), n) == dirty.end())
+          dirty.push_back(n);
+      }
+      long double el =
+          chrono::duration<long double>(chrono::steady_clock::now() - t0)
+              .count();
+      fprintf(logf, "n=%3d: %.12Lf -> %.12Lf (%.1Lfs)\n", n, c.score(),
+              o.score(), el);
+      printResult(stdout, c, o, c_ovl, o_ovl, el, omp_get_max_threads(),
+                  pt.replicas, report);
+      if (!dirty.empty() &&
+          chrono::duration<double>(chrono::steady_clock::now() - lastFlush)
+                  .count() >= flushEvery)
+        flush();
+    } else if (op == "flush") {
+      printf("{\"event\":\"flushed\",\"groups\":[");
+      printGroups(flush());
+      printf("]}\n");
+      fflush(stdout);
+    } else if (op == "status") {
+      long double total = 0;
+      for (auto &[n, c] : cfg)
+        total += c.score();
+      printf("{\"event\":\"status\",\"groups\":%d,\"score\":%.12Lf,"
+             "\"resident\":%d,\"unflushed\":[",
+             (int)cfg.size(), total, (int)resident.size());
+      printGroups(dirty);
+      printf("]}\n");
+      fflush(stdout);
+    } else if (op == "reload") {
+      auto disk = loadCSV(out);
+      vector<int> loaded;
+      int n;
+      while (cmd >> n) {
+        auto d = disk.find(n);
+        if (!cfg.count(n) || d == disk.end() || d->second.n != n ||
+            exactOvl(d->second))
+          continue;
+        cfg[n] = d->second;
+        resident.erase(n);
+        dirty.erase(remove(dirty.begin(), dirty.end(), n), dirty.end());
+        loaded.push_back(n);
+      }
+      printf("{\"event\":\"reloaded\",\"groups\":[");
+      printGroups(loaded);
+      printf("]}\n");
+      fflush(stdout);
+    } else if (op == "quit") {
+      break;
+    } else {
+      printf("{\"event\":\"error\",\"message\":\"unknown command: %s\"}\n",
+             jsonSafe(op).c_str());
+      fflush(stdout);
+    }
+  }
+
+  printf("{\"event\":\"bye\",\"groups\":[");
+  printGroups(flush());
+  printf("]}\n");
+  fflush(stdout);
+  return 0;
+}
+
+// Cascade mode (--cascade P): every group is re-derived from its
+// neighbours. A candidate for N is group N+1 with one boundary tree removed,
+// or group N-1 with one tree put into its largest gap. Candidates are
+// squeezed and compacted, the best one also gets a local search, and it
+// replaces N if it passes the exact check with a smaller side. Groups run
+// in parallel; each pass derives from the groups left by the previous one,
+// so an improvement can travel up to P groups.
+
+// c without tree k, into o
+void dropTree(const Cfg &c, int k, Cfg &o) {
+  o.n = c.n - 1;
+  for (int i = 0, m = 0; i < c.n; i++)
+    if (i != k) {
+      o.x[m] = c.x[i];
+      o.y[m] = c.y[i];
+      o.a[m] = c.a[i];
+      m++;
+    }
+  o.updAll();
+}
+
+// c plus one tree in its largest gap. Spots on a grid over the box (and a
+// tree's reach around it) are tried at 8 angles, ordered by the side the
+// group would get and then by distance to the nearest tree centre, so a
+// free spot inside the box always wins. False if nothing fits.
+bool insertTree(const Cfg &c, Cfg &o) {
+  constexpr int GRID = 48;
+  constexpr long double REACH = 0.8L;
+  long double x0 = c.gx0 - REACH, y0 = c.gy0 - REACH;
+  long double w = c.gx1 - c.gx0 + 2 * REACH, h = c.gy1 - c.gy0 + 2 * REACH;
+
+  struct Spot {
+    long double side, gap, x, y, a;
+  };
+  vector<Spot> spots;
+  for (int gi = 0; gi <= GRID; gi++)
+    for (int gj = 0; gj <= GRID; gj++) {
+      long double x = x0 + w * gi / GRID, y = y0 + h * gj / GRID, gap = 1e18L;
+      for (int i = 0; i < c.n; i++)
+        gap = min(gap, (c.x[i] - x) * (c.x[i] - x) + (c.y[i] - y) * (c.y[i] - y));
+      for (int k = 0; k < 8; k++) {
+        Poly p;
+        getPoly(x, y, 45.0L * k, p);
+        long double side = max(max(c.gx1, (long double)p.x1) - min(c.gx0, (long double)p.x0),
+                               max(c.gy1, (long double)p.y1) - min(c.gy0, (long double)p.y0));
+        spots.push_back({side, gap, x, y, 45.0L * k});
+      }
+    }
+  sort(spots.begin(), spots.end(), [](const Spot &p, const Spot &q) {
+    return p.side != q.side ? p.side < q.side : p.gap > q.gap;
+  });
+
+  o = c;
+  o.n = c.n + 1;
+  o.x[c.n] = spots[0].x;
+  o.y[c.n] = spots[0].y;
+  o.a[c.n] = spots[0].a;
+  o.updAll();
+  for (const Spot &s : spots) {
+    o.x[c.n] = s.x;
+    o.y[c.n] = s.y;
+    o.a[c.n] = s.a;
+    o.upd(c.n);
+    if (!o.hasOvl(c.n))
+      return true;
+  }
+  return false;
+}
+
+// Candidates and results are kept as poses. A Cfg is ~200 KB, so the ones
+// worked on live on the heap, not on the (small) OpenMP thread stacks.
+struct Derived {
+  Pose pose;
+  long double side = 1e18L;
+  int source = 0; // group it came from, 0 if none
+};
+
+// Best compacted candidate for group n from the groups in cfg
+Derived deriveGroup(const map<int, Cfg> &cfg, int n) {
+  Derived best;
+  auto work = make_unique<Cfg>();
+  Cfg &cand = *work;
+  auto consider = [&](int source) {
+    squeeze(cand);
+    compaction(cand, 15);
+    if (cand.side() < best.side && !cand.anyOvl()) {
+      best.side = cand.side();
+      cand.save(best.pose);
+      best.source = source;
+    }
+  };
+
+  auto up = cfg.find(n + 1);
+  if (up != cfg.end()) {
+    auto big = make_unique<Cfg>(up->second);
+    int nb = big->boundarySize();
+    for (int k = 0; k < nb; k++) {
+      dropTree(*big, big->boundaryTree(k), cand);
+      consider(n + 1);
+    }
+  }
+  auto down = cfg.find(n - 1);
+  if (down != cfg.end() && insertTree(down->second, cand))
+    consider(n - 1);
+  if (best.source) {
+    cand.load(best.pose);
+    localSearch(cand, 20);
+    best.side = cand.side();
+    cand.save(best.pose);
+  }
+  return best;
+}
+
+int runCascade(const string &in, const string &out, int passes, bool json) {
+  FILE *logf = (out == "-") ? stderr : stdout;
+  auto t0 = chrono::high_resolution_clock::now();
+  auto cfg = loadCSV(in);
+  if (cfg.empty()) {
+    fprintf(logf, "No data!\n");
     return 1;
   }
+  fprintf(logf, "Cascade over %d groups, %d passes, %d threads\n",
+          (int)cfg.size(), passes, omp_get_max_threads());
+
+  int replaced = 0;
+  for (int pass = 0; pass < passes; pass++) {
+    vector<int> groups;
+    for (auto &[n, c] : cfg)
+      groups.push_back(n);
+    // Large groups first: they take longest
+    reverse(groups.begin(), groups.end());
+    vector<Derived> found(groups.size());
+
+#pragma omp parallel for schedule(dynamic)
+    for (int g = 0; g < (int)groups.size(); g++)
+      found[g] = deriveGroup(cfg, groups[g]);
+
+    int changed = 0;
+    auto work = make_unique<Cfg>();
+    Cfg &cand = *work;
+    for (int g = 0; g < (int)groups.size(); g++) {
+      int n = groups[g];
+      const Derived &d = found[g];
+      Cfg &cur = cfg[n];
+      if (!d.source)
+        continue;
+      cand.load(d.pose);
+      if (exactOvl(cand))
+        continue;
+      if (!(cand.side() < cur.side() - 1e-12L) && !exactOvl(cur))
+        continue;
+      fprintf(logf, "n=%3d: side %.12Lf -> %.12Lf (from n=%d)\n", n,
+              cur.side(), cand.side(), d.source);
+      if (json)
+        fprintf(logf,
+                "{\"event\":\"cascade\",\"n\":%d,\"pass\":%d,\"source\":%d,"
+                "\"initial_side\":%.12Lf,\"final_side\":%.12Lf}\n",
+                n, pass, d.source, cur.side(), cand.side());
+      cur = cand;
+      changed++;
+    }
+    replaced += changed;
+    fprintf(logf, "Pass %d: %d groups replaced\n", pass, changed);
+    if (!changed)
+      break;
+  }
+
+  long double el = chrono::duration<long double>(
+                       chrono::high_resolution_clock::now() - t0).count();
+  if (json) {
+    fprintf(logf, "{\"event\":\"cascade_done\",\"replaced\":%d,\"wall_time\":%.3Lf}\n",
+            replaced, el);
+    fflush(logf);
+  }
+  saveCSV(out, cfg);
+  fprintf(logf, "Saved all groups to %s (%.1Lfs)\n",
+          out == "-" ? "stdout" : out.c_str(), el);
+  return 0;
+}
+
+#ifdef SGO_LIBRARY
+// C API for sgo_engine.py (ctypes), built with
+//   g++ -O3 -march=native -std=c++17 -fopenmp -DSGO_LIBRARY -shared -fPIC
+//       -o libsgo.so single_group_optimizer.cpp
+// A group is passed as three double arrays x, y, deg of length n <= MAX_N.
+// Nothing here touches global state, so calls from several threads at once
+// are fine (ctypes releases the GIL for the duration of each call).
+static Cfg makeCfg(int n, const double *x, const double *y, const double *deg) {
+  Cfg c;
+  c.n = n;
+  for (int i = 0; i < n; i++) {
+    c.x[i] = x[i];
+    c.y[i] = y[i];
+    c.a[i] = deg[i];
+  }
+  c.updAll();
+  return c;
+}
+
+extern "C" {
+
+int sgo_max_n() { return MAX_N; }
+
+// Vertices of n trees into out, n * NV * 2 doubles (x, y per vertex)
+void sgo_polygons(int n, const double *x, const double *y, const double *deg,
+                  double *out) {
+  Poly q;
+  for (int i = 0; i < n; i++) {
+    getPoly(x[i], y[i], deg[i], q);
+    for (int k = 0; k < NV; k++) {
+      out[(i * NV + k) * 2] = q.px[k];
+      out[(i * NV + k) * 2 + 1] = q.py[k];
+    }
+  }
+}
+
+// Fast-kernel overlap test of two trees (the one the optimizer uses)
+int sgo_overlap(double x0, double y0, double d0, double x1, double y1,
+                double d1) {
+  Poly p, q;
+  getPoly(x0, y0, d0, p);
+  getPoly(x1, y1, d1, q);
+  return overlap(p, q);
+}
+
+// Overlapping pairs (i < j) of a group, fast or exact long double kernel.
+// Up to maxPairs pairs go to out as i, j; returns how many there are.
+int sgo_overlapping_pairs(int n, const double *x, const double *y,
+                          const double *deg, int exact, int *out,
+                          int maxPairs) {
+  if (n < 1 || n > MAX_N)
+    return -1;
+  vector<Poly> p(n);
+  vector<PolyL> q(exact ? n : 0);
+  for (int i = 0; i < n; i++)
+    if (exact)
+      getPolyL(x[i], y[i], deg[i], q[i]);
+    else
+      getPoly(x[i], y[i], deg[i], p[i]);
+  int found = 0;
+  for (int i = 0; i < n; i++)
+    for (int j = i + 1; j < n; j++)
+      if (exact ? overlapL(q[i], q[j]) : overlap(p[i], p[j])) {
+        if (found < maxPairs) {
+          out[2 * found] = i;
+          out[2 * found + 1] = j;
+        }
+        found++;
+      }
+  return found;
+}
+
+// Bounding-square side of a group; negative if n is out of range
+double sgo_side(int n, const double *x, const double *y, const double *deg) {
+  if (n < 1 || n > MAX_N)
+    return -1;
+  return makeCfg(n, x, y, deg).side();
+}
+
+double sgo_score(int n, const double *x, const double *y, const double *deg) {
+  if (n < 1 || n > MAX_N)
+    return -1;
+  return makeCfg(n, x, y, deg).score();
+}
+
+// optimizeParallel on one group, with the binary's per-group scaling of
+// iters / restarts. x, y, deg are replaced by the result only if it passes
+// the exact check (after rounding to double) and is better. Returns 1 if
+// they were replaced, 0 if not, -1 for a bad n.
+int sgo_optimize(int n, double *x, double *y, double *deg, int iters,
+                 int restarts, int replicas, double timeBudget, uint64_t seed,
+                 int threads) {
+  if (n < 1 || n > MAX_N)
+    return -1;
+  // threads only applies to this call; the caller's setting is put back
+  int callerThreads = omp_get_max_threads();
+  if (threads > 0)
+    omp_set_num_threads(threads);
+  PTOptions opt;
+  opt.replicas = replicas > 0 ? replicas : omp_get_max_threads();
+  opt.timeBudget = timeBudget;
+  opt.seed = seed;
+  opt.log = nullptr;
+  int it, r;
+  scaleForGroup(n, iters, restarts, it, r);
+
+  Cfg c = makeCfg(n, x, y, deg);
+  bool c_ovl, o_ovl;
+  Cfg o = keepBetter(c, optimizeParallel(c, it, r, opt), c_ovl, o_ovl);
+  omp_set_num_threads(callerThreads);
+  if (!(o.side() < c.side() - 1e-14L || (c_ovl && !o_ovl)))
+    return 0;
+
+  double ox[MAX_N], oy[MAX_N], od[MAX_N];
+  for (int i = 0; i < n; i++) {
+    ox[i] = (double)o.x[i];
+    oy[i] = (double)o.y[i];
+    od[i] = (double)o.a[i];
+  }
+  if (exactOvl(makeCfg(n, ox, oy, od)) && !c_ovl)
+    return 0;
+  copy(ox, ox + n, x);
+  copy(oy, oy + n, y);
+  copy(od, od + n, deg);
+  return 1;
+}
+
+} // extern "C"
+#else
+int main(int argc, char **argv) {
+  string in = "submission.csv", out = "submission_optimized.csv";
+  int iters = 15000, restarts = 16;
+  int targetN = 0;
+  bool groupOnly = false, bench = false;
+  int crossPairs = 0;
+  bool daemon = false;
+  double flushEvery = 60;
+  int cascade = 0;
+  PTOptions pt;
+  pt.replicas = 0;
 
   for (int i = 1; i < argc; i++) {
     string a = argv[i];
@@ -852,67 +2367,157 @@ int main(int argc, char **argv) {
       iters = stoi(argv[++i]);
     else if (a == "-r" && i + 1 < argc)
       restarts = stoi(argv[++i]);
+    else if (a == "-g" && i + 1 < argc)
+      targetN = stoi(argv[++i]);
+    else if (a == "--group-only")
+      groupOnly = true;
+    else if (a == "--bench")
+      bench = true;
+    else if (a == "--narrow" && i + 1 < argc)
+      satNarrow = string(argv[++i]) != "poly";
+    else if (a == "--crosscheck" && i + 1 < argc)
+      crossPairs = stoi(argv[++i]);
+    else if (a == "--replicas" && i + 1 < argc)
+      pt.replicas = stoi(argv[++i]);
+    else if (a == "--time-budget" && i + 1 < argc)
+      pt.timeBudget = stod(argv[++i]);
+    else if (a == "--checkpoint" && i + 1 < argc)
+      pt.checkpoint = argv[++i];
+    else if (a == "--json")
+      pt.json = true;
+    else if (a == "--seed" && i + 1 < argc)
+      pt.seed = stoull(argv[++i]);
+    else if (a == "--daemon")
+      daemon = true;
+    else if (a == "--flush-every" && i + 1 < argc)
+      flushEvery = stod(argv[++i]);
+    else if (a == "--cascade" && i + 1 < argc)
+      cascade = stoi(argv[++i]);
   }
 
-  int numThreads = omp_get_max_threads();
-  printf("Single Group Optimizer (%d threads)\n", numThreads);
-  printf("Target group: n=%d\n", targetN);
-  printf("Iterations: %d, Restarts: %d\n", iters, restarts);
-  printf("Loading %s...\n", in.c_str());
+  if (daemon) {
+    if (pt.replicas < 1)
+      pt.replicas = omp_get_max_threads();
+    return runDaemon(in, out, pt, iters, restarts, flushEvery);
+  }
+  if (cascade > 0)
+    return runCascade(in, out, cascade, pt.json);
 
-  auto cfg = loadCSV(in);
+  // Get group number from -g or the environment variable
+  const char *groupEnv = getenv("GROUP_NUMBER");
+  if (!targetN && !groupEnv) {
+    printf("Error: GROUP_NUMBER environment variable not set\n");
+    printf("Usage: export GROUP_NUMBER=<n> && ./single_group_optimizer\n");
+    printf("   or: ./single_group_optimizer -g <n> [--group-only] "
+           "[-i in|-] [-o out|-]\n");
+    return 1;
+  }
+  if (!targetN)
+    targetN = stoi(groupEnv);
+  if (targetN < 1 || targetN > 200) {
+    printf("Error: GROUP_NUMBER must be between 1 and 200, got %d\n", targetN);
+    return 1;
+  }
+
+  // When the rows go to stdout, the log goes to stderr
+  FILE *logf = (out == "-") ? stderr : stdout;
+
+  int numThreads = omp_get_max_threads();
+  if (pt.replicas < 1)
+    pt.replicas = numThreads;
+  pt.log = logf;
+  fprintf(logf, "Single Group Optimizer (%d threads, %d replicas)\n",
+          numThreads, pt.replicas);
+  fprintf(logf, "Target group: n=%d\n", targetN);
+  fprintf(logf, "Iterations: %d, Restarts: %d, Seed: %llu\n", iters, restarts,
+          (unsigned long long)pt.seed);
+  fprintf(logf, "Loading %s...\n", in == "-" ? "stdin" : in.c_str());
+
+  auto cfg = loadCSV(in, groupOnly ? targetN : 0);
   if (cfg.empty()) {
-    printf("No data!\n");
+    fprintf(logf, "No data!\n");
     return 1;
   }
-  printf("Loaded %d configs\n", (int)cfg.size());
+  fprintf(logf, "Loaded %d configs\n", (int)cfg.size());
 
   if (!cfg.count(targetN)) {
-    printf("Error: Group n=%d not found in input file\n", targetN);
+    fprintf(logf, "Error: Group n=%d not found in input file\n", targetN);
     return 1;
   }
 
   Cfg c = cfg[targetN];
   long double os = c.score();
-  printf("Initial score for n=%d: %.12Lf\n", targetN, os);
-  printf("Initial side: %.12Lf\n", c.side());
+  fprintf(logf, "Initial score for n=%d: %.12Lf\n", targetN, os);
+  fprintf(logf, "Initial side: %.12Lf\n", c.side());
   if (c.anyOvl())
-    printf("WARNING: Initial config has overlaps!\n");
+    fprintf(logf, "WARNING: Initial config has overlaps!\n");
 
-  auto t0 = chrono::high_resolution_clock::now();
-
-  int it = iters, r = restarts;
-  if (targetN <= 10) {
-    it = (int)(iters * 2.5);
-    r = restarts * 2;
-  } else if (targetN <= 30) {
-    it = (int)(iters * 1.8);
-    r = (int)(restarts * 1.5);
-  } else if (targetN <= 60) {
-    it = (int)(iters * 1.3);
-    r = restarts;
-  } else if (targetN > 150) {
-    it = (int)(iters * 0.7);
-    r = (int)(restarts * 0.8);
+  if (crossPairs > 0) {
+    crossCheck(c, crossPairs, logf);
+    return 0;
   }
 
-  printf("Optimizing with iters=%d, restarts=%d...\n", it, max(4, r));
-  Cfg o = optimizeParallel(c, it, max(4, r));
+  if (bench) {
+    // Fixed-temperature SA on one thread, no output file: raw moves/second
+    auto b0 = chrono::high_resolution_clock::now();
+    Cfg b = c;
+    sa_opt(b, iters, 0.01L, 0.01L, streamSeed(pt.seed, c.n, STREAM_BENCH));
+    auto b1 = chrono::high_resolution_clock::now();
+    double sec = chrono::duration<double>(b1 - b0).count();
+    double saRate = iters / sec;
+    fprintf(logf, "bench n=%d grid=%d narrow=%s moves=%d time=%.3fs moves/s=%.0f side=%.12Lf\n",
+            targetN, SGO_GRID, satNarrow ? "sat" : "poly", iters, sec, saRate, b.side());
+
+    // Neighbour queries alone: hasOvl on every tree of the loaded group
+    int hits = 0, calls = 0;
+    b0 = chrono::high_resolution_clock::now();
+    for (int k = 0; k < iters; k += c.n)
+      for (int i = 0; i < c.n; i++, calls++)
+        hits += c.hasOvl(i);
+    b1 = chrono::high_resolution_clock::now();
+    sec = chrono::duration<double>(b1 - b0).count();
+    double hasOvlRate = calls / sec;
+    fprintf(logf, "bench n=%d grid=%d hasOvl=%d time=%.3fs calls/s=%.0f hits=%d\n",
+            targetN, SGO_GRID, calls, sec, hasOvlRate, hits);
+
+    KernelBench kb = benchKernels(c, iters);
+    fprintf(logf,
+            "bench getPoly/s=%.0f overlap pairs/s near=%.0f (%d) far=%.0f (%d) "
+            "touching=%.0f (%d)\n",
+            kb.getPolyRate, kb.nearRate, kb.nearPairs, kb.farRate,
+            kb.farPairs, kb.touchRate, kb.touchPairs);
+    if (pt.json)
+      fprintf(logf,
+              "{\"event\":\"bench\",\"n\":%d,\"grid\":%d,\"narrow\":\"%s\","
+              "\"moves\":%d,\"sa_moves_per_s\":%.0f,\"has_ovl_per_s\":%.0f,"
+              "\"get_poly_per_s\":%.0f,\"overlap_near_per_s\":%.0f,"
+              "\"overlap_far_per_s\":%.0f,\"overlap_touching_per_s\":%.0f}\n",
+              targetN, SGO_GRID, satNarrow ? "sat" : "poly", iters, saRate,
+              hasOvlRate, kb.getPolyRate, kb.nearRate, kb.farRate,
+              kb.touchRate);
+    return 0;
+  }
 
-  bool o_ovl = o.anyOvl();
-  bool c_ovl = c.anyOvl();
+  auto t0 = chrono::high_resolution_clock::now();
 
-  if (!c_ovl && o_ovl) {
-    o = c;
-  } else if (c_ovl && !o_ovl) {
-    // Keep o
-  } else if (!c_ovl && !o_ovl && o.side() > c.side() + 1e-14L) {
-    o = c;
-  } else if (c_ovl && o_ovl) {
-    if (o.side() > c.side() + 1e-14L) {
-      o = c;
-    }
+  int it, r;
+  scaleForGroup(targetN, iters, restarts, it, r);
+
+  fprintf(logf, "Optimizing with iters=%d, restarts=%d...\n", it, r);
+  if (pt.json) {
+    fprintf(logf,
+            "{\"event\":\"start\",\"n\":%d,\"threads\":%d,\"replicas\":%d,"
+            "\"iters\":%d,\"cycles\":%d,\"time_budget\":%.3f,\"seed\":%llu,"
+            "\"initial_side\":%.12Lf,\"initial_score\":%.12Lf}\n",
+            targetN, numThreads, pt.replicas, it, r, pt.timeBudget,
+            (unsigned long long)pt.seed, c.side(), os);
+    fflush(logf);
   }
+  PTReport report;
+  Cfg o = optimizeParallel(c, it, r, pt, &report);
+
+  bool c_ovl, o_ovl;
+  o = keepBetter(c, o, c_ovl, o_ovl);
 
   // Update the target group in cfg
   cfg[targetN] = o;
@@ -922,21 +2527,33 @@ int main(int argc, char **argv) {
   long double el =
       chrono::duration_cast<chrono::milliseconds>(t1 - t0).count() / 1000.0L;
 
-  printf("\n========================================\n");
-  printf("n=%3d: %.12Lf -> %.12Lf\n", targetN, os, ns);
+  fprintf(logf, "\n========================================\n");
+  fprintf(logf, "n=%3d: %.12Lf -> %.12Lf\n", targetN, os, ns);
   if (c_ovl && !o_ovl) {
-    printf("FIXED OVERLAP! Improvement: %.4Lf%%\n", (os - ns) / os * 100.0L);
+    fprintf(logf, "FIXED OVERLAP! Improvement: %.4Lf%%\n",
+            (os - ns) / os * 100.0L);
   } else if (o_ovl) {
-    printf("WARNING - still has overlap!\n");
+    fprintf(logf, "WARNING - still has overlap!\n");
   } else if (ns < os - 1e-10L) {
-    printf("Improvement: %.4Lf%%\n", (os - ns) / os * 100.0L);
+    fprintf(logf, "Improvement: %.4Lf%%\n", (os - ns) / os * 100.0L);
   } else {
-    printf("No improvement\n");
+    fprintf(logf, "No improvement\n");
   }
-  printf("Time: %.1Lfs (with %d threads)\n", el, numThreads);
-  printf("========================================\n");
+  fprintf(logf, "Time: %.1Lfs (with %d threads)\n", el, numThreads);
+  fprintf(logf, "========================================\n");
 
-  saveCSV(out, cfg);
-  printf("Saved all groups to %s\n", out.c_str());
+  if (pt.json)
+    printResult(logf, c, o, c_ovl, o_ovl, el, numThreads, pt.replicas, report);
+
+  if (groupOnly) {
+    // Only the target group is written; merging is up to the caller
+    saveCSV(out, {{targetN, o}});
+    fprintf(logf, "Saved group %d to %s\n", targetN,
+            out == "-" ? "stdout" : out.c_str());
+  } else {
+    saveCSV(out, cfg);
+    fprintf(logf, "Saved all groups to %s\n", out.c_str());
+  }
   return 0;
-}
\ No newline at end of file
+}
+#endif
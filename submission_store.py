@@ -0,0 +1,89 @@
+import os
+import sys
+import numpy as np
+
+# Compact binary submission store. Layout (little-endian):
+#   8 bytes    magic b'SANTA25\0'
+#   201 int64  offsets; group N occupies rows offsets[N-1]:offsets[N]
+#   rows       float64 (x, y, deg) per tree, groups in N order
+# Only the final export needs the 's'-prefixed Kaggle CSV; everything else
+# can memory-map the store and take zero-copy NumPy views per group.
+# Coordinates are float64, so CSV digits beyond ~17 significant figures
+# are not preserved.
+
+MAGIC = b'SANTA25\0'
+MAX_N = 200
+STORE_SUFFIX = '.bin'
+HEADER_BYTES = len(MAGIC) + (MAX_N + 1) * 8
+
+class SubmissionStore:
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def group(self, n):
+        """(n_rows, 3) view of group N's (x, y, deg) rows."""
+        return self.data[self.offsets[n - 1]:self.offsets[n]]
+
+    def groups(self):
+        return [n for n in range(1, MAX_N + 1) if self.offsets[n] > self.offsets[n - 1]]
+
+    def arrays(self):
+        """(ns, xs, ys, degs) like score_calculator.load_submission."""
+        ns = np.repeat(np.arange(1, MAX_N + 1), np.diff(self.offsets))
+        return ns, self.data[:, 0], self.data[:, 1], self.data[:, 2]
+
+def is_store(filename):
+    return filename.endswith(STORE_SUFFIX)
+
+def load_store(filename):
+    """Memory-map a store read-only."""
+    with open(filename, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{filename} is not a submission store")
+    offsets = np.memmap(filename, dtype='<i8', mode='r', offset=len(MAGIC), shape=(MAX_N + 1,))
+    rows = int(offsets[MAX_N])
+    data = np.memmap(filename, dtype='<f8', mode='r', offset=HEADER_BYTES, shape=(rows, 3))
+    return SubmissionStore(offsets, data)
+
+def write_store(filename, ns, xs, ys, degs):
+    """Write flat per-row arrays as a store (rows are sorted by N)."""
+    ns = np.asarray(ns)
+    if len(ns) and (ns.min() < 1 or ns.max() > MAX_N):
+        raise ValueError(f"group ids must be in 1..{MAX_N}")
+    order = np.argsort(ns, kind='stable')
+    counts = np.bincount(ns, minlength=MAX_N + 1)[1:]
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype('<i8')
+    data = np.column_stack([np.asarray(xs)[order], np.asarray(ys)[order], np.asarray(degs)[order]]).astype('<f8')
+
+    tmp = filename + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(offsets.tobytes())
+        f.write(data.tobytes())
+    os.replace(tmp, filename)
+
+def csv_to_store(csv_file, store_file):
+    # score_calculator imports this module, so pull it in lazily
+    from score_calculator import load_submission
+    write_store(store_file, *load_submission(csv_file))
+
+def store_to_csv(store_file, csv_file):
+    """Export a store as the 's'-prefixed Kaggle CSV."""
+    store = load_store(store_file)
+    with open(csv_file, 'w') as f:
+        f.write('id,x,y,deg\n')
+        for n in store.groups():
+            for i, (x, y, deg) in enumerate(store.group(n).tolist()):
+                f.write(f"{n:03d}_{i},s{x!r},s{y!r},s{deg!r}\n")
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage: python submission_store.py <in.csv|in.bin> <out.bin|out.csv>")
+        sys.exit(1)
+    src, dst = sys.argv[1], sys.argv[2]
+    if is_store(src):
+        store_to_csv(src, dst)
+    else:
+        csv_to_store(src, dst)
+    print(f"Converted {src} -> {dst}")
@@ -0,0 +1,39 @@
+import json
+import os
+import subprocess
+from score_calculator import group_sides, parse_rows, read_group_rows, write_group_rows
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def run_group(binary, src, dst, checkpoint):
+    """Run group 3 of src with a checkpoint; (resumed, start event)."""
+    result = subprocess.run([binary, "-g", "3", "--group-only", "-i", src, "-o", dst,
+                             "-n", "2000", "-r", "2", "--checkpoint", checkpoint, "--json"],
+                            check=True, capture_output=True, text=True,
+                            env=dict(os.environ, OMP_NUM_THREADS="1"))
+    # The log goes to stdout when -o is a file
+    start = next(json.loads(l) for l in result.stdout.splitlines() if l.startswith('{"event":"start"'))
+    return "Resumed" in result.stdout, start
+
+def test_checkpoint_follows_the_input_group(tmp_path, optimizer_binary):
+    groups = read_group_rows(os.path.join(HERE, "submission.csv"))
+    src, out = str(tmp_path / "in.csv"), str(tmp_path / "out.csv")
+    checkpoint = str(tmp_path / "g003.ckpt")
+    write_group_rows(src, {3: groups[3]})
+
+    assert run_group(optimizer_binary, src, out, checkpoint)[0] is False
+    # Same group again, and the group the run returned: both continue
+    assert run_group(optimizer_binary, src, out, checkpoint)[0] is True
+    assert run_group(optimizer_binary, out, out, checkpoint)[0] is True
+
+    # A group changed elsewhere (here: spread by 20%) starts from itself
+    loose = []
+    for line in groups[3]:
+        i, x, y, d = line.split(',')
+        loose.append(f"{i},s{float(x[1:]) * 1.2!r},s{float(y[1:]) * 1.2!r},{d}")
+    write_group_rows(src, {3: loose})
+    resumed, start = run_group(optimizer_binary, src, out, checkpoint)
+    assert resumed is False
+    assert abs(start['initial_side'] - group_sides(*parse_rows(loose))[3]) < 1e-9
+    # and the run after it resumes from that new run, not the old one
+    assert run_group(optimizer_binary, src, str(tmp_path / "out2.csv"), checkpoint)[0] is True
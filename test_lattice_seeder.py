@@ -0,0 +1,38 @@
+import numpy as np
+from lattice_seeder import _separate, compute_seeds, tile
+from tree_geometry import tree_bounds, tree_vertices
+from validate import overlapping_pairs
+
+# One upright tree per 0.75 x 1.05 cell: rows of trees that just clear
+GRID = {'a': 0.75, 'b': 0.0, 'c': 1.05, 'trees': [[0.0, 0.0, 0.0]]}
+
+def test_tile_keeps_trees_in_the_window():
+    xs, ys, ds = tile(GRID, 0.0, -0.1, -0.1, 2.0, 2.0)
+    assert len(xs) == 3 * 2
+    assert np.all((xs >= -0.1) & (xs <= 2.0) & (ys >= -0.1) & (ys <= 2.0))
+
+def test_seeds_are_valid_and_sized():
+    seeds = compute_seeds([GRID], max_n=6, angle_step=45.0)
+    assert sorted(seeds) == [1, 2, 3, 4, 5, 6]
+    for n, entry in seeds.items():
+        xs, ys, degs = np.array(entry['trees']).T
+        assert len(xs) == n
+        assert not len(overlapping_pairs(tree_vertices(xs, ys, degs))[0])
+        b = tree_bounds(xs, ys, degs)
+        side = max(b[:, 2].max() - b[:, 0].min(), b[:, 3].max() - b[:, 1].min())
+        assert abs(side - entry['side']) < 1e-12
+    # More trees never fit in a smaller square
+    sides = [seeds[n]['side'] for n in sorted(seeds)]
+    assert sides == sorted(sides)
+
+def test_separate_spreads_touching_trees():
+    # Two trees overlapping by a hair come apart
+    xs, ys, degs = np.array([0.0, 0.69]), np.zeros(2), np.zeros(2)
+    assert len(overlapping_pairs(tree_vertices(xs, ys, degs))[0])
+    xs, ys = _separate(xs, ys, degs)
+    assert not len(overlapping_pairs(tree_vertices(xs, ys, degs))[0])
+
+def test_separate_gives_up_on_coincident_trees():
+    # Trees on the same spot stay there however far the group is spread
+    xs, ys, degs = np.array([0.0, 0.0, 2.0]), np.array([0.0, 0.0, 0.0]), np.zeros(3)
+    assert _separate(xs, ys, degs) is None
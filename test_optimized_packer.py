@@ -0,0 +1,57 @@
+import random
+import numpy as np
+import pytest
+import shapely
+import optimized_packer
+from optimized_packer import Packer
+from tree_geometry import tree_vertices
+
+@pytest.fixture
+def packer(monkeypatch):
+    """Packer of 8 trees in a tight row (neighbours overlap), no lattice seed."""
+    monkeypatch.setattr(optimized_packer, "lattice_seed", lambda n: None)
+    p = Packer(8)
+    p.set_state(np.arange(8) * 0.5, np.zeros(8), np.zeros(8))
+    return p
+
+def test_moves_keep_geometry_and_bounds_current(packer):
+    random.seed(5)
+    for _ in range(300):
+        idx, old = packer.step(0.3)
+        if random.random() < 0.5:
+            packer.revert(idx, old)
+        polys = packer._fresh_polys()
+        verts = tree_vertices(packer.x, packer.y, packer.deg)
+        assert np.allclose(packer.verts, verts, atol=1e-12)
+        assert np.allclose(packer.aabb[:, :2], verts.min(axis=1), atol=1e-12)
+        assert np.allclose(packer.aabb[:, 2:], verts.max(axis=1), atol=1e-12)
+        assert np.allclose(shapely.area(polys), shapely.area(shapely.polygons(verts)))
+        assert packer.bounds == [packer.aabb[:, 0].min(), packer.aabb[:, 1].min(),
+                                 packer.aabb[:, 2].max(), packer.aabb[:, 3].max()]
+
+def test_incremental_overlap_matches_full_sweep(packer):
+    assert packer.overlap_total > 0
+    random.seed(7)
+    for _ in range(300):
+        idx, old = packer.step(0.2)
+        total, row = packer.delta_overlap(idx)
+        if random.random() < 0.6:
+            packer.commit_overlap(idx, total, row)
+            assert total == pytest.approx(packer.check_overlap(), abs=1e-12)
+        else:
+            packer.revert(idx, old)
+    cached = packer.overlap.copy()
+    packer._rebuild_overlap()
+    assert np.allclose(cached, packer.overlap, atol=1e-12)
+
+def test_incremental_and_full_optimize_agree(monkeypatch):
+    monkeypatch.setattr(optimized_packer, "lattice_seed", lambda n: None)
+    energies = []
+    for incremental in (True, False):
+        random.seed(11)
+        p = Packer(6)
+        p.set_state(np.arange(6) * 0.5, np.zeros(6), np.zeros(6))
+        energies.append((p.optimize(iterations=300, incremental=incremental), p.x.copy()))
+    (e_inc, x_inc), (e_full, x_full) = energies
+    assert e_inc == pytest.approx(e_full, rel=1e-9)
+    assert np.array_equal(x_inc, x_full)
@@ -0,0 +1,47 @@
+import os
+import numpy as np
+from rotate_groups import rotate_group, rotate_submission
+from score_calculator import group_sides, parse_rows, read_group_rows, write_group_rows
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def turned(lines, angle):
+    """Group rows turned rigidly by angle degrees about the origin."""
+    ns, xs, ys, degs = parse_rows(lines)
+    t = np.radians(angle)
+    c, s = np.cos(t), np.sin(t)
+    return [f"{n:03d}_{i},s{x!r},s{y!r},s{d!r}"
+            for i, (n, x, y, d) in enumerate(zip(ns.tolist(), (xs * c - ys * s).tolist(),
+                                                  (xs * s + ys * c).tolist(), ((degs + angle) % 360).tolist()))]
+
+def side(lines):
+    ns = parse_rows(lines)[0]
+    return group_sides(*parse_rows(lines))[ns[0]]
+
+def test_turned_group_comes_back():
+    rows = read_group_rows(os.path.join(HERE, "submission.csv"))[10]
+    ns, xs, ys, degs = parse_rows(rows)
+    best = group_sides(ns, *rotate_group(xs, ys, degs)[:3])[10]
+    assert best <= side(rows) + 1e-12
+
+    # Any rigid turn of the group goes back to the same best square
+    for angle in (17.0, 30.0, 63.5):
+        ns, xs, ys, degs = parse_rows(turned(rows, angle))
+        assert side(turned(rows, angle)) > best
+        assert abs(group_sides(ns, *rotate_group(xs, ys, degs)[:3])[10] - best) < 1e-9
+
+def test_rotate_submission_rejects_overlaps(tmp_path):
+    rows = read_group_rows(os.path.join(HERE, "submission.csv"))
+    # Group 2 with both trees on the same spot, turned so a rotation gains
+    clash = turned([rows[2][0], rows[2][0].replace("002_0", "002_1")], 30.0)
+    good = turned(rows[10], 30.0)
+    filename = str(tmp_path / "submission.csv")
+    write_group_rows(filename, {2: clash, 10: good})
+
+    result = rotate_submission(filename)
+    assert list(result) == [10]
+    old, new = result[10]
+    assert new < old
+    after = read_group_rows(filename)
+    assert after[2] == clash
+    assert abs(side(after[10]) - new) < 1e-12
@@ -0,0 +1,61 @@
+import os
+import pytest
+import score_calculator
+import validate
+from score_calculator import cached_group_scores, read_group_rows, score_groups, write_group_rows
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+@pytest.fixture
+def submission(tmp_path):
+    """Groups 1-12 of the tracked submission in a scratch file."""
+    rows = read_group_rows(os.path.join(HERE, "submission.csv"))
+    filename = str(tmp_path / "submission.csv")
+    write_group_rows(filename, {n: rows[n] for n in range(1, 13)})
+    return filename
+
+@pytest.fixture
+def rescored(monkeypatch):
+    """Groups each validate_arrays call was asked about."""
+    calls = []
+    real = validate.validate_arrays
+    def counting(ns, xs, ys, degs):
+        calls.append(sorted(set(int(n) for n in ns)))
+        return real(ns, xs, ys, degs)
+    monkeypatch.setattr(validate, "validate_arrays", counting)
+    return calls
+
+def test_cache_hit_matches_a_full_rescore(submission, rescored):
+    first = cached_group_scores(submission)
+    assert rescored == [list(range(1, 13))]
+    assert os.path.exists(submission + score_calculator.CACHE_SUFFIX)
+
+    # Nothing changed: every group comes from the cache
+    assert cached_group_scores(submission) == first
+    assert len(rescored) == 1
+
+    scores = score_groups(submission)
+    for n, entry in first.items():
+        assert entry['score'] == pytest.approx(scores[n], rel=1e-12)
+        assert entry['overlap'] is False
+
+def test_changed_group_is_the_only_miss(submission, rescored):
+    cached_group_scores(submission)
+    rows = read_group_rows(submission)
+    # Spread group 3 out: a bigger side, and still no overlaps
+    spread = []
+    for line in rows[3]:
+        i, x, y, d = line.split(',')
+        spread.append(f"{i},s{float(x[1:]) * 2!r},s{float(y[1:]) * 2!r},{d}")
+    rows[3] = spread
+    write_group_rows(submission, rows)
+
+    entries = cached_group_scores(submission)
+    assert rescored[-1] == [3]
+    assert entries[3]['score'] == pytest.approx(score_groups(submission)[3], rel=1e-12)
+
+def test_version_bump_rescores_everything(submission, rescored, monkeypatch):
+    cached_group_scores(submission)
+    monkeypatch.setattr(score_calculator, "CACHE_VERSION", score_calculator.CACHE_VERSION + 1)
+    cached_group_scores(submission)
+    assert rescored == [list(range(1, 13))] * 2
@@ -0,0 +1,39 @@
+import itertools
+import numpy as np
+import shapely
+from tree_geometry import tree_vertices
+from validate import overlapping_pairs, validate_arrays
+
+def shapely_pairs(verts, min_area):
+    """Pairs whose shapely intersection area exceeds min_area."""
+    polys = shapely.polygons(verts)
+    return {(i, j) for i, j in itertools.combinations(range(len(polys)), 2)
+            if shapely.intersection(polys[i], polys[j]).area > min_area}
+
+def test_pairs_match_shapely_on_random_trees():
+    rng = np.random.default_rng(3)
+    for _ in range(5):
+        n = 60
+        xs, ys = rng.uniform(0, 5, n), rng.uniform(0, 5, n)
+        verts = tree_vertices(xs, ys, rng.uniform(0, 360, n))
+        i, j = overlapping_pairs(verts)
+        found = set(zip(i.tolist(), j.tolist()))
+        # Every real overlap is found, and nothing that does not even touch
+        assert shapely_pairs(verts, 1e-9) <= found
+        polys = shapely.polygons(verts)
+        for a, b in found:
+            assert shapely.intersects(polys[a], polys[b])
+
+def test_touching_trees_do_not_overlap():
+    # Side by side, bottom tier corners exactly meeting at x = 0.35
+    verts = tree_vertices(np.array([0.0, 0.7]), np.zeros(2), np.zeros(2))
+    assert len(overlapping_pairs(verts)[0]) == 0
+    verts = tree_vertices(np.array([0.0, 0.69]), np.zeros(2), np.zeros(2))
+    assert len(overlapping_pairs(verts)[0]) == 1
+
+def test_groups_are_checked_separately():
+    # Same spot, different groups: no overlap; in-group indices are reported
+    ns = np.array([2, 2, 3, 3])
+    xs = np.array([0.0, 0.3, 0.0, 5.0])
+    ys, degs = np.zeros(4), np.zeros(4)
+    assert validate_arrays(ns, xs, ys, degs) == {2: [(0, 1)]}
@@ -1,36 +1,118 @@
+import math
 import numpy as np
-from shapely.geometry import Polygon, Point
-from shapely.affinity import rotate, translate
+import shapely
+from shapely.geometry import Polygon
+
+# Vertices extracted from single_group_optimizer.cpp (NV=15)
+TX = [0, 0.125, 0.0625, 0.2, 0.1, 0.35, 0.075, 0.075, -0.075, -0.075, -0.35, -0.1, -0.2, -0.0625, -0.125]
+TY = [0.8, 0.5, 0.5, 0.25, 0.25, 0, 0, -0.2, -0.2, 0, 0, 0.25, 0.25, 0.5, 0.5]
+
+# Same template as a (15, 2) array for the vectorized code paths
+TEMPLATE = np.column_stack([TX, TY]).astype(np.float64)
+
+# The tree is the union of 4 convex pieces (same split as physics_packer):
+# trunk, bottom tier, middle tier, top triangle. Indices into TX/TY; the
+# triangle repeats its apex so every piece has 4 vertices.
+PIECES = np.array([
+    [8, 7, 6, 9],
+    [10, 5, 4, 11],
+    [12, 3, 2, 13],
+    [14, 1, 0, 0],
+])
+
+# Shared, immutable base polygon; never rebuilt per tree
+BASE_POLYGON = Polygon(list(zip(TX, TY)))
 
 class Tree:
+    base_polygon = BASE_POLYGON
+
     def __init__(self, x, y, deg):
         self.x = x
         self.y = y
         self.deg = deg
-        self.base_polygon = self._create_base_polygon()
         self.polygon = self._update_polygon()
 
-    def _create_base_polygon(self):
-        # Vertices extracted from single_group_optimizer.cpp (NV=15)
-        # TX and TY from the user provided code:
-        tx = [0, 0.125, 0.0625, 0.2, 0.1, 0.35, 0.075, 0.075, -0.075, -0.075, -0.35, -0.1, -0.2, -0.0625, -0.125]
-        ty = [0.8, 0.5, 0.5, 0.25, 0.25, 0, 0, -0.2, -0.2, 0, 0, 0.25, 0.25, 0.5, 0.5]
-        
-        # Combine into list of (x,y)
-        coords = list(zip(tx, ty))
-        
-        return Polygon(coords)
-
     def _update_polygon(self):
-        # Rotate and then translate
-        poly = rotate(self.base_polygon, self.deg, origin=(0, 0), use_radians=False)
-        poly = translate(poly, self.x, self.y)
-        return poly
+        # Rotate and then translate, straight from the cached template
+        return shapely.polygons(tree_vertices([self.x], [self.y], [self.deg])[0])
 
     def get_polygon(self):
         return self.polygon
 
+class LightTree:
+    """Tree without per-instance shapely state.
+
+    Vertices (a list of 15 (x, y) tuples) and bounds are computed lazily
+    and cached until the next move; a shapely polygon is only built when
+    get_polygon() is called.
+    """
+    __slots__ = ('x', 'y', 'deg', '_verts', '_bounds', '_polygon')
+
+    def __init__(self, x, y, deg):
+        self.x = x
+        self.y = y
+        self.deg = deg
+        self._verts = None
+        self._bounds = None
+        self._polygon = None
+
+    def move(self, x, y, deg):
+        self.x = x
+        self.y = y
+        self.deg = deg
+        self._verts = None
+        self._bounds = None
+        self._polygon = None
+
+    def state(self):
+        """Snapshot including cached geometry, for a cheap restore()."""
+        return (self.x, self.y, self.deg, self._verts, self._bounds, self._polygon)
+
+    def restore(self, state):
+        self.x, self.y, self.deg, self._verts, self._bounds, self._polygon = state
+
+    def vertices(self):
+        if self._verts is None:
+            rad = math.radians(self.deg)
+            c, s = math.cos(rad), math.sin(rad)
+            x, y = self.x, self.y
+            self._verts = [(tx * c - ty * s + x, tx * s + ty * c + y) for tx, ty in zip(TX, TY)]
+        return self._verts
+
+    def bounds(self):
+        if self._bounds is None:
+            xs, ys = zip(*self.vertices())
+            self._bounds = (min(xs), min(ys), max(xs), max(ys))
+        return self._bounds
+
+    def get_polygon(self):
+        if self._polygon is None:
+            self._polygon = Polygon(self.vertices())
+        return self._polygon
+
 def get_placeholder_tree_coords():
     # Return the raw coords for visualization
-    t = Tree(0, 0, 0)
-    return list(t.base_polygon.exterior.coords)
+    return list(BASE_POLYGON.exterior.coords)
+
+def tree_vertices(xs, ys, degs):
+    """Vertices of many trees at once.
+
+    Takes equal-length arrays of x, y and deg and returns a (N, 15, 2) array,
+    rotating the template by deg about the origin and then translating, the
+    same transform as Tree._update_polygon and the C++ getPoly.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    rad = np.radians(np.asarray(degs, dtype=np.float64))
+    c = np.cos(rad)[:, None]
+    s = np.sin(rad)[:, None]
+
+    verts = np.empty((len(xs), len(TX), 2))
+    verts[:, :, 0] = TEMPLATE[:, 0] * c - TEMPLATE[:, 1] * s + xs[:, None]
+    verts[:, :, 1] = TEMPLATE[:, 0] * s + TEMPLATE[:, 1] * c + ys[:, None]
+    return verts
+
+def tree_bounds(xs, ys, degs):
+    """Per-tree AABBs as a (N, 4) array of (min_x, min_y, max_x, max_y)."""
+    verts = tree_vertices(xs, ys, degs)
+    return np.concatenate([verts.min(axis=1), verts.max(axis=1)], axis=1)
@@ -0,0 +1,153 @@
+import sys
+import time
+import numpy as np
+import shapely
+from tree_geometry import PIECES, tree_vertices
+from score_calculator import load_submission
+
+# Broad phase works on all groups at once; each group is shifted this far
+# along x so trees of different groups can never share a candidate pair.
+GROUP_OFFSET = 1000.0
+
+# Projection overlap below this is treated as touching, not overlapping
+EPS = 1e-12
+
+# Candidate piece pairs handled per vectorized narrow-phase batch
+CHUNK = 65536
+
+def piece_axes(pieces):
+    """Edge normals of convex pieces and each piece's extent along them.
+
+    pieces: (M, 4, 2). Returns axes (M, 4, 2) and the piece's own projection
+    interval (lo, hi), each (M, 4), so the SAT only projects the other piece.
+    """
+    edges = np.roll(pieces, -1, axis=1) - pieces
+    axes = np.stack([-edges[:, :, 1], edges[:, :, 0]], axis=2)
+    lo, hi = _project(axes, pieces)
+    return axes, lo, hi
+
+def _project(axes, pts):
+    # Min/max of the 4 points projected on each axis; the 4-way reduction is
+    # unrolled because ufunc.reduce over a length-4 axis is slow.
+    ax, ay = axes[:, :, 0:1], axes[:, :, 1:2]
+    proj = ax * pts[:, None, :, 0] + ay * pts[:, None, :, 1]
+    p0, p1, p2, p3 = proj[:, :, 0], proj[:, :, 1], proj[:, :, 2], proj[:, :, 3]
+    lo = np.minimum(np.minimum(p0, p1), np.minimum(p2, p3))
+    hi = np.maximum(np.maximum(p0, p1), np.maximum(p2, p3))
+    return lo, hi
+
+def _separated(axes, lo, hi, other):
+    # True where one of `axes` separates its piece from `other` by > EPS
+    other_lo, other_hi = _project(axes, other)
+    sep = (hi <= other_lo + EPS) | (other_hi <= lo + EPS)
+
+    # The triangle's repeated apex gives a zero-length edge; never use it
+    sep &= (axes[:, :, 0] != 0) | (axes[:, :, 1] != 0)
+    return sep.any(axis=1)
+
+def pieces_overlap(pa, pb, sat_a=None, sat_b=None):
+    """Separating-axis test for K pairs of convex pieces.
+
+    pa, pb: (K, 4, 2) piece vertices, with optional precomputed piece_axes()
+    for each side. A pair overlaps only if no edge normal of either piece
+    separates it by more than EPS, so touching pieces are not reported.
+    """
+    sat_a = piece_axes(pa) if sat_a is None else sat_a
+    sat_b = piece_axes(pb) if sat_b is None else sat_b
+    return ~(_separated(*sat_a, pb) | _separated(*sat_b, pa))
+
+def overlapping_pairs(verts, keys=None):
+    """Row-index pairs (i, j), i < j, of overlapping trees.
+
+    verts: (N, 15, 2) vertices. keys: optional per-row group id; only rows
+    with the same key are compared.
+    """
+    lo = verts.min(axis=1)
+    hi = verts.max(axis=1)
+    if keys is not None:
+        shift = np.asarray(keys, dtype=np.float64) * GROUP_OFFSET
+        lo[:, 0] += shift
+        hi[:, 0] += shift
+
+    # Broad phase: STRtree over the tree AABBs. The geometries are the boxes
+    # themselves, so the tree's envelope test is already exact.
+    boxes = shapely.box(lo[:, 0], lo[:, 1], hi[:, 0], hi[:, 1])
+    i, j = shapely.STRtree(boxes).query(boxes)
+    mask = i < j
+    i, j = i[mask], j[mask]
+    if keys is not None:
+        keys = np.asarray(keys)
+        same = keys[i] == keys[j]
+        i, j = i[same], j[same]
+
+    # Expand every tree pair into its piece pairs and cull on piece AABBs
+    n_pieces = len(PIECES)
+    pieces = verts[:, PIECES].reshape(-1, PIECES.shape[1], 2)
+    p0, p1, p2, p3 = pieces[:, 0], pieces[:, 1], pieces[:, 2], pieces[:, 3]
+    p_lo = np.minimum(np.minimum(p0, p1), np.minimum(p2, p3))
+    p_hi = np.maximum(np.maximum(p0, p1), np.maximum(p2, p3))
+    lx, ly = p_lo[:, 0].copy(), p_lo[:, 1].copy()
+    hx, hy = p_hi[:, 0].copy(), p_hi[:, 1].copy()
+
+    pa = (i[:, None, None] * n_pieces + np.arange(n_pieces)[:, None]).repeat(n_pieces, axis=2).ravel()
+    pb = (j[:, None, None] * n_pieces + np.arange(n_pieces)[None, :]).repeat(n_pieces, axis=1).ravel()
+    touch = (lx[pa] <= hx[pb]) & (lx[pb] <= hx[pa])
+    pa, pb = pa[touch], pb[touch]
+    touch = (ly[pa] <= hy[pb]) & (ly[pb] <= hy[pa])
+    pa, pb = pa[touch], pb[touch]
+
+    # Narrow phase: SAT on piece pairs in fixed-size batches
+    axes, proj_lo, proj_hi = piece_axes(pieces)
+    hits = np.zeros(len(pa), dtype=bool)
+    for start in range(0, len(pa), CHUNK):
+        ia, ib = pa[start:start + CHUNK], pb[start:start + CHUNK]
+        hits[start:start + CHUNK] = pieces_overlap(
+            pieces[ia], pieces[ib],
+            (axes[ia], proj_lo[ia], proj_hi[ia]),
+            (axes[ib], proj_lo[ib], proj_hi[ib]))
+
+    # Several piece pairs can hit for one tree pair; dedupe on a flat key
+    key = np.unique(pa[hits] // n_pieces * len(verts) + pb[hits] // n_pieces)
+    return key // len(verts), key % len(verts)
+
+def validate_arrays(ns, xs, ys, degs):
+    """Overlapping pairs per group: {n: [(i, j), ...]} with in-group indices."""
+    ns = np.asarray(ns)
+    i, j = overlapping_pairs(tree_vertices(xs, ys, degs), keys=ns)
+
+    # Row index -> index of the tree inside its own group
+    order = np.argsort(ns, kind='stable')
+    _, starts, counts = np.unique(ns[order], return_index=True, return_counts=True)
+    local = np.empty(len(ns), dtype=np.int64)
+    local[order] = np.arange(len(ns)) - np.repeat(starts, counts)
+
+    report = {}
+    for a, b in zip(i, j):
+        report.setdefault(int(ns[a]), []).append((int(local[a]), int(local[b])))
+    return report
+
+def validate_submission(filename='submission.csv'):
+    """Check every group of a submission file for overlapping trees."""
+    return validate_arrays(*load_submission(filename))
+
+def is_valid(filename='submission.csv'):
+    return not validate_submission(filename)
+
+def main():
+    filename = sys.argv[1] if len(sys.argv) > 1 else 'submission.csv'
+    start_t = time.time()
+    report = validate_submission(filename)
+    elapsed = time.time() - start_t
+
+    if not report:
+        print(f"{filename}: no overlaps ({elapsed:.3f}s)")
+        return 0
+
+    print(f"{filename}: overlaps in {len(report)} groups ({elapsed:.3f}s)")
+    for n in sorted(report):
+        pairs = ', '.join(f"{i}-{j}" for i, j in report[n])
+        print(f"N={n}: {pairs}")
+    return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
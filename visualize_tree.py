@@ -3,7 +3,9 @@ from shapely.geometry import Polygon
 import sys
 import csv
 import os
-from tree_geometry import Tree, get_placeholder_tree_coords
+import numpy as np
+from tree_geometry import Tree, get_placeholder_tree_coords, tree_bounds
+from score_calculator import load_submission
 
 def plot_tree_shape():
     coords = get_placeholder_tree_coords()
@@ -28,23 +30,17 @@ def plot_trees(trees, filename):
     fig, ax = plt.subplots(figsize=(10, 10))
     ax.set_aspect('equal')
     
-    # Track bounds
-    min_x, max_x = 1e9, -1e9
-    min_y, max_y = 1e9, -1e9
-    
     for tree in trees:
         poly = tree.get_polygon()
         # Plot
         x, y = poly.exterior.xy
         ax.fill(x, y, alpha=0.5, edgecolor='black')
-        
-        # update bounds
-        bounds = poly.bounds
-        min_x = min(min_x, bounds[0])
-        min_y = min(min_y, bounds[1])
-        max_x = max(max_x, bounds[2])
-        max_y = max(max_y, bounds[3])
-        
+
+    # Bounds of all trees in one batched call
+    bounds = tree_bounds([t.x for t in trees], [t.y for t in trees], [t.deg for t in trees])
+    min_x, min_y = bounds[:, :2].min(axis=0)
+    max_x, max_y = bounds[:, 2:].max(axis=0)
+
     # Draw Bounding Box
     width = max_x - min_x
     height = max_y - min_y
@@ -92,24 +88,14 @@ if __name__ == "__main__":
         
     # Load submission
     try:
-        with open('submission.csv', 'r') as f:
-            reader = csv.reader(f)
-            next(reader) # Skip header
-            for row in reader:
-                # id, sX, sY, sDeg
-                row_id = row[0]
-                parts = row_id.split('_')
-                n = int(parts[0])
-                
-                if n == target_n:
-                    x = float(row[1].replace('s', ''))
-                    y = float(row[2].replace('s', ''))
-                    deg = float(row[3].replace('s', ''))
-                    trees.append(Tree(x, y, deg))
+        ns, xs, ys, degs = load_submission('submission.csv')
     except FileNotFoundError:
         print("submission.csv not found!")
         sys.exit(1)
-        
+
+    for i in np.flatnonzero(ns == target_n):
+        trees.append(Tree(xs[i], ys[i], degs[i]))
+
     if not trees:
         print(f"No trees found for N={target_n}")
         sys.exit(1)